@@ -4,17 +4,109 @@ Dr. Clivi - Verificación de Estado del Proyecto
 Comprueba que todo está listo para implementación
 """
 
+import functools
+import importlib.util
 import os
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+REQUIRED_FILES = (
+    "dr_clivi/__init__.py",
+    "dr_clivi/config.py",
+    "dr_clivi/agents/coordinator.py",
+    "dr_clivi/agents/diabetes_agent.py",
+    "dr_clivi/flows/deterministic_handler.py",
+    "dr_clivi/telegram/telegram_handler.py",
+    "pyproject.toml",
+    ".env.example",
+    "telegram_main.py",
+    "setup_credentials.py",
+    "setup_ngrok.py",
+)
 
-def check_mark(condition: bool) -> str:
-    return "✅" if condition else "❌"
+# (paquete pip, módulo importable)
+DEPENDENCIES = (
+    ("google-adk", "google.adk"),
+    ("fastapi", "fastapi"),
+    ("uvicorn", "uvicorn"),
+    ("httpx", "httpx"),
+    ("pydantic", "pydantic"),
+    ("python-dotenv", "dotenv"),
+)
 
+SCRIPTS = (
+    "setup_credentials.py",
+    "setup_ngrok.py",
+    "telegram_main.py",
+    "test_telegram_bot.py",
+)
 
-def warning_mark(condition: bool) -> str:
-    return "✅" if condition else "⚠️ "
+# Variable -> valor de ejemplo de .env.example (cuenta como no configurada)
+SENTINELS = {
+    "GOOGLE_API_KEY": "your_ai_studio_api_key_here",
+    "TELEGRAM_BOT_TOKEN": "your_telegram_bot_token_here",
+}
+
+_inventory = None
+_dotenv_loaded = False
+
+
+def directory_inventory() -> dict:
+    """Directorio -> nombres de sus entradas (un readdir por directorio padre)"""
+    global _inventory
+    if _inventory is None:
+        inventory = {}
+        directories = {os.path.dirname(path) or "." for path in REQUIRED_FILES}
+        # Si falta el directorio raíz (p. ej. dr_clivi/) todos sus hijos faltan:
+        # un solo stat en lugar de un scandir fallido por subdirectorio
+        missing_roots = {
+            root for root in {d.split("/", 1)[0] for d in directories if d != "."}
+            if not os.path.isdir(root)
+        }
+        for directory in directories:
+            if directory.split("/", 1)[0] in missing_roots:
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    inventory[directory] = {entry.name for entry in entries}
+            except OSError:
+                continue
+        _inventory = inventory
+    return _inventory
+
+
+def file_exists(path: str) -> bool:
+    directory, name = os.path.split(path)
+    return name in directory_inventory().get(directory or ".", ())
+
+
+# Prefijos de estado para cada fila del reporte
+OK, BAD, WARN = "✅ ", "❌ ", "⚠️ "
+
+
+def probe(path: str) -> tuple:
+    """(existe, ejecutable) con un solo stat"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False, False
+    return True, bool(st.st_mode & 0o111)
+
+
+@functools.cache
+def _load_dotenv():
+    """Importa python-dotenv solo cuando existe un .env"""
+    from dotenv import load_dotenv
+    return load_dotenv
+
+
+def module_available(import_name: str) -> bool:
+    """Comprueba si un módulo es importable sin ejecutarlo"""
+    try:
+        return importlib.util.find_spec(import_name) is not None
+    except (ImportError, ValueError):
+        # find_spec importa el paquete padre ("google" en "google.adk")
+        return False
 
 
 def print_header():
@@ -22,139 +114,109 @@ def print_header():
     print("=" * 40)
 
 
-def check_project_structure():
+def check_project_structure(out: list) -> bool:
     """Verificar estructura del proyecto"""
-    print("\n📁 ESTRUCTURA DEL PROYECTO")
-    print("-" * 30)
-    
-    required_files = [
-        "dr_clivi/__init__.py",
-        "dr_clivi/config.py",
-        "dr_clivi/agents/coordinator.py",
-        "dr_clivi/agents/diabetes_agent.py",
-        "dr_clivi/flows/deterministic_handler.py",
-        "dr_clivi/telegram/telegram_handler.py",
-        "pyproject.toml",
-        ".env.example",
-        "telegram_main.py",
-        "setup_credentials.py",
-        "setup_ngrok.py"
-    ]
+    out.append("\n📁 ESTRUCTURA DEL PROYECTO")
+    out.append("-" * 30)
     
-    all_good = True
-    for file_path in required_files:
-        exists = Path(file_path).exists()
-        print(f"{check_mark(exists)} {file_path}")
-        if not exists:
-            all_good = False
+    missing = {path for path in REQUIRED_FILES if not file_exists(path)}
+    for file_path in REQUIRED_FILES:
+        out.append((BAD if file_path in missing else OK) + file_path)
     
-    return all_good
+    return not missing
 
 
-def check_dependencies():
+def check_dependencies(out: list) -> bool:
     """Verificar dependencias Python"""
-    print("\n📦 DEPENDENCIAS")
-    print("-" * 20)
-    
-    dependencies = [
-        ("google-adk", "google.adk"),
-        ("fastapi", "fastapi"),
-        ("uvicorn", "uvicorn"),
-        ("httpx", "httpx"),
-        ("pydantic", "pydantic"),
-        ("python-dotenv", "dotenv")
-    ]
+    out.append("\n📦 DEPENDENCIAS")
+    out.append("-" * 20)
     
     all_good = True
-    for package_name, import_name in dependencies:
-        try:
-            __import__(import_name)
-            print(f"✅ {package_name}")
-        except ImportError:
-            print(f"❌ {package_name} (pip install {package_name})")
+    for package_name, import_name in DEPENDENCIES:
+        if module_available(import_name):
+            out.append(OK + package_name)
+        else:
+            out.append(f"{BAD}{package_name} (pip install {package_name})")
             all_good = False
     
     return all_good
 
 
-def check_configuration():
+def check_configuration(out: list) -> bool:
     """Verificar configuración"""
-    print("\n⚙️  CONFIGURACIÓN")
-    print("-" * 20)
+    out.append("\n⚙️  CONFIGURACIÓN")
+    out.append("-" * 20)
     
     # Verificar .env
-    env_exists = Path('.env').exists()
-    print(f"{check_mark(env_exists)} Archivo .env")
+    env_exists, _ = probe('.env')
+    out.append((OK if env_exists else BAD) + "Archivo .env")
     
     if env_exists:
-        # Cargar variables
-        from dotenv import load_dotenv
-        load_dotenv()
+        # Cargar variables (una sola vez por proceso)
+        global _dotenv_loaded
+        if not _dotenv_loaded:
+            _load_dotenv()()
+            _dotenv_loaded = True
         
         # Verificar variables clave
-        google_api_key = os.getenv('GOOGLE_API_KEY', '')
-        telegram_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
-        
-        google_configured = google_api_key and google_api_key != 'your_ai_studio_api_key_here'
-        telegram_configured = telegram_token and telegram_token != 'your_telegram_bot_token_here'
+        configured = {}
+        for var, sentinel in SENTINELS.items():
+            value = os.environ.get(var, "")
+            configured[var] = bool(value) and value != sentinel
         
-        print(f"{check_mark(google_configured)} Google AI Studio API Key")
-        print(f"{check_mark(telegram_configured)} Telegram Bot Token")
+        out.append((OK if configured["GOOGLE_API_KEY"] else BAD) + "Google AI Studio API Key")
+        out.append((OK if configured["TELEGRAM_BOT_TOKEN"] else BAD) + "Telegram Bot Token")
         
-        if google_configured and telegram_configured:
-            return True
+        return all(configured.values())
     
     return False
 
 
-def check_adk_implementation():
+def check_adk_implementation(out: list, deps_ok: bool = True) -> bool:
     """Verificar implementación ADK"""
-    print("\n🤖 IMPLEMENTACIÓN ADK")
-    print("-" * 25)
+    out.append("\n🤖 IMPLEMENTACIÓN ADK")
+    out.append("-" * 25)
+    
+    if not deps_ok:
+        # Sin dependencias los imports fallarían después de pagar su costo
+        out.append(BAD + "Omitida: faltan dependencias")
+        return False
     
     try:
-        from dr_clivi.config import Config
-        config = Config()
-        print("✅ Configuración ADK cargada")
+        from dr_clivi.config import get_config
+        config = get_config()
+        out.append(OK + "Configuración ADK cargada")
         
         from dr_clivi.agents.coordinator import IntelligentCoordinator
         coordinator = IntelligentCoordinator(config)
-        print("✅ IntelligentCoordinator inicializado")
+        out.append(OK + "IntelligentCoordinator inicializado")
         
         from dr_clivi.flows.deterministic_handler import DeterministicFlowHandler
         flow_handler = DeterministicFlowHandler(config)
-        print("✅ DeterministicFlowHandler inicializado")
+        out.append(OK + "DeterministicFlowHandler inicializado")
         
         from dr_clivi.telegram.telegram_handler import TelegramBotHandler
         telegram_handler = TelegramBotHandler(config)
-        print("✅ TelegramBotHandler inicializado")
+        out.append(OK + "TelegramBotHandler inicializado")
         
         return True
         
     except Exception as e:
-        print(f"❌ Error en implementación: {e}")
+        out.append(f"{BAD}Error en implementación: {e}")
         return False
 
 
-def check_scripts():
+def check_scripts(out: list) -> bool:
     """Verificar scripts de configuración"""
-    print("\n🔧 SCRIPTS DE CONFIGURACIÓN")
-    print("-" * 30)
-    
-    scripts = [
-        "setup_credentials.py",
-        "setup_ngrok.py", 
-        "telegram_main.py",
-        "test_telegram_bot.py"
-    ]
+    out.append("\n🔧 SCRIPTS DE CONFIGURACIÓN")
+    out.append("-" * 30)
     
     all_good = True
-    for script in scripts:
-        exists = Path(script).exists()
-        executable = os.access(script, os.X_OK) if exists else False
+    for script in SCRIPTS:
+        exists, executable = probe(script)
         
-        status = "✅" if exists and executable else "⚠️" if exists else "❌"
-        print(f"{status} {script}")
+        status = OK if exists and executable else WARN if exists else BAD
+        out.append(status + script)
         
         if not exists:
             all_good = False
@@ -162,71 +224,91 @@ def check_scripts():
     return all_good
 
 
-def get_next_steps(config_ready: bool):
+def get_next_steps(out: list, config_ready: bool):
     """Obtener próximos pasos"""
-    print("\n🎯 PRÓXIMOS PASOS")
-    print("-" * 20)
+    out.append("\n🎯 PRÓXIMOS PASOS")
+    out.append("-" * 20)
     
     if not config_ready:
-        print("1️⃣ Configurar credenciales:")
-        print("   python setup_credentials.py")
-        print()
-        print("2️⃣ O configurar manualmente:")
-        print("   - Google AI Studio: https://aistudio.google.com")
-        print("   - Telegram @BotFather: /newbot")
-        print("   - Editar .env con los tokens")
+        out.append("1️⃣ Configurar credenciales:")
+        out.append("   python setup_credentials.py")
+        out.append("")
+        out.append("2️⃣ O configurar manualmente:")
+        out.append("   - Google AI Studio: https://aistudio.google.com")
+        out.append("   - Telegram @BotFather: /newbot")
+        out.append("   - Editar .env con los tokens")
     else:
-        print("1️⃣ Testing local:")
-        print("   python telegram_main.py")
-        print()
-        print("2️⃣ Testing con webhooks:")
-        print("   python setup_ngrok.py")
-        print()
-        print("3️⃣ Probar en Telegram:")
-        print("   Busca tu bot y envía 'hola'")
+        out.append("1️⃣ Testing local:")
+        out.append("   python telegram_main.py")
+        out.append("")
+        out.append("2️⃣ Testing con webhooks:")
+        out.append("   python setup_ngrok.py")
+        out.append("")
+        out.append("3️⃣ Probar en Telegram:")
+        out.append("   Busca tu bot y envía 'hola'")
 
 
 def main():
     print_header()
     
-    # Verificaciones
-    structure_ok = check_project_structure()
-    deps_ok = check_dependencies()
-    config_ok = check_configuration()
-    adk_ok = check_adk_implementation()
-    scripts_ok = check_scripts()
+    # Verificaciones en paralelo; cada una escribe en su propio buffer
+    # y se imprimen en orden al terminar
+    outputs = {name: [] for name in ("structure", "deps", "config", "adk", "scripts")}
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        structure = executor.submit(check_project_structure, outputs["structure"])
+        deps = executor.submit(check_dependencies, outputs["deps"])
+        config = executor.submit(check_configuration, outputs["config"])
+        
+        # ADK depende del resultado de dependencias y llama a get_config() (cacheado),
+        # así que espera a que check_configuration haya cargado el .env
+        def adk_job() -> bool:
+            config.exception()  # solo esperar; un error de configuración se reporta abajo
+            return check_adk_implementation(outputs["adk"], deps.result())
+        adk = executor.submit(adk_job)
+        scripts = executor.submit(check_scripts, outputs["scripts"])
+    
+    structure_ok = structure.result()
+    deps_ok = deps.result()
+    config_ok = config.result()
+    adk_ok = adk.result()
+    scripts_ok = scripts.result()
+    
+    # Reporte completo en un solo write
+    report = [line for lines in outputs.values() for line in lines]
     
     # Resumen
-    print("\n📊 RESUMEN")
-    print("-" * 15)
-    print(f"{check_mark(structure_ok)} Estructura del proyecto")
-    print(f"{check_mark(deps_ok)} Dependencias Python")
-    print(f"{check_mark(config_ok)} Configuración (.env)")
-    print(f"{check_mark(adk_ok)} Implementación ADK")
-    print(f"{warning_mark(scripts_ok)} Scripts de configuración")
+    report.append("\n📊 RESUMEN")
+    report.append("-" * 15)
+    report.append((OK if structure_ok else BAD) + "Estructura del proyecto")
+    report.append((OK if deps_ok else BAD) + "Dependencias Python")
+    report.append((OK if config_ok else BAD) + "Configuración (.env)")
+    report.append((OK if adk_ok else BAD) + "Implementación ADK")
+    report.append((OK if scripts_ok else WARN) + "Scripts de configuración")
     
     all_ready = structure_ok and deps_ok and adk_ok and scripts_ok
     
     if all_ready and config_ok:
-        print("\n🎉 ¡TODO LISTO PARA USAR!")
-        print("   Ejecuta: python telegram_main.py")
+        report.append("\n🎉 ¡TODO LISTO PARA USAR!")
+        report.append("   Ejecuta: python telegram_main.py")
     elif all_ready:
-        print("\n⚠️  LISTO PARA CONFIGURAR")
-        print("   Solo faltan las credenciales")
+        report.append("\n⚠️  LISTO PARA CONFIGURAR")
+        report.append("   Solo faltan las credenciales")
     else:
-        print("\n❌ NECESITA CONFIGURACIÓN")
+        report.append("\n❌ NECESITA CONFIGURACIÓN")
         
         if not deps_ok:
-            print("   Instala dependencias: pip install -r requirements.txt")
+            report.append("   Instala dependencias: pip install -r requirements.txt")
         if not structure_ok:
-            print("   Verifica archivos del proyecto")
+            report.append("   Verifica archivos del proyecto")
         if not adk_ok:
-            print("   Revisa implementación ADK")
+            report.append("   Revisa implementación ADK")
+    
+    get_next_steps(report, config_ok)
     
-    get_next_steps(config_ok)
+    report.append("\n" + "="*40)
+    report.append("📖 Para ayuda completa: cat SETUP_GUIDE.md")
     
-    print("\n" + "="*40)
-    print("📖 Para ayuda completa: cat SETUP_GUIDE.md")
+    sys.stdout.write("\n".join(report) + "\n")
 
 
 if __name__ == "__main__":
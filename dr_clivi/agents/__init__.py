@@ -1,14 +1,43 @@
 """
 Dr. Clivi Agents Module
 
-Contains agent implementations for the Dr. Clivi platform migration from 
+Contains agent implementations for the Dr. Clivi platform migration from
 Conversational Agents to ADK.
+
+Agents are resolved lazily (PEP 562): importing the package does not
+import every agent module.
 """
 
-from .base_agent import BaseCliviAgent, PatientContext, SessionContext
+import importlib
+
+# Exported name -> submodule that defines it
+_LAZY = {
+    "BaseCliviAgent": ".base_agent",
+    "PatientContext": ".base_agent",
+    "SessionContext": ".base_agent",
+    "DiabetesAgent": ".diabetes_agent",
+    "ObesityAgent": ".obesity_agent",
+    "IntelligentCoordinator": ".coordinator",
+}
 
 __all__ = [
     "BaseCliviAgent",
-    "PatientContext", 
-    "SessionContext"
+    "PatientContext",
+    "SessionContext",
+    "DiabetesAgent",
+    "ObesityAgent",
+    "IntelligentCoordinator"
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
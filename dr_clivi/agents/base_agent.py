@@ -5,27 +5,244 @@ Provides common functionality for diabetes and obesity agents.
 Note: This is a preliminary implementation that will be adapted to ADK framework.
 """
 
+import asyncio
+import functools
 import logging
+import re
+import secrets
+import time
+import uuid
+import weakref
 import datetime
-from typing import Any, Dict, List, Optional, Union
-from dataclasses import dataclass
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from dataclasses import dataclass, fields
+from types import MappingProxyType
 from abc import ABC, abstractmethod
 
+import httpx
+
 # TODO: Replace with actual ADK imports once available
 # from adk import Agent, tool
 # from adk.memory import MemoryStore  
 # from adk.models import Model
 
+from ..clock import utc_now
 from ..config import Config
 
+logger = logging.getLogger(__name__)
+
+# Shared read-only default for events logged without extra params
+_EMPTY_PARAMS = MappingProxyType({})
+
+# PatientContext.notification_preferences unless the patient sets their own
+_DEFAULT_NOTIFICATION_PREFERENCES = MappingProxyType({
+    "whatsapp": True,
+    "email": False,
+    "sms": False
+})
+
+# Most recent activity events / routing decisions kept per session; older ones
+# are dropped (activity events are shipped to the webhook as they are logged)
+SESSION_HISTORY_SIZE = 256
+
+# Connection pool of the shared activity webhook client
+_WEBHOOK_LIMITS = httpx.Limits(max_connections=32, keepalive_expiry=75.0)
+_WEBHOOK_TIMEOUT_SECONDS = 5.0
+
+# Plan/status groups from the checkPlanStatus conditions
+SPECIALIST_PLANS = frozenset({"PRO", "PLUS", "BASIC"})
+OFFLINE_PAYMENT_PLANS = frozenset({"PRO", "PLUS"})
+KNOWN_PLANS = frozenset({"PRO", "PLUS", "BASIC", "CLUB"})
+ROUTABLE_STATUSES = frozenset({"ACTIVE", "SUSPENDED"})
+
+# start_flow intents that go straight to the plan status check
+_PLAN_CHECK_INTENTS = frozenset({"keyWordMainMenu", "END_SESSION_TEMPLATE"})
 
-def tool(func):
+# checkPlanStatus replies; list fields are tuples (copied per reply) and
+# None values are filled in per user
+_UNKNOWN_USER_RESPONSE = MappingProxyType({
+    "action": "redirect",
+    "target": "user_problems_flow",
+    "message": "Bienvenido a Dr. Clivi. Para ofrecerte el mejor servicio, necesitamos conocer tu información.",
+    "next_steps": (
+        "Proporcionar número de teléfono",
+        "Verificar identidad",
+        "Configurar perfil"
+    )
+})
+_CLUB_CANCELED_RESPONSE = MappingProxyType({
+    "action": "redirect",
+    "target": "club_canceled_plan",
+    "message": "Tu plan Club ha sido cancelado. ¿Te gustaría reactivarlo?",
+    "options": (
+        {"id": "REACTIVATE_CLUB", "title": "Reactivar Plan Club"},
+        {"id": "VIEW_OTHER_PLANS", "title": "Ver otros planes"},
+        {"id": "CONTACT_SUPPORT", "title": "Contactar soporte"}
+    )
+})
+_PLAN_CANCELED_MESSAGE = "Tu plan {plan} ha sido cancelado. Te ayudamos a reactivarlo."
+_PLAN_CANCELED_RESPONSE = MappingProxyType({
+    "action": "redirect",
+    "target": "plan_reactivation_flow",
+    "message": None,
+    "plan_type": None
+})
+_INVALID_PLAN_RESPONSE = MappingProxyType({
+    "action": "error",
+    "message": "Tu tipo de plan no es reconocido. Por favor contacta soporte técnico.",
+    "error_code": "INVALID_PLAN_TYPE",
+    "support_contact": True
+})
+_PLAN_UNDETERMINED_RESPONSE = MappingProxyType({
+    "action": "error",
+    "message": "No pudimos determinar tu tipo de plan o estado. Por favor contacta soporte.",
+    "error_code": "PLAN_STATUS_UNDETERMINED",
+    "plan": None,
+    "status": None,
+    "support_contact": True
+})
+
+# Ask_OpenAI failure response shared by the specialist agents; copy with {**template}
+ASK_AI_ERROR_RESPONSE = MappingProxyType({
+    "action": "AI_ERROR",
+    "error": "No pude procesar tu consulta en este momento. ¿Te gustaría hablar con un especialista?",
+    "fallback": True
+})
+
+
+def keyword_pattern(*keywords: str) -> "re.Pattern[str]":
+    """Single compiled alternation matching any of ``keywords`` as a substring"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+def keyword_scanner(*keywords: str) -> "re.Pattern[str]":
+    """
+    Lookahead alternation: ``findall`` returns every keyword found in one pass,
+    overlapping ones included. A keyword that is a prefix of another one is
+    shadowed by it at the same position, so keep the lists prefix-free.
+    """
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile("(?=(%s))" % "|".join(map(re.escape, ordered)))
+
+
+def keyword_router(**routes: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    One compiled pattern for ordered keyword routes: ``match(text).lastgroup``
+    names the first route (in argument order) with a keyword anywhere in
+    ``text``, or there is no match.
+    """
+    return re.compile("|".join(
+        "(?=.*?(?:%s))(?P<%s>)" % ("|".join(map(re.escape, keywords)), name)
+        for name, keywords in routes.items()
+    ), re.DOTALL)
+
+
+# no_match fallback placeholder: intent routed from the lowercased input, then its reply.
+# suggested_actions are tuples so the shared templates stay read-only
+_FALLBACK_INTENT_ROUTER = keyword_router(
+    appointment=("cita", "appointment"),
+    medication=("medicamento", "medicina"),
+)
+_FALLBACK_RESPONSES = MappingProxyType({
+    "appointment": MappingProxyType({
+        "response": "Parece que quieres agendar una cita. Te dirijo al menú de citas.",
+        "suggested_actions": ("Agendar cita", "Ver citas existentes", "Menú principal"),
+        "confidence": 0.8
+    }),
+    "medication": MappingProxyType({
+        "response": "¿Necesitas información sobre medicamentos? Te ayudo con eso.",
+        "suggested_actions": ("Ver medicamentos", "Tutorial de medicamentos", "Contactar especialista"),
+        "confidence": 0.7
+    }),
+    None: MappingProxyType({
+        "response": "No estoy seguro de entender tu solicitud. ¿Podrías ser más específico?",
+        "suggested_actions": ("Menú principal", "Contactar soporte", "Intentar de nuevo"),
+        "confidence": 0.3
+    }),
+})
+
+
+def tool(func: Callable) -> Callable:
     """Temporary decorator for tool functions until ADK is available"""
     func._is_tool = True
     return func
 
 
-@dataclass
+class ActivityEventBuffer:
+    """
+    Coalesces activity events from concurrent sessions into batched
+    webhook deliveries: a single consumer task drains up to ``max_batch``
+    events, waiting at most ``max_delay`` seconds to fill a batch.
+    """
+    
+    __slots__ = ("_send_batch", "max_batch", "max_delay", "max_pending",
+                 "_queue", "_consumer", "_loop")
+    
+    def __init__(self, send_batch: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+                 max_batch: int = 50, max_delay: float = 0.05, max_pending: int = 10000):
+        self._send_batch = send_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def add(self, event: Dict[str, Any]) -> None:
+        """Enqueue an event without waiting for delivery"""
+        self._ensure_consumer()
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(
+                "Activity buffer full, dropping event %s", event.get("event_type"))
+    
+    async def flush(self) -> None:
+        """Wait until every queued event has been delivered"""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+    
+    async def aclose(self) -> None:
+        """Flush pending events and stop the consumer task"""
+        await self.flush()
+        if self._consumer is not None:
+            self._consumer.cancel()
+            self._consumer = None
+    
+    def _ensure_consumer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._consumer is None or self._consumer.done():
+            if self._loop is not loop:
+                # Queues are bound to the loop that first uses them
+                self._queue = asyncio.Queue(maxsize=self.max_pending)
+                self._loop = loop
+            self._consumer = loop.create_task(self._consume())
+    
+    async def _consume(self) -> None:
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except TimeoutError:
+                    break
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                logger.error("Failed to send activity batch: %s", e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+
+@dataclass(slots=True)
 class PatientContext:
     """Patient context from session parameters based on Conversational Agents analysis"""
     name_display: Optional[str] = None
@@ -43,14 +260,11 @@ class PatientContext:
     
     def __post_init__(self):
         if self.notification_preferences is None:
-            self.notification_preferences = {
-                "whatsapp": True,
-                "email": False,
-                "sms": False
-            }
+            # Shared read-only default; assign a new dict to change preferences
+            self.notification_preferences = _DEFAULT_NOTIFICATION_PREFERENCES
 
 
-@dataclass 
+@dataclass(slots=True)
 class SessionContext:
     """Enhanced session context based on Conversational Agents analysis"""
     user_context: Optional[str] = None  # UNKNOWN for new users
@@ -62,29 +276,53 @@ class SessionContext:
     # Enhanced session tracking from flows analysis
     session_start_time: Optional[str] = None
     last_activity_time: Optional[str] = None
-    flows_visited: List[str] = None
+    flows_visited: Set[str] = None
     actions_completed: List[str] = None
     errors_encountered: List[str] = None
     
     # Intent and routing context
     last_intent: Optional[str] = None
     last_intent_confidence: Optional[float] = None
-    routing_history: List[Dict[str, Any]] = None
+    routing_history: Deque[Dict[str, Any]] = None
     
     # Activity tracking for analytics
-    activity_events: List[Dict[str, Any]] = None
+    activity_events: Deque[Dict[str, Any]] = None
+    session_id: Optional[str] = None  # assigned by the agent when the session starts
     
     def __post_init__(self):
         if self.flows_visited is None:
-            self.flows_visited = []
+            self.flows_visited = set()
         if self.actions_completed is None:
             self.actions_completed = []
         if self.errors_encountered is None:
             self.errors_encountered = []
         if self.routing_history is None:
-            self.routing_history = []
+            self.routing_history = deque(maxlen=SESSION_HISTORY_SIZE)
         if self.activity_events is None:
-            self.activity_events = []
+            self.activity_events = deque(maxlen=SESSION_HISTORY_SIZE)
+    
+    def reset(self) -> None:
+        """Start a fresh session in place, reusing the tracking containers"""
+        self.user_context = None
+        self.patient = None
+        self.current_flow = None
+        self.current_page = None
+        self.last_message = None
+        self.session_start_time = None
+        self.last_activity_time = None
+        self.last_intent = None
+        self.last_intent_confidence = None
+        self.session_id = None
+        self.flows_visited.clear()
+        self.actions_completed.clear()
+        self.errors_encountered.clear()
+        self.routing_history.clear()
+        self.activity_events.clear()
+
+
+# Keyword arguments update_session_context can apply, by target
+_SESSION_FIELDS = frozenset(f.name for f in fields(SessionContext))
+_PATIENT_FIELDS = frozenset(f.name for f in fields(PatientContext))
 
 
 class BaseCliviAgent(ABC):
@@ -100,17 +338,107 @@ class BaseCliviAgent(ABC):
     This will be adapted to inherit from ADK Agent class once available.
     """
     
+    # Set when offline payment detection needs a backend call
+    OFFLINE_PAYMENT_CHECK_REQUIRES_IO = False
+    
+    # Common tool names for all Clivi agents based on analysis
+    TOOLS: Tuple[str, ...] = (
+        # Messaging tools (from SEND_MESSAGE analysis)
+        "send_template_message",
+        "send_interactive_message",
+
+        # Image processing tools (from photoScalePhoto analysis)
+        "process_scale_image",
+        "analyze_medical_image",
+
+        # Appointment management (from manageAppointment analysis)
+        "manage_appointment",
+        "schedule_appointment",
+        "reschedule_appointment",
+        "cancel_appointment",
+
+        # Measurement tracking (from logMeasurement analysis)
+        "log_measurement",
+        "get_measurement_history",
+        "generate_measurement_report",
+
+        # Generative AI tools (from askGenerativeAI analysis)
+        "ask_generative_ai",
+        "get_ai_recommendation",
+
+        # Flow control (from flows analysis)
+        "start_flow",
+        "check_plan_status",
+        "route_to_specialist",
+
+        # Help and support (from helpDeskSubMenu analysis)
+        "help_desk_submenu",
+        "technical_support",
+        "billing_support",
+
+        # Complaint handling (from presentComplaintTag analysis)
+        "present_complaint",
+        "submit_complaint",
+
+        # Session management
+        "end_session",
+        "extend_session",
+
+        # Activity tracking
+        "log_activity_event",
+        "track_user_interaction",
+    )
+    
+    # Pending fire-and-forget tasks; past this, new work waits for one to finish
+    MAX_BACKGROUND_TASKS = 1024
+    
+    # Per-class logger, resolved once when the subclass is defined
+    logger = logging.getLogger(__qualname__)
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.logger = logging.getLogger(cls.__name__)
+    
     def __init__(self, config: Config):
         self.config = config
-        self.logger = logging.getLogger(self.__class__.__name__)
         
-        # Session management
-        self._session_contexts: Dict[str, SessionContext] = {}
+        # Session management: idle sessions expire after session_timeout_minutes
+        # and at most session_cache_size are kept (see FlowSettings)
+        self.session_ttl_seconds = config.flows.session_timeout_minutes * 60
+        self.session_cache_size = config.flows.session_cache_size
+        # user_id -> (monotonic time of last access, SessionContext), least recent first
+        self._session_contexts: "OrderedDict[str, Tuple[float, SessionContext]]" = OrderedDict()
+        # user_id -> Lock held while a request updates that session; an entry
+        # disappears once no request holds or awaits it
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        
+        # Activity events pending webhook delivery (created on first event)
+        self._activity_buffer: Optional[ActivityEventBuffer] = None
+        # Read on every activity event; delivery needs an explicitly configured webhook
+        self._activity_logging_enabled = bool(
+            config.integrations.activity_logging_enabled and config.integrations.activity_webhook)
+        # Shared webhook client (created on first delivery) so batches reuse pooled connections
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # Fire-and-forget work (e.g. complaint delivery); strong refs until done
+        self._background_tasks: Set[asyncio.Task] = set()
+        
+        # (plan, plan_status) -> checkPlanStatus route; anything else goes to _route_unmatched_plan
+        self._plan_routes: Dict[Tuple[str, str], Callable[..., Awaitable[Dict[str, Any]]]] = {
+            **{(plan, status): self._route_main_menu
+               for plan in SPECIALIST_PLANS for status in ROUTABLE_STATUSES},
+            **{("CLUB", status): self._route_club_plan for status in ROUTABLE_STATUSES},
+            ("CLUB", "CANCELED"): self._route_club_canceled,
+        }
         
         # Initialize agent settings
         self.name = self.get_agent_name()
         self.model = config.base_agent.model
-        self.instructions = self.get_system_instructions()
+    
+    @functools.cached_property
+    def instructions(self) -> str:
+        """System instructions, built on first use"""
+        return self.get_system_instructions()
     
     @abstractmethod
     def get_agent_name(self) -> str:
@@ -122,68 +450,54 @@ class BaseCliviAgent(ABC):
         """Get agent-specific system instructions"""
         pass
     
-    def get_tools(self) -> List[str]:
-        """Get common tool names for all Clivi agents based on analysis"""
-        return [
-            # Messaging tools (from SEND_MESSAGE analysis)
-            "send_template_message",
-            "send_interactive_message",
-            
-            # Image processing tools (from photoScalePhoto analysis)
-            "process_scale_image", 
-            "analyze_medical_image",
-            
-            # Appointment management (from manageAppointment analysis)
-            "manage_appointment",
-            "schedule_appointment",
-            "reschedule_appointment",
-            "cancel_appointment",
-            
-            # Measurement tracking (from logMeasurement analysis)
-            "log_measurement",
-            "get_measurement_history",
-            "generate_measurement_report",
-            
-            # Generative AI tools (from askGenerativeAI analysis)
-            "ask_generative_ai",
-            "get_ai_recommendation",
-            
-            # Flow control (from flows analysis)
-            "start_flow",
-            "check_plan_status",
-            "route_to_specialist",
-            
-            # Help and support (from helpDeskSubMenu analysis)
-            "help_desk_submenu",
-            "technical_support",
-            "billing_support",
-            
-            # Complaint handling (from presentComplaintTag analysis)
-            "present_complaint",
-            "submit_complaint",
-            
-            # Session management
-            "end_session",
-            "extend_session",
-            
-            # Activity tracking
-            "log_activity_event",
-            "track_user_interaction"
-        ]
+    def get_tools(self) -> Tuple[str, ...]:
+        """Get tool names for this agent (shared per class)"""
+        return self.TOOLS
     
     def get_session_context(self, user_id: str) -> SessionContext:
-        """Get or create session context for user"""
-        if user_id not in self._session_contexts:
-            self._session_contexts[user_id] = SessionContext()
-        return self._session_contexts[user_id]
+        """Get or create session context for user (expired sessions start over)"""
+        now = time.monotonic()
+        sessions = self._session_contexts
+        entry = sessions.get(user_id)
+        if entry is None:
+            context = SessionContext()
+        else:
+            context = entry[1]
+            if now - entry[0] >= self.session_ttl_seconds:
+                # Expired: the same user's context is recycled, never another user's
+                context.reset()
+        if context.session_id is None:
+            context.session_id = f"session_{user_id}_{secrets.randbits(16):04x}"
+        sessions[user_id] = (now, context)
+        sessions.move_to_end(user_id)
+        
+        # Least recent first: drop expired sessions, then trim to size
+        while len(sessions) > 1:
+            oldest_access = next(iter(sessions.values()))[0]
+            if now - oldest_access < self.session_ttl_seconds and len(sessions) <= self.session_cache_size:
+                break
+            sessions.popitem(last=False)
+        return context
+    
+    def session_lock(self, user_id: str) -> asyncio.Lock:
+        """
+        Per-user lock for session read-modify-write sequences that span an
+        await (e.g. plan status routing). Hold it only around the session
+        update, never around slow I/O such as AI calls. get_session_context
+        itself never awaits, so the store needs no lock.
+        """
+        lock = self._session_locks.get(user_id)
+        if lock is None:
+            lock = self._session_locks[user_id] = asyncio.Lock()
+        return lock
     
-    def update_session_context(self, user_id: str, **kwargs):
+    def update_session_context(self, user_id: str, **kwargs: Any) -> None:
         """Update session context with new data"""
         context = self.get_session_context(user_id)
         for key, value in kwargs.items():
-            if hasattr(context, key):
+            if key in _SESSION_FIELDS:
                 setattr(context, key, value)
-            elif hasattr(context, 'patient') and hasattr(context.patient, key):
+            elif key in _PATIENT_FIELDS and isinstance(context.patient, PatientContext):
                 setattr(context.patient, key, value)
     
     @tool
@@ -194,13 +508,13 @@ class BaseCliviAgent(ABC):
         
         Based on: Default Start Flow → checkPlanStatus routing
         """
-        self.logger.info(f"Starting flow for user {user_id} with intent {intent}")
+        self.logger.info("Starting flow for user %s with intent %s", user_id, intent)
         
         context = self.get_session_context(user_id)
         context.current_flow = "start_flow"
         
         # Route based on intent (from analysis)
-        if intent in ["keyWordMainMenu", "END_SESSION_TEMPLATE"]:
+        if intent in _PLAN_CHECK_INTENTS:
             return await self.check_plan_status(user_id)
         
         # Default fallback to plan status check
@@ -217,96 +531,80 @@ class BaseCliviAgent(ABC):
         - Routes to appropriate flows based on plan/status combination
         - Handles special cases like offline payments and club cancellations
         """
-        self.logger.info(f"Checking plan status for user {user_id}")
+        # The route reads the patient and updates the session across awaits
+        async with self.session_lock(user_id):
+            return await self._check_plan_status(user_id)
+    
+    async def _check_plan_status(self, user_id: str) -> Dict[str, Any]:
+        """check_plan_status body; runs holding the user's session lock"""
+        self.logger.info("Checking plan status for user %s", user_id)
         
         context = self.get_session_context(user_id)
         context.current_flow = "checkPlanStatus"
+        # One clock read shared by every event this check logs
+        now = utc_now().isoformat()
         
         # Track this activity event
-        await self._log_activity_event(user_id, "PLAN_STATUS_CHECK_STARTED")
+        self._log_activity_event(user_id, "PLAN_STATUS_CHECK_STARTED", timestamp=now)
         
         # Handle unknown user context - redirect to user problems flow
         if context.user_context == "UNKNOWN" or not context.patient:
-            await self._log_activity_event(user_id, "UNKNOWN_USER_DETECTED")
-            return {
-                "action": "redirect",
-                "target": "user_problems_flow",
-                "message": "Bienvenido a Dr. Clivi. Para ofrecerte el mejor servicio, necesitamos conocer tu información.",
-                "next_steps": [
-                    "Proporcionar número de teléfono",
-                    "Verificar identidad",
-                    "Configurar perfil"
-                ]
-            }
+            self._log_activity_event(user_id, "UNKNOWN_USER_DETECTED", timestamp=now)
+            return {**_UNKNOWN_USER_RESPONSE, "next_steps": list(_UNKNOWN_USER_RESPONSE["next_steps"])}
         
         patient = context.patient
         plan = patient.get("plan") if isinstance(patient, dict) else patient.plan
         plan_status = patient.get("plan_status") if isinstance(patient, dict) else patient.plan_status
         
-        self.logger.info(f"User {user_id} has plan: {plan}, status: {plan_status}")
-        
-        # Plan-based routing logic from checkPlanStatus conditions analysis
-        
-        # Handle PRO, PLUS, BASIC plans with ACTIVE/SUSPENDED status
-        if plan in ["PRO", "PLUS", "BASIC"] and plan_status in ["ACTIVE", "SUSPENDED"]:
-            # Check for offline payments intent (specific condition from analysis)
-            if await self._check_offline_payment_intent(user_id):
-                await self._log_activity_event(user_id, "OFFLINE_PAYMENT_FLOW_STARTED")
-                return await self.handle_offline_payments(user_id)
-            
-            # Standard routing to specialized agent menu
-            await self._log_activity_event(user_id, "MAIN_MENU_FLOW_STARTED", {"plan": plan, "status": plan_status})
-            return await self.main_menu_flow(user_id)
-            
-        # Handle CLUB plan with ACTIVE/SUSPENDED status
-        elif plan == "CLUB" and plan_status in ["ACTIVE", "SUSPENDED"]:
-            await self._log_activity_event(user_id, "CLUB_PLAN_FLOW_STARTED", {"status": plan_status})
-            return await self.club_plan_flow(user_id)
-            
-        # Handle CLUB plan with CANCELED status - specific redirect
-        elif plan == "CLUB" and plan_status == "CANCELED":
-            await self._log_activity_event(user_id, "CLUB_CANCELED_PLAN_ACCESSED")
-            return {
-                "action": "redirect", 
-                "target": "club_canceled_plan",
-                "message": "Tu plan Club ha sido cancelado. ¿Te gustaría reactivarlo?",
-                "options": [
-                    {"id": "REACTIVATE_CLUB", "title": "Reactivar Plan Club"},
-                    {"id": "VIEW_OTHER_PLANS", "title": "Ver otros planes"},
-                    {"id": "CONTACT_SUPPORT", "title": "Contactar soporte"}
-                ]
-            }
-        
+        self.logger.info("User %s has plan: %s, status: %s", user_id, plan, plan_status)
+        
+        # Plan-based routing from the checkPlanStatus conditions analysis
+        handler = self._plan_routes.get((plan, plan_status), self._route_unmatched_plan)
+        return await handler(user_id, plan, plan_status, now)
+    
+    async def _route_main_menu(self, user_id: str, plan: str, plan_status: str, now: str) -> Dict[str, Any]:
+        """PRO, PLUS, BASIC plans with ACTIVE/SUSPENDED status"""
+        # Check for offline payments intent (specific condition from analysis)
+        if self._check_offline_payment_intent(user_id) or (
+            self.OFFLINE_PAYMENT_CHECK_REQUIRES_IO
+            and await self._fetch_offline_payment_intent(user_id)
+        ):
+            self._log_activity_event(user_id, "OFFLINE_PAYMENT_FLOW_STARTED", timestamp=now)
+            return await self.handle_offline_payments(user_id)
+        
+        # Standard routing to specialized agent menu
+        self._log_activity_event(user_id, "MAIN_MENU_FLOW_STARTED", {"plan": plan, "status": plan_status}, timestamp=now)
+        return await self.main_menu_flow(user_id)
+    
+    async def _route_club_plan(self, user_id: str, plan: str, plan_status: str, now: str) -> Dict[str, Any]:
+        """CLUB plan with ACTIVE/SUSPENDED status"""
+        self._log_activity_event(user_id, "CLUB_PLAN_FLOW_STARTED", {"status": plan_status}, timestamp=now)
+        return await self.club_plan_flow(user_id)
+    
+    async def _route_club_canceled(self, user_id: str, plan: str, plan_status: str, now: str) -> Dict[str, Any]:
+        """CLUB plan with CANCELED status - specific redirect"""
+        self._log_activity_event(user_id, "CLUB_CANCELED_PLAN_ACCESSED", timestamp=now)
+        return {**_CLUB_CANCELED_RESPONSE, "options": list(_CLUB_CANCELED_RESPONSE["options"])}
+    
+    async def _route_unmatched_plan(self, user_id: str, plan: str, plan_status: str, now: str) -> Dict[str, Any]:
+        """Combinations without a route: non-CLUB cancellations, unknown plans, fallback"""
         # Handle any plan with CANCELED status (non-CLUB)
-        elif plan_status == "CANCELED":
-            await self._log_activity_event(user_id, "CANCELED_PLAN_ACCESSED", {"plan": plan})
+        if plan_status == "CANCELED":
+            self._log_activity_event(user_id, "CANCELED_PLAN_ACCESSED", {"plan": plan}, timestamp=now)
             return {
-                "action": "redirect",
-                "target": "plan_reactivation_flow",
-                "message": f"Tu plan {plan} ha sido cancelado. Te ayudamos a reactivarlo.",
+                **_PLAN_CANCELED_RESPONSE,
+                "message": _PLAN_CANCELED_MESSAGE.format(plan=plan),
                 "plan_type": plan
             }
         
         # Handle unrecognized plan types
-        elif plan not in ["PRO", "PLUS", "BASIC", "CLUB"]:
-            await self._log_activity_event(user_id, "UNRECOGNIZED_PLAN_TYPE", {"plan": plan})
-            return {
-                "action": "error",
-                "message": "Tu tipo de plan no es reconocido. Por favor contacta soporte técnico.",
-                "error_code": "INVALID_PLAN_TYPE",
-                "support_contact": True
-            }
+        if plan not in KNOWN_PLANS:
+            self._log_activity_event(user_id, "UNRECOGNIZED_PLAN_TYPE", {"plan": plan}, timestamp=now)
+            return dict(_INVALID_PLAN_RESPONSE)
         
         # Default fallback for any unhandled cases
-        await self._log_activity_event(user_id, "PLAN_STATUS_CHECK_FALLBACK", {"plan": plan, "status": plan_status})
-        return {
-            "action": "error",
-            "message": "No pudimos determinar tu tipo de plan o estado. Por favor contacta soporte.",
-            "error_code": "PLAN_STATUS_UNDETERMINED",
-            "plan": plan,
-            "status": plan_status,
-            "support_contact": True
-        }
+        self._log_activity_event(user_id, "PLAN_STATUS_CHECK_FALLBACK", {"plan": plan, "status": plan_status}, timestamp=now)
+        return {**_PLAN_UNDETERMINED_RESPONSE, "plan": plan, "status": plan_status}
     
     @abstractmethod
     async def main_menu_flow(self, user_id: str) -> Dict[str, Any]:
@@ -323,7 +621,7 @@ class BaseCliviAgent(ABC):
         context.current_flow = "clubPlan"
         
         # Log activity event (from flows analysis)
-        await self._log_activity_event(user_id, "STARTED_SESSION_DATE")
+        self._log_activity_event(user_id, "STARTED_SESSION_DATE")
         
         return {
             "action": "menu",
@@ -377,7 +675,10 @@ class BaseCliviAgent(ABC):
             }
         
         # Process complaint (TODO: integrate with Clivi platform via n8n webhook)
-        complaint_id = await self._submit_complaint(user_id, complaint_text)
+        # The ID is assigned locally, so the confirmation does not wait for delivery
+        complaint_id = self._new_complaint_id(user_id, complaint_text)
+        await self._spawn_background(
+            self._submit_complaint(user_id, complaint_id, complaint_text), "complaint submission")
         
         return {
             "action": "confirmation",
@@ -396,7 +697,7 @@ class BaseCliviAgent(ABC):
         context.current_flow = "END_SESSION"
         
         # Log session end event
-        await self._log_activity_event(user_id, "SESSION_ENDED", {"reason": reason})
+        self._log_activity_event(user_id, "SESSION_ENDED", {"reason": reason})
         
         return {
             "action": "end_session",
@@ -416,7 +717,7 @@ class BaseCliviAgent(ABC):
         context = self.get_session_context(user_id)
         context.current_flow = "offline_payments"
         
-        await self._log_activity_event(user_id, "OFFLINE_PAYMENTS_ACCESSED")
+        self._log_activity_event(user_id, "OFFLINE_PAYMENTS_ACCESSED")
         
         return {
             "action": "menu",
@@ -446,69 +747,133 @@ class BaseCliviAgent(ABC):
             ]
         }
 
-    async def _check_offline_payment_intent(self, user_id: str) -> bool:
+    def _check_offline_payment_intent(self, user_id: str) -> bool:
         """
         Check if user has offline payment intent.
         Based on specific condition identified in checkPlanStatus flow.
+        Synchronous: only inspects in-process session state.
         """
         # TODO: Implement logic to detect offline payment intent
         # This could be based on previous interactions, payment history, etc.
         return False
     
-    async def _log_activity_event(self, user_id: str, event_type: str, params: Dict = None):
+    async def _fetch_offline_payment_intent(self, user_id: str) -> bool:
+        """
+        Backend lookup for offline payment intent. Only awaited when
+        OFFLINE_PAYMENT_CHECK_REQUIRES_IO is set.
+        """
+        return False
+    
+    def _log_activity_event(self, user_id: str, event_type: str, params: Dict = None,
+                            timestamp: str = None) -> None:
         """
         Enhanced activity event logging based on flows analysis.
         Tracks user interactions for analytics and session management.
+        ``timestamp`` lets callers reuse a clock read they already made.
         """
         if params is None:
-            params = {}
+            params = _EMPTY_PARAMS
+        context = self.get_session_context(user_id)
             
         # Add timestamp and session context
-        import datetime
         event_data = {
             "user_id": user_id,
             "event_type": event_type,
-            "timestamp": datetime.datetime.utcnow().isoformat(),
-            "session_id": self._get_session_id(user_id),
+            "timestamp": timestamp or utc_now().isoformat(),
+            "session_id": context.session_id,
             **params
         }
         
         # Add to session context for tracking
-        context = self.get_session_context(user_id)
         context.activity_events.append(event_data)
         
-        self.logger.info(f"Activity event: {event_type} for user {user_id}")
+        self.logger.info("Activity event: %s for user %s", event_type, user_id)
         
-        # Send to analytics endpoint if configured
-        if self.config.integrations.activity_logging_enabled:
-            await self._send_activity_to_webhook(event_data)
+        # Send to analytics endpoint if configured (batched, see ActivityEventBuffer)
+        if self._activity_logging_enabled:
+            self._get_activity_buffer().add(event_data)
+    
+    def _get_activity_buffer(self) -> ActivityEventBuffer:
+        if self._activity_buffer is None:
+            integrations = self.config.integrations
+            self._activity_buffer = ActivityEventBuffer(
+                self._send_activity_batch_to_webhook,
+                max_batch=integrations.activity_batch_size,
+                max_delay=integrations.activity_batch_delay_ms / 1000
+            )
+        return self._activity_buffer
     
-    async def _send_activity_to_webhook(self, event_data: Dict[str, Any]):
-        """Send activity event to n8n webhook for analytics"""
+    async def _send_activity_batch_to_webhook(self, events: List[Dict[str, Any]]) -> None:
+        """Send a batch of activity events to n8n webhook for analytics"""
         try:
-            # TODO: Implement actual webhook call
-            # This would send to self.config.integrations.activity_webhook
-            pass
+            response = await self._get_http_client().post(
+                self.config.integrations.activity_webhook, json={"events": events})
+            response.raise_for_status()
         except Exception as e:
-            self.logger.error(f"Failed to send activity event: {e}")
+            self.logger.error("Failed to send activity events: %s", e)
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(limits=_WEBHOOK_LIMITS, timeout=_WEBHOOK_TIMEOUT_SECONDS)
+        return self._http_client
     
     def _get_session_id(self, user_id: str) -> str:
-        """Generate or retrieve session ID for user"""
-        # TODO: Implement proper session ID management
-        return f"session_{user_id}_{hash(user_id) % 10000:04d}"
+        """Session ID for user, assigned once per session by get_session_context"""
+        return self.get_session_context(user_id).session_id
+    
+    def _new_complaint_id(self, user_id: str, complaint_text: str) -> str:
+        """Complaint ID shown to the user (random suffix, no clock read)"""
+        return f"COMP-{user_id[-4:]}-{uuid.uuid4().hex[:8].upper()}"
     
-    async def _submit_complaint(self, user_id: str, complaint_text: str) -> str:
+    async def _submit_complaint(self, user_id: str, complaint_id: str, complaint_text: str) -> None:
         """Submit complaint to Clivi platform via n8n webhook"""
         # TODO: Implement actual webhook call to Clivi complaint system
-        return f"COMP-{user_id[-4:]}-{hash(complaint_text) % 10000:04d}"
+        pass
+    
+    async def _spawn_background(self, coro: Awaitable, description: str) -> asyncio.Task:
+        """
+        Run ``coro`` without awaiting it; failures are logged, not raised.
+        Only waits when MAX_BACKGROUND_TASKS are already pending.
+        """
+        try:
+            while len(self._background_tasks) >= self.MAX_BACKGROUND_TASKS:
+                await asyncio.wait(self._background_tasks, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            coro.close()
+            raise
+        task = asyncio.ensure_future(coro)
+        self._background_tasks.add(task)
+        
+        def _done(task: asyncio.Task) -> None:
+            self._background_tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("Background %s failed: %s", description, task.exception())
+        
+        task.add_done_callback(_done)
+        return task
+    
+    async def aclose(self) -> None:
+        """Wait for background work and pending activity events, then close the webhook client"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self._activity_buffer is not None:
+            await self._activity_buffer.aclose()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    async def __aenter__(self) -> "BaseCliviAgent":
+        return self
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
     
     def _calculate_session_duration(self, user_id: str) -> int:
         """Calculate session duration in minutes"""
         context = self.get_session_context(user_id)
         if context.session_start_time:
-            import datetime
             start_time = datetime.datetime.fromisoformat(context.session_start_time)
-            current_time = datetime.datetime.utcnow()
+            current_time = utc_now()
             duration = (current_time - start_time).total_seconds() / 60
             return int(duration)
         return 0
@@ -516,20 +881,22 @@ class BaseCliviAgent(ABC):
     def _get_flows_visited(self, user_id: str) -> List[str]:
         """Get list of flows visited in session"""
         context = self.get_session_context(user_id)
-        return list(set(context.flows_visited))  # Return unique flows
+        return list(context.flows_visited)
     
     def _get_actions_completed(self, user_id: str) -> List[str]:
         """Get list of actions completed in session"""
         context = self.get_session_context(user_id)
         return context.actions_completed
     
-    def _get_patient_attr(self, patient, attr, default=None):
+    def _get_patient_attr(self, patient: Union[Dict[str, Any], PatientContext], attr: str,
+                          default: Any = None) -> Any:
         """Helper method to safely get patient attributes from dict or object"""
         if isinstance(patient, dict):
             return patient.get(attr, default)
         return getattr(patient, attr, default)
 
-    def _set_patient_attr(self, patient, attr, value):
+    def _set_patient_attr(self, patient: Union[Dict[str, Any], PatientContext], attr: str,
+                          value: Any) -> None:
         """Helper method to safely set patient attributes for dict or object"""
         if isinstance(patient, dict):
             patient[attr] = value
@@ -541,19 +908,20 @@ class BaseCliviAgent(ABC):
         Enhanced no-match default event handling.
         Routes to MASTER_AGENT (generative AI) from flows analysis.
         """
-        self.logger.info(f"No match fallback for user {user_id}: {user_input}")
+        self.logger.info("No match fallback for user %s: %s", user_id, user_input)
         
         context = self.get_session_context(user_id)
+        now = utc_now().isoformat()
         context.errors_encountered.append({
             "type": "no_match",
             "user_input": user_input,
-            "timestamp": datetime.datetime.utcnow().isoformat()
+            "timestamp": now
         })
         
-        await self._log_activity_event(user_id, "NO_MATCH_FALLBACK", {
+        self._log_activity_event(user_id, "NO_MATCH_FALLBACK", {
             "user_input": user_input,
             "current_flow": context.current_flow
-        })
+        }, timestamp=now)
         
         # Use generative AI for intelligent fallback response
         try:
@@ -563,15 +931,15 @@ class BaseCliviAgent(ABC):
                 "message": ai_response.get("response", "No entendí completamente tu solicitud."),
                 "user_input": user_input,
                 "confidence": ai_response.get("confidence", 0.0),
-                "suggested_actions": ai_response.get("suggested_actions", [
+                "suggested_actions": list(ai_response.get("suggested_actions", (
                     "Ir al menú principal", 
                     "Contactar soporte", 
                     "Intentar de nuevo"
-                ]),
+                ))),
                 "fallback_type": "generative_ai"
             }
         except Exception as e:
-            self.logger.error(f"Generative AI fallback failed: {e}")
+            self.logger.error("Generative AI fallback failed: %s", e)
             return {
                 "action": "fallback",
                 "message": "No entendí completamente tu solicitud. ¿Podrías ser más específico?",
@@ -585,7 +953,7 @@ class BaseCliviAgent(ABC):
         Enhanced no-input default event handling.
         Routes to End Session from flows analysis with improved session management.
         """
-        await self._log_activity_event(user_id, "NO_INPUT_TIMEOUT", {
+        self._log_activity_event(user_id, "NO_INPUT_TIMEOUT", {
             "timeout_duration": self.config.flows.no_input_timeout_seconds
         })
         
@@ -602,21 +970,5 @@ class BaseCliviAgent(ABC):
         # This would use the askGenerativeAI tool or similar
         
         # Placeholder response based on context
-        if "cita" in user_input.lower() or "appointment" in user_input.lower():
-            return {
-                "response": "Parece que quieres agendar una cita. Te dirijo al menú de citas.",
-                "suggested_actions": ["Agendar cita", "Ver citas existentes", "Menú principal"],
-                "confidence": 0.8
-            }
-        elif "medicamento" in user_input.lower() or "medicina" in user_input.lower():
-            return {
-                "response": "¿Necesitas información sobre medicamentos? Te ayudo con eso.",
-                "suggested_actions": ["Ver medicamentos", "Tutorial de medicamentos", "Contactar especialista"],
-                "confidence": 0.7
-            }
-        else:
-            return {
-                "response": "No estoy seguro de entender tu solicitud. ¿Podrías ser más específico?",
-                "suggested_actions": ["Menú principal", "Contactar soporte", "Intentar de nuevo"],
-                "confidence": 0.3
-            }
+        match = _FALLBACK_INTENT_ROUTER.match(user_input.lower())
+        return dict(_FALLBACK_RESPONSES[match.lastgroup if match else None])
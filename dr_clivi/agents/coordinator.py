@@ -3,13 +3,29 @@ Dr. Clivi Intelligent Coordinator - Routes complex queries using Gemini 2.5 Flas
 Handles cases that escape deterministic flows and need AI interpretation.
 """
 
+import asyncio
+import importlib
+import inspect
+import json
 import logging
+import time
+from collections import OrderedDict
+from types import MappingProxyType
 from typing import Any, Dict, List, Optional, Tuple
 
-from .base_agent import BaseCliviAgent, SessionContext, PatientContext, tool
-from .diabetes_agent import DiabetesAgent
-from .obesity_agent import ObesityAgent
+from .base_agent import (
+    BaseCliviAgent,
+    SessionContext,
+    PatientContext,
+    OFFLINE_PAYMENT_PLANS,
+    ROUTABLE_STATUSES,
+    SPECIALIST_PLANS,
+    keyword_scanner,
+    tool
+)
 from ..config import Config
+from ..log_context import bind_request, reset_request
+from ..tools import generative_ai
 from ..flows.deterministic_handler import (
     DeterministicFlowHandler, 
     UserContext, 
@@ -19,6 +35,152 @@ from ..flows.deterministic_handler import (
 
 logger = logging.getLogger(__name__)
 
+# Specialist key -> "module:Class", imported on first use
+SPECIALIST_AGENTS = {
+    "diabetes": ".diabetes_agent:DiabetesAgent",
+    "obesity": ".obesity_agent:ObesityAgent",
+}
+
+_resolved_specialists: Dict[str, type] = {}
+
+# _fallback_keyword_analysis keywords, checked in this order
+_EMERGENCY_KEYWORDS = (
+    "dolor pecho", "no puedo respirar", "dificultad respirar", "muy fuerte",
+    "severo", "grave", "urgente", "emergencia", "auxilio"
+)
+_DIABETES_KEYWORDS = (
+    "glucosa", "diabetes", "diabético", "azúcar", "mg/dl", "mg/dL",
+    "metformina", "insulina", "hipoglucemia", "hiperglucemia",
+    "glucómetro", "hemoglobina", "hba1c"
+)
+_OBESITY_KEYWORDS = (
+    "peso", "bajar", "adelgazar", "obesidad", "ozempic", "saxenda",
+    "dieta", "ejercicio", "imc", "gordura", "grasa"
+)
+_FALLBACK_KEYWORDS_RE = keyword_scanner(*_EMERGENCY_KEYWORDS, *_DIABETES_KEYWORDS, *_OBESITY_KEYWORDS)
+
+# identify_user_needs keywords
+_ROUTING_DIABETES_KEYWORDS = (
+    "glucosa", "azucar", "diabetes", "insulina", "glp", "ozempic", 
+    "saxenda", "wegovy", "endocrinologo", "hemoglobina", "hba1c",
+    "glucometro", "tiras", "puncion"
+)
+_ROUTING_OBESITY_KEYWORDS = (
+    "peso", "bajar", "adelgazar", "dieta", "ejercicio", "obesidad",
+    "grasa", "imc", "cintura", "cadera", "entrenamiento", "cardio",
+    "nutricion", "medicina deportiva"
+)
+_ROUTING_KEYWORDS_RE = keyword_scanner(*_ROUTING_DIABETES_KEYWORDS, *_ROUTING_OBESITY_KEYWORDS)
+
+# Static parts of coordinator responses; handlers copy them with {**template, ...}
+MASTER_AGENT_ESCALATION = MappingProxyType({
+    "response_type": "master_agent_escalation",
+    "fallback_message": "Disculpa, necesito transferirte con un especialista humano. En un momento te contactaremos.",
+    "routing_type": "fallback"
+})
+GENERAL_QUERY_RESPONSE = MappingProxyType({
+    "response_type": "general_response",
+    "response": "Entiendo tu consulta. ¿Te gustaría que te muestre el menú principal para ayudarte mejor?",
+    "suggested_action": "show_main_menu",
+    "routing_type": "general"
+})
+NAVIGATION_ERROR_RESPONSE = MappingProxyType({
+    "response_type": "general_response",
+    "response": "Navegación no disponible. Regresando al menú principal.",
+    "suggested_action": "show_main_menu",
+    "routing_type": "navigation_error"
+})
+SESSION_END_RESPONSE = MappingProxyType({
+    "response_type": "general_response",
+    "response": "Sesión finalizada. ¡Que tengas un buen día!",
+    "routing_type": "session_end"
+})
+UNKNOWN_ACTION_RESPONSE = MappingProxyType({
+    "response_type": "general_response",
+    "response": "Acción no reconocida. Regresando al menú principal.",
+    "routing_type": "unknown_action"
+})
+
+
+# analyze_medical_query prompt: only the header is formatted per query,
+# the static classification guide is reused as-is
+MEDICAL_ANALYSIS_PROMPT_HEADER = """
+Eres el analizador de consultas médicas de Dr. Clivi. Tu trabajo es clasificar con precisión las consultas de pacientes para rutearlas al especialista correcto.
+
+CONSULTA DEL PACIENTE: "{user_input}"
+
+INFORMACIÓN DEL PACIENTE:
+- Plan: {plan}
+- Historial: {history}
+"""
+MEDICAL_ANALYSIS_PROMPT_GUIDE = """
+ESPECIALIDADES DISPONIBLES:
+
+1. **diabetes** - Para consultas sobre:
+   - Glucosa, niveles de azúcar, mg/dL
+   - Diabetes tipo 1, tipo 2, gestacional
+   - Medicamentos: metformina, insulina, glibenclamida
+   - Hipoglucemia, hiperglucemia
+   - Complicaciones diabéticas
+   - Monitoreo de glucosa
+   - Hemoglobina glucosilada (HbA1c)
+
+2. **obesity** - Para consultas sobre:
+   - Pérdida de peso, bajar de peso
+   - Medicamentos GLP-1: Ozempic, Saxenda, Wegovy
+   - Dieta, nutrición, alimentación
+   - Ejercicio, actividad física
+   - IMC, obesidad
+   - Cirugía bariátrica
+
+3. **emergency** - Para emergencias médicas:
+   - Dolor de pecho, dificultad respiratoria
+   - Hipoglucemia severa (<70 mg/dL)
+   - Hiperglucemia extrema (>300 mg/dL)
+   - Síntomas de cetoacidosis
+   - Reacciones adversas graves
+   - "muy fuerte", "intenso", "no puedo respirar"
+
+4. **general** - Para todo lo demás:
+   - Citas, facturas, quejas
+   - Hipertensión, otras condiciones
+   - Preguntas generales de salud
+   - Información sobre medicamentos no especializados
+
+NIVELES DE URGENCIA:
+- **critical**: Emergencias que requieren atención inmediata
+- **high**: Problemas serios que necesitan respuesta rápida
+- **medium**: Consultas importantes pero no urgentes
+- **low**: Preguntas informativas o de rutina
+
+INSTRUCCIONES:
+1. Analiza CUIDADOSAMENTE las palabras clave en la consulta
+2. Busca síntomas específicos de diabetes u obesidad
+3. Evalúa la urgencia basándote en la severidad
+4. Si hay palabras de emergencia, clasifica como "emergency"
+5. Responde ÚNICAMENTE con el JSON solicitado
+
+FORMATO DE RESPUESTA (JSON válido):
+{
+    "specialty": "diabetes|obesity|general|emergency",
+    "urgency": "low|medium|high|critical",
+    "confidence": 0.0-1.0,
+    "reasoning": "explicación breve de por qué elegiste esta especialidad",
+    "suggested_action": "acción recomendada",
+    "keywords_detected": ["palabra1", "palabra2", "palabra3"]
+}
+        """
+
+
+def _resolve_specialist(key: str) -> type:
+    """Import the specialist agent class for ``key`` once per process"""
+    agent_class = _resolved_specialists.get(key)
+    if agent_class is None:
+        module_name, class_name = SPECIALIST_AGENTS[key].split(":")
+        module = importlib.import_module(module_name, __package__)
+        agent_class = _resolved_specialists[key] = getattr(module, class_name)
+    return agent_class
+
 
 class IntelligentCoordinator(BaseCliviAgent):
     """
@@ -31,18 +193,45 @@ class IntelligentCoordinator(BaseCliviAgent):
     4. Falls back to MASTER_AGENT for unresolvable cases
     """
     
+    # Coordinator-specific tools on top of the common ones
+    TOOLS = BaseCliviAgent.TOOLS + (
+        "analyze_medical_query",
+        "route_to_specialist",
+        "handle_emergency",
+        "escalate_to_master_agent",
+        "check_deterministic_flow",
+    )
+    
+    # Requests of a batch processed at the same time
+    BATCH_MAX_CONCURRENCY = 8
+    
+    # route_deterministic_input action -> handler(user_context, user_input, result);
+    # unlisted actions are returned as-is
+    DETERMINISTIC_ACTION_HANDLERS = {
+        "show_main_menu": "_deterministic_main_menu",
+        "navigate_to_page": "_deterministic_page_navigation",
+        "page_transition": "_deterministic_page_transition",
+        "trigger_intelligent_routing": "_deterministic_escalation"
+    }
+    
     def __init__(self, config: Config):
         super().__init__(config)
         
         # Deterministic flow handler for structured interactions
         self.flow_handler = DeterministicFlowHandler(config)
         
-        # Specialized agents for complex cases
-        self.diabetes_agent = DiabetesAgent(config)
-        self.obesity_agent = ObesityAgent(config)
+        # Specialized agents for complex cases, built on first use
+        self._specialists: Dict[str, BaseCliviAgent] = {}
         
-        # Import and initialize AI tools
-        from ..tools import generative_ai
+        # User context cache limits (see CoordinatorAgentSettings)
+        self.user_context_ttl_seconds = config.coordinator_agent.user_context_ttl_seconds
+        self.user_context_cache_size = config.coordinator_agent.user_context_cache_size
+        # user_id -> (monotonic timestamp, UserContext), oldest first
+        self._user_context_cache: "OrderedDict[str, Tuple[float, UserContext]]" = OrderedDict()
+        # user_id -> pending lookup shared by concurrent first callers
+        self._user_context_inflight: Dict[str, asyncio.Task] = {}
+        
+        # AI tools
         self.generative_ai_tool = generative_ai
         
         # Routing statistics
@@ -54,6 +243,25 @@ class IntelligentCoordinator(BaseCliviAgent):
             "master_agent_fallbacks": 0
         }
     
+    def _get_specialist(self, key: str) -> BaseCliviAgent:
+        agent = self._specialists.get(key)
+        if agent is None:
+            agent = self._specialists[key] = _resolve_specialist(key)(self.config)
+        return agent
+    
+    async def aclose(self) -> None:
+        """Close the specialists built so far, then this agent"""
+        await asyncio.gather(*(agent.aclose() for agent in self._specialists.values()))
+        await super().aclose()
+    
+    @property
+    def diabetes_agent(self) -> BaseCliviAgent:
+        return self._get_specialist("diabetes")
+    
+    @property
+    def obesity_agent(self) -> BaseCliviAgent:
+        return self._get_specialist("obesity")
+    
     def get_agent_name(self) -> str:
         return "dr-clivi-intelligent-coordinator"
     
@@ -87,35 +295,54 @@ class IntelligentCoordinator(BaseCliviAgent):
         Responde SIEMPRE en español, sé empático y directo.
         """
     
-    def get_tools(self) -> List[str]:
-        """Get coordinator-specific tools"""
-        base_tools = super().get_tools()
-        coordinator_tools = [
-            "analyze_medical_query",
-            "route_to_specialist", 
-            "handle_emergency",
-            "escalate_to_master_agent",
-            "check_deterministic_flow"
-        ]
-        return base_tools + coordinator_tools
-    
     @tool
     async def process_user_input(self, user_id: str, user_input: str, 
                                phone_number: str = None) -> Dict[str, Any]:
         """
         Main entry point - decides between deterministic flows vs AI routing.
+        Binds user_id/query_id to the logging context for the whole request.
+        """
+        tokens = bind_request(user_id)
+        try:
+            # Get or create user context. On a cache miss the lookup is started
+            # first so its I/O overlaps the input classification below
+            user_context = self._peek_user_context(user_id)
+            context_task = None
+            if user_context is None:
+                context_task = asyncio.shield(self._user_context_lookup(user_id, phone_number))
+                await asyncio.sleep(0)
+            
+            # If classification raises, the shared lookup is left to finish and
+            # fill the cache: other callers may be awaiting it
+            is_deterministic = self.flow_handler.is_deterministic_input(user_input)
+            if context_task is not None:
+                user_context = await context_task
+            
+            # First check: Is this a deterministic flow interaction?
+            if is_deterministic:
+                self._routing_stats["deterministic_routes"] += 1
+                return await self._handle_deterministic_flow(user_context, user_input)
+            
+            # Second check: Does this need intelligent routing?
+            self._routing_stats["ai_routes"] += 1
+            return await self._handle_intelligent_routing(user_context, user_input)
+        finally:
+            reset_request(tokens)
+    
+    async def process_user_inputs_batch(self, requests: List[Tuple[str, ...]],
+                                        max_concurrency: int = None) -> List[Dict[str, Any]]:
         """
-        # Get or create user context
-        user_context = await self._get_user_context(user_id, phone_number)
+        Process several (user_id, user_input[, phone_number]) requests concurrently.
+        Results keep the order of ``requests``; at most ``max_concurrency``
+        (default BATCH_MAX_CONCURRENCY) are in flight at once.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.BATCH_MAX_CONCURRENCY)
         
-        # First check: Is this a deterministic flow interaction?
-        if self.flow_handler.is_deterministic_input(user_input):
-            self._routing_stats["deterministic_routes"] += 1
-            return await self._handle_deterministic_flow(user_context, user_input)
+        async def run(request: Tuple[str, ...]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.process_user_input(*request)
         
-        # Second check: Does this need intelligent routing?
-        self._routing_stats["ai_routes"] += 1
-        return await self._handle_intelligent_routing(user_context, user_input)
+        return await asyncio.gather(*(run(request) for request in requests))
     
     async def _handle_deterministic_flow(self, user_context: UserContext, 
                                        user_input: str) -> Dict[str, Any]:
@@ -123,102 +350,58 @@ class IntelligentCoordinator(BaseCliviAgent):
         try:
             result = self.flow_handler.route_deterministic_input(user_context, user_input)
             
-            if result.get("action") == "show_main_menu":
-                return {
-                    "response_type": "whatsapp_menu",
-                    "menu_data": result["menu_data"],
-                    "flow": result["flow"],
-                    "page": result["page"],
-                    "routing_type": "deterministic"
-                }
-            
-            elif result.get("action") == "navigate_to_page":
-                return await self._handle_page_navigation(user_context, result)
-            
-            elif result.get("action") == "page_transition":
-                return await self._handle_page_transition(user_context, result)
-            
-            elif result.get("action") == "trigger_intelligent_routing":
-                # Deterministic handler couldn't resolve - escalate to AI
-                return await self._handle_intelligent_routing(user_context, user_input)
-            
-            else:
+            handler_name = self.DETERMINISTIC_ACTION_HANDLERS.get(result.get("action"))
+            if handler_name is None:
                 return result
+            response = getattr(self, handler_name)(user_context, user_input, result)
+            # Handlers that never wait on I/O are plain methods
+            if inspect.isawaitable(response):
+                response = await response
+            return response
                 
         except Exception as e:
-            logger.error(f"Error in deterministic flow handling: {e}")
-            return await self._escalate_to_master_agent(user_context, user_input, str(e))
+            logger.error("Error in deterministic flow handling: %s", e)
+            return self._escalate_to_master_agent(user_context, user_input, str(e))
+    
+    def _deterministic_main_menu(self, user_context: UserContext, user_input: str,
+                                 result: Dict[str, Any]) -> Dict[str, Any]:
+        """Main menu response for show_main_menu"""
+        return {
+            "response_type": "whatsapp_menu",
+            "menu_data": result["menu_data"],
+            "flow": result["flow"],
+            "page": result["page"],
+            "routing_type": "deterministic"
+        }
+    
+    def _deterministic_page_navigation(self, user_context: UserContext, user_input: str,
+                                       result: Dict[str, Any]) -> Dict[str, Any]:
+        """navigate_to_page action"""
+        return self._handle_page_navigation(user_context, result)
+    
+    async def _deterministic_page_transition(self, user_context: UserContext, user_input: str,
+                                             result: Dict[str, Any]) -> Dict[str, Any]:
+        """page_transition action"""
+        return await self._handle_page_transition(user_context, result)
+    
+    async def _deterministic_escalation(self, user_context: UserContext, user_input: str,
+                                        result: Dict[str, Any]) -> Dict[str, Any]:
+        """Deterministic handler couldn't resolve - escalate to AI"""
+        return await self._handle_intelligent_routing(user_context, user_input)
     
     @tool 
     async def analyze_medical_query(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
         """
         Use Gemini 2.5 Flash to analyze medical query and determine routing.
         """
-        analysis_prompt = f"""
-Eres el analizador de consultas médicas de Dr. Clivi. Tu trabajo es clasificar con precisión las consultas de pacientes para rutearlas al especialista correcto.
-
-CONSULTA DEL PACIENTE: "{user_input}"
-
-INFORMACIÓN DEL PACIENTE:
-- Plan: {user_context.get('plan', 'UNKNOWN')}
-- Historial: {user_context.get('medical_history', 'No disponible')}
-
-ESPECIALIDADES DISPONIBLES:
-
-1. **diabetes** - Para consultas sobre:
-   - Glucosa, niveles de azúcar, mg/dL
-   - Diabetes tipo 1, tipo 2, gestacional
-   - Medicamentos: metformina, insulina, glibenclamida
-   - Hipoglucemia, hiperglucemia
-   - Complicaciones diabéticas
-   - Monitoreo de glucosa
-   - Hemoglobina glucosilada (HbA1c)
-
-2. **obesity** - Para consultas sobre:
-   - Pérdida de peso, bajar de peso
-   - Medicamentos GLP-1: Ozempic, Saxenda, Wegovy
-   - Dieta, nutrición, alimentación
-   - Ejercicio, actividad física
-   - IMC, obesidad
-   - Cirugía bariátrica
-
-3. **emergency** - Para emergencias médicas:
-   - Dolor de pecho, dificultad respiratoria
-   - Hipoglucemia severa (<70 mg/dL)
-   - Hiperglucemia extrema (>300 mg/dL)
-   - Síntomas de cetoacidosis
-   - Reacciones adversas graves
-   - "muy fuerte", "intenso", "no puedo respirar"
-
-4. **general** - Para todo lo demás:
-   - Citas, facturas, quejas
-   - Hipertensión, otras condiciones
-   - Preguntas generales de salud
-   - Información sobre medicamentos no especializados
-
-NIVELES DE URGENCIA:
-- **critical**: Emergencias que requieren atención inmediata
-- **high**: Problemas serios que necesitan respuesta rápida
-- **medium**: Consultas importantes pero no urgentes
-- **low**: Preguntas informativas o de rutina
-
-INSTRUCCIONES:
-1. Analiza CUIDADOSAMENTE las palabras clave en la consulta
-2. Busca síntomas específicos de diabetes u obesidad
-3. Evalúa la urgencia basándote en la severidad
-4. Si hay palabras de emergencia, clasifica como "emergency"
-5. Responde ÚNICAMENTE con el JSON solicitado
-
-FORMATO DE RESPUESTA (JSON válido):
-{{
-    "specialty": "diabetes|obesity|general|emergency",
-    "urgency": "low|medium|high|critical",
-    "confidence": 0.0-1.0,
-    "reasoning": "explicación breve de por qué elegiste esta especialidad",
-    "suggested_action": "acción recomendada",
-    "keywords_detected": ["palabra1", "palabra2", "palabra3"]
-}}
-        """
+        analysis_prompt = "".join((
+            MEDICAL_ANALYSIS_PROMPT_HEADER.format(
+                user_input=user_input,
+                plan=user_context.get('plan', 'UNKNOWN'),
+                history=user_context.get('medical_history', 'No disponible')
+            ),
+            MEDICAL_ANALYSIS_PROMPT_GUIDE
+        ))
         
         try:
             # Call Gemini 2.5 Flash via the generative AI tool
@@ -232,18 +415,17 @@ FORMATO DE RESPUESTA (JSON válido):
             # Try to parse JSON response
             if isinstance(response, dict) and 'response' in response:
                 try:
-                    import json
                     response_text = response['response'].strip()
                     
                     # Try to extract JSON from response if it has extra text
                     if response_text.startswith('{') and response_text.endswith('}'):
                         parsed_response = json.loads(response_text)
                     else:
-                        # Look for JSON block in response
-                        import re
-                        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                        if json_match:
-                            parsed_response = json.loads(json_match.group())
+                        # Look for JSON block in response: first '{' through last '}'
+                        start = response_text.find('{')
+                        end = response_text.rfind('}')
+                        if start != -1 and end > start:
+                            parsed_response = json.loads(response_text[start:end + 1])
                         else:
                             raise json.JSONDecodeError("No JSON found", response_text, 0)
                     
@@ -255,14 +437,14 @@ FORMATO DE RESPUESTA (JSON válido):
                         raise ValueError("Missing required fields in JSON response")
                         
                 except (json.JSONDecodeError, ValueError) as e:
-                    logger.warning(f"Failed to parse JSON response: {e}. Raw response: {response_text}")
+                    logger.warning("Failed to parse JSON response: %s. Raw response: %s", e, response_text)
                     # Fallback: analyze keywords manually
                     return self._fallback_keyword_analysis(user_input, response_text)
             
             return response
             
         except Exception as e:
-            logger.error(f"Error in medical query analysis: {e}")
+            logger.error("Error in medical query analysis: %s", e)
             return self._fallback_keyword_analysis(user_input, str(e))
     
     def _fallback_keyword_analysis(self, user_input: str, ai_response: str = "") -> Dict[str, Any]:
@@ -271,56 +453,42 @@ FORMATO DE RESPUESTA (JSON válido):
         """
         user_lower = user_input.lower()
         
-        # Emergency keywords
-        emergency_keywords = [
-            "dolor pecho", "no puedo respirar", "dificultad respirar", "muy fuerte",
-            "severo", "grave", "urgente", "emergencia", "auxilio"
-        ]
-        
-        # Diabetes keywords  
-        diabetes_keywords = [
-            "glucosa", "diabetes", "diabético", "azúcar", "mg/dl", "mg/dL",
-            "metformina", "insulina", "hipoglucemia", "hiperglucemia",
-            "glucómetro", "hemoglobina", "hba1c"
-        ]
-        
-        # Obesity keywords
-        obesity_keywords = [
-            "peso", "bajar", "adelgazar", "obesidad", "ozempic", "saxenda",
-            "dieta", "ejercicio", "imc", "gordura", "grasa"
-        ]
+        found = set(_FALLBACK_KEYWORDS_RE.findall(user_lower))
         
         # Check for emergency first
-        if any(keyword in user_lower for keyword in emergency_keywords):
+        detected = [kw for kw in _EMERGENCY_KEYWORDS if kw in found]
+        if detected:
             return {
                 "specialty": "emergency",
                 "urgency": "critical",
                 "confidence": 0.9,
                 "reasoning": "Detected emergency keywords",
                 "suggested_action": "immediate_attention",
-                "keywords_detected": [kw for kw in emergency_keywords if kw in user_lower]
+                "keywords_detected": detected
             }
         
         # Check for diabetes
-        if any(keyword in user_lower for keyword in diabetes_keywords):
+        detected = [kw for kw in _DIABETES_KEYWORDS if kw in found]
+        if detected:
             return {
                 "specialty": "diabetes", 
                 "urgency": "medium",
                 "confidence": 0.8,
                 "reasoning": "Detected diabetes-related keywords",
                 "suggested_action": "route_to_diabetes_specialist",
-                "keywords_detected": [kw for kw in diabetes_keywords if kw in user_lower]
+                "keywords_detected": detected
             }
         
         # Check for obesity
-        if any(keyword in user_lower for keyword in obesity_keywords):
+        detected = [kw for kw in _OBESITY_KEYWORDS if kw in found]
+        if detected:
             return {
                 "specialty": "obesity",
                 "urgency": "medium", 
                 "confidence": 0.8,
                 "reasoning": "Detected obesity/weight management keywords",
                 "suggested_action": "route_to_obesity_specialist",
-                "keywords_detected": [kw for kw in obesity_keywords if kw in user_lower]
+                "keywords_detected": detected
             }
         
         # Default to general
@@ -356,12 +524,12 @@ FORMATO DE RESPUESTA (JSON válido):
             return await self._route_to_obesity_agent(user_context, user_input, analysis)
             
         elif specialty == "general":
-            return await self._handle_general_query(user_context, user_input, analysis)
+            return self._handle_general_query(user_context, user_input, analysis)
             
         else:
             # Fallback to master agent
-            return await self._escalate_to_master_agent(user_context, user_input, 
-                                                      f"Unknown specialty: {specialty}")
+            return self._escalate_to_master_agent(user_context, user_input, 
+                                                  f"Unknown specialty: {specialty}")
     
     async def _handle_intelligent_routing(self, user_context: UserContext, 
                                         user_input: str) -> Dict[str, Any]:
@@ -372,15 +540,15 @@ FORMATO DE RESPUESTA (JSON válido):
             # Analyze the medical query
             analysis = await self.analyze_medical_query(
                 user_input, 
-                user_context.__dict__
+                user_context.as_dict()
             )
             
             # Route based on analysis
             return await self.route_to_specialist(analysis, user_context, user_input)
             
         except Exception as e:
-            logger.error(f"Error in intelligent routing: {e}")
-            return await self._escalate_to_master_agent(user_context, user_input, str(e))
+            logger.error("Error in intelligent routing: %s", e)
+            return self._escalate_to_master_agent(user_context, user_input, str(e))
     
     async def _route_to_diabetes_agent(self, user_context: UserContext, user_input: str,
                                      analysis: Dict[str, Any]) -> Dict[str, Any]:
@@ -413,8 +581,8 @@ FORMATO DE RESPUESTA (JSON válido):
             }
             
         except Exception as e:
-            logger.error(f"Error routing to diabetes agent: {e}")
-            return await self._escalate_to_master_agent(user_context, user_input, str(e))
+            logger.error("Error routing to diabetes agent: %s", e)
+            return self._escalate_to_master_agent(user_context, user_input, str(e))
     
     async def _route_to_obesity_agent(self, user_context: UserContext, user_input: str,
                                     analysis: Dict[str, Any]) -> Dict[str, Any]:
@@ -447,8 +615,8 @@ FORMATO DE RESPUESTA (JSON válido):
             }
             
         except Exception as e:
-            logger.error(f"Error routing to obesity agent: {e}")
-            return await self._escalate_to_master_agent(user_context, user_input, str(e))
+            logger.error("Error routing to obesity agent: %s", e)
+            return self._escalate_to_master_agent(user_context, user_input, str(e))
     
     @tool
     async def handle_emergency(self, user_context: UserContext, user_input: str,
@@ -471,9 +639,10 @@ FORMATO DE RESPUESTA (JSON válido):
             "medication_reaction": ["reacción", "alergia", "medicamento", "efecto adverso"]
         }
         
+        user_lower = user_input.lower()
         detected_emergency = None
         for emergency_type, keywords in emergency_keywords.items():
-            if any(keyword in user_input.lower() for keyword in keywords):
+            if any(keyword in user_lower for keyword in keywords):
                 detected_emergency = emergency_type
                 break
         
@@ -511,11 +680,67 @@ FORMATO DE RESPUESTA (JSON válido):
             ]
         
         # Log emergency for follow-up
-        logger.critical(f"Emergency detected for user {user_context.user_id}: {detected_emergency}")
+        logger.critical("Emergency detected for user %s: %s", user_context.user_id, detected_emergency)
         
         return emergency_response
     
+    def _peek_user_context(self, user_id: str) -> Optional[UserContext]:
+        """Fresh cached context for ``user_id`` (marked recently used), or None"""
+        cached = self._user_context_cache.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < self.user_context_ttl_seconds:
+            self._user_context_cache.move_to_end(user_id)
+            return cached[1]
+        return None
+    
     async def _get_user_context(self, user_id: str, phone_number: str = None) -> UserContext:
+        """
+        Get user context with plan information.
+        Served from a per-user TTL/LRU cache; concurrent misses for the
+        same user share a single lookup.
+        """
+        cached = self._peek_user_context(user_id)
+        if cached is not None:
+            return cached
+        
+        # Shielded so one caller giving up does not cancel the lookup for the others
+        return await asyncio.shield(self._user_context_lookup(user_id, phone_number))
+    
+    def _user_context_lookup(self, user_id: str, phone_number: str = None) -> asyncio.Task:
+        """
+        Lookup in flight for ``user_id``, started if there is none. It belongs
+        to the in-flight map, not to any caller: await it through
+        ``asyncio.shield`` so cancelling one caller leaves it running.
+        """
+        task = self._user_context_inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_user_context(user_id, phone_number))
+            self._user_context_inflight[user_id] = task
+            
+            def _done(task: asyncio.Task) -> None:
+                # invalidate_user_context() during the fetch detaches this lookup
+                if self._user_context_inflight.get(user_id) is not task:
+                    return
+                del self._user_context_inflight[user_id]
+                if task.cancelled() or task.exception() is not None:
+                    return
+                self._user_context_cache[user_id] = (time.monotonic(), task.result())
+                self._user_context_cache.move_to_end(user_id)
+                while len(self._user_context_cache) > self.user_context_cache_size:
+                    self._user_context_cache.popitem(last=False)
+            
+            task.add_done_callback(_done)
+        return task
+    
+    def invalidate_user_context(self, user_id: str) -> None:
+        """
+        Forget the cached context for ``user_id`` so the next request refetches it.
+        Call it whenever the user's plan or profile changes; a lookup already in
+        flight still answers its waiters but is not cached.
+        """
+        self._user_context_cache.pop(user_id, None)
+        self._user_context_inflight.pop(user_id, None)
+    
+    async def _fetch_user_context(self, user_id: str, phone_number: str = None) -> UserContext:
         """Get or create user context with plan information"""
         # In a real implementation, this would query the user database
         # For now, we'll create a mock context
@@ -528,32 +753,20 @@ FORMATO DE RESPUESTA (JSON válido):
             session_data={}
         )
     
-    async def _escalate_to_master_agent(self, user_context: UserContext, user_input: str,
-                                      error_reason: str) -> Dict[str, Any]:
+    def _escalate_to_master_agent(self, user_context: UserContext, user_input: str,
+                                  error_reason: str) -> Dict[str, Any]:
         """Escalate to MASTER_AGENT playbook (fallback from original flows)"""
         self._routing_stats["master_agent_fallbacks"] += 1
         
-        return {
-            "response_type": "master_agent_escalation",
-            "reason": error_reason,
-            "user_input": user_input,
-            "fallback_message": "Disculpa, necesito transferirte con un especialista humano. En un momento te contactaremos.",
-            "routing_type": "fallback"
-        }
+        return {**MASTER_AGENT_ESCALATION, "reason": error_reason, "user_input": user_input}
     
-    async def _handle_general_query(self, user_context: UserContext, user_input: str,
-                                  analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def _handle_general_query(self, user_context: UserContext, user_input: str,
+                              analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Handle general queries that don't need specialized agents"""
-        return {
-            "response_type": "general_response",
-            "analysis": analysis,
-            "response": "Entiendo tu consulta. ¿Te gustaría que te muestre el menú principal para ayudarte mejor?",
-            "suggested_action": "show_main_menu",
-            "routing_type": "general"
-        }
+        return {**GENERAL_QUERY_RESPONSE, "analysis": analysis}
     
-    async def _handle_page_navigation(self, user_context: UserContext, 
-                                    result: Dict[str, Any]) -> Dict[str, Any]:
+    def _handle_page_navigation(self, user_context: UserContext, 
+                              result: Dict[str, Any]) -> Dict[str, Any]:
         """Handle navigation to specific pages from menu selections"""
         target_page = result.get("target_page")
         
@@ -570,17 +783,12 @@ FORMATO DE RESPUESTA (JSON válido):
             
             # Log del evento si está definido
             if "event_log" in result:
-                logger.info(f"Logging event: {result['event_log']}")
+                logger.info("Logging event: %s", result['event_log'])
             
             return page_response
         
         # Fallback si no hay página target
-        return {
-            "response_type": "general_response",
-            "response": "Navegación no disponible. Regresando al menú principal.",
-            "suggested_action": "show_main_menu",
-            "routing_type": "navigation_error"
-        }
+        return {**NAVIGATION_ERROR_RESPONSE}
     
     async def _handle_page_transition(self, user_context: UserContext, 
                                     result: Dict[str, Any]) -> Dict[str, Any]:
@@ -590,13 +798,9 @@ FORMATO DE RESPUESTA (JSON válido):
         if action == "navigate_to_page":
             target_page = result.get("target_page")
             if target_page == "End Session":
-                return {
-                    "response_type": "general_response",
-                    "response": "Sesión finalizada. ¡Que tengas un buen día!",
-                    "routing_type": "session_end"
-                }
+                return {**SESSION_END_RESPONSE}
             else:
-                return await self._handle_page_navigation(user_context, result)
+                return self._handle_page_navigation(user_context, result)
         
         elif action == "navigate_to_flow":
             target_flow = result.get("target_flow")
@@ -612,7 +816,7 @@ FORMATO DE RESPUESTA (JSON válido):
             function_params = result.get("function_params", {})
             
             # Simular llamada a función (implementar según necesidades)
-            logger.info(f"Ejecutando función: {function_name} con parámetros: {function_params}")
+            logger.info("Ejecutando función: %s con parámetros: %s", function_name, function_params)
             
             return {
                 "response_type": "general_response",
@@ -623,17 +827,13 @@ FORMATO DE RESPUESTA (JSON válido):
             }
         
         else:
-            return {
-                "response_type": "general_response",
-                "response": "Acción no reconocida. Regresando al menú principal.",
-                "routing_type": "unknown_action"
-            }
+            return {**UNKNOWN_ACTION_RESPONSE}
         patient = context.patient
         
         if not patient:
             return await self.handle_unknown_user(user_id)
         
-        self.logger.info(f"Routing user {user_id} - Plan: {patient.plan}, Status: {patient.plan_status}")
+        self.logger.info("Routing user %s - Plan: %s, Status: %s", user_id, patient.plan, patient.plan_status)
         
         # Handle forced routing (for testing or specific requests)
         if force_agent:
@@ -644,9 +844,9 @@ FORMATO DE RESPUESTA (JSON válido):
         plan_status = patient.plan_status
         
         # Route based on plan and status (from checkPlanStatus conditions)
-        if plan in ["PRO", "PLUS", "BASIC"] and plan_status in ["ACTIVE", "SUSPENDED"]:
+        if plan in SPECIALIST_PLANS and plan_status in ROUTABLE_STATUSES:
             # Determine specialization based on user history or intent
-            specialist = await self._determine_specialization(user_id, context)
+            specialist = self._determine_specialization(user_id, context)
             
             if specialist == "diabetes":
                 self._routing_stats["diabetes_routes"] += 1
@@ -656,22 +856,22 @@ FORMATO DE RESPUESTA (JSON válido):
                 return await self.obesity_agent.main_menu_flow(user_id)
             else:
                 # Present choice to user
-                return await self._present_specialization_choice(user_id)
+                return self._present_specialization_choice(user_id)
         
-        elif plan == "CLUB" and plan_status in ["ACTIVE", "SUSPENDED"]:
+        elif plan == "CLUB" and plan_status in ROUTABLE_STATUSES:
             self._routing_stats["club_routes"] += 1
             # Club plan has its own specific flow
             return await self.club_plan_flow(user_id)
         
         elif plan == "CLUB" and plan_status == "CANCELED":
-            return await self._handle_canceled_club_plan(user_id)
+            return self._handle_canceled_club_plan(user_id)
         
         # Handle offline payments for eligible plans
-        elif plan in ["PRO", "PLUS"]:
+        elif plan in OFFLINE_PAYMENT_PLANS:
             return await self.handle_offline_payments(user_id)
         
         # Default fallback
-        return await self._handle_routing_fallback(user_id)
+        return self._handle_routing_fallback(user_id)
     
     @tool
     async def identify_user_needs(self, user_id: str, user_input: str) -> Dict[str, Any]:
@@ -680,31 +880,19 @@ FORMATO DE RESPUESTA (JSON válido):
         """
         user_input_lower = user_input.lower()
         
-        # Diabetes-related keywords
-        diabetes_keywords = [
-            "glucosa", "azucar", "diabetes", "insulina", "glp", "ozempic", 
-            "saxenda", "wegovy", "endocrinologo", "hemoglobina", "hba1c",
-            "glucometro", "tiras", "puncion"
-        ]
-        
-        # Obesity-related keywords  
-        obesity_keywords = [
-            "peso", "bajar", "adelgazar", "dieta", "ejercicio", "obesidad",
-            "grasa", "imc", "cintura", "cadera", "entrenamiento", "cardio",
-            "nutricion", "medicina deportiva"
-        ]
+        found = set(_ROUTING_KEYWORDS_RE.findall(user_input_lower))
         
         # Count keyword matches
-        diabetes_matches = sum(1 for keyword in diabetes_keywords if keyword in user_input_lower)
-        obesity_matches = sum(1 for keyword in obesity_keywords if keyword in user_input_lower)
+        diabetes_matches = sum(kw in found for kw in _ROUTING_DIABETES_KEYWORDS)
+        obesity_matches = sum(kw in found for kw in _ROUTING_OBESITY_KEYWORDS)
         
         # Determine intent
         if diabetes_matches > obesity_matches:
             intent = "diabetes"
-            confidence = diabetes_matches / len(diabetes_keywords)
+            confidence = diabetes_matches / len(_ROUTING_DIABETES_KEYWORDS)
         elif obesity_matches > diabetes_matches:
             intent = "obesity"  
-            confidence = obesity_matches / len(obesity_keywords)
+            confidence = obesity_matches / len(_ROUTING_OBESITY_KEYWORDS)
         else:
             intent = "general"
             confidence = 0.0
@@ -714,7 +902,7 @@ FORMATO DE RESPUESTA (JSON válido):
             "confidence": confidence,
             "diabetes_score": diabetes_matches,
             "obesity_score": obesity_matches,
-            "recommendation": await self._get_routing_recommendation(intent, confidence)
+            "recommendation": self._get_routing_recommendation(intent, confidence)
         }
     
     @tool
@@ -777,10 +965,10 @@ FORMATO DE RESPUESTA (JSON válido):
         context.patient.plan = plan
         context.patient.plan_status = status
         
-        self.logger.info(f"Updated plan status for user {user_id}: {plan} - {status}")
+        self.logger.info("Updated plan status for user %s: %s - %s", user_id, plan, status)
         
         # Log activity event (from flows analysis)
-        await self._log_activity_event(user_id, "PLAN_STATUS_UPDATED", {
+        self._log_activity_event(user_id, "PLAN_STATUS_UPDATED", {
             "plan": plan,
             "status": status
         })
@@ -789,7 +977,7 @@ FORMATO DE RESPUESTA (JSON válido):
             "action": "plan_updated",
             "message": f"Plan actualizado: {plan} ({status})",
             "next_step": "routing_update",
-            "routing_available": status in ["ACTIVE", "SUSPENDED"]
+            "routing_available": status in ROUTABLE_STATUSES
         }
     
     @tool
@@ -798,7 +986,7 @@ FORMATO DE RESPUESTA (JSON válido):
         """
         Coordinate communication between specialized agents (A2A).
         """
-        self.logger.info(f"A2A coordination: {source_agent} → {target_agent} for user {user_id}")
+        self.logger.info("A2A coordination: %s → %s for user %s", source_agent, target_agent, user_id)
         
         # Transfer context between agents
         session_context = self.get_session_context(user_id)
@@ -834,6 +1022,7 @@ FORMATO DE RESPUESTA (JSON válido):
         # Update user context status
         if context.user_context == "UNKNOWN":
             context.user_context = "IDENTIFIED"
+        self.invalidate_user_context(user_id)
         
         return {
             "action": "context_updated",
@@ -867,21 +1056,21 @@ FORMATO DE RESPUESTA (JSON válido):
                 return plan_result
                 
         except Exception as e:
-            logger.error(f"Error in main_menu_flow: {e}")
-            return await self._escalate_to_master_agent(
+            logger.error("Error in main_menu_flow: %s", e)
+            return self._escalate_to_master_agent(
                 await self._get_user_context(user_id), 
                 "main_menu_request", 
                 str(e)
             )
 
     # Helper methods
-    async def _determine_specialization(self, user_id: str, context: SessionContext) -> str:
+    def _determine_specialization(self, user_id: str, context: SessionContext) -> str:
         """Determine user specialization based on history and context"""
         # TODO: Implement ML-based specialization detection
         # For now, return None to present choice
         return None
     
-    async def _present_specialization_choice(self, user_id: str) -> Dict[str, Any]:
+    def _present_specialization_choice(self, user_id: str) -> Dict[str, Any]:
         """Present specialization choice to user"""
         return {
             "action": "specialization_choice",
@@ -917,7 +1106,7 @@ FORMATO DE RESPUESTA (JSON válido):
         else:
             return await self.main_menu_flow(user_id)
     
-    async def _handle_canceled_club_plan(self, user_id: str) -> Dict[str, Any]:
+    def _handle_canceled_club_plan(self, user_id: str) -> Dict[str, Any]:
         """Handle canceled club plan users"""
         return {
             "action": "club_reactivation",
@@ -930,7 +1119,7 @@ FORMATO DE RESPUESTA (JSON válido):
             ]
         }
     
-    async def _handle_routing_fallback(self, user_id: str) -> Dict[str, Any]:
+    def _handle_routing_fallback(self, user_id: str) -> Dict[str, Any]:
         """Handle routing fallback cases"""
         return {
             "action": "routing_fallback",
@@ -942,7 +1131,7 @@ FORMATO DE RESPUESTA (JSON válido):
             ]
         }
     
-    async def _get_routing_recommendation(self, intent: str, confidence: float) -> Dict[str, Any]:
+    def _get_routing_recommendation(self, intent: str, confidence: float) -> Dict[str, Any]:
         """Get routing recommendation based on intent analysis"""
         if confidence > 0.3:
             return {
@@ -959,9 +1148,12 @@ FORMATO DE RESPUESTA (JSON válido):
     
     def get_routing_stats(self) -> Dict[str, Any]:
         """Get routing statistics for analytics"""
+        stats = self._routing_stats
+        total = sum(stats.values())
+        scale = 100 / total if total else 0.0
         return {
-            **self._routing_stats,
-            "total_routes": sum(self._routing_stats.values()),
-            "diabetes_percentage": self._routing_stats["diabetes_routes"] / max(sum(self._routing_stats.values()), 1) * 100,
-            "obesity_percentage": self._routing_stats["obesity_routes"] / max(sum(self._routing_stats.values()), 1) * 100
+            **stats,
+            "total_routes": total,
+            "diabetes_percentage": stats.get("diabetes_routes", 0) * scale,
+            "obesity_percentage": stats.get("obesity_routes", 0) * scale
         }
@@ -3,11 +3,130 @@ Diabetes Agent - Specialized agent for diabetes care workflows.
 Based on analysis of exported Conversational Agents diabetes flow.
 """
 
-import logging
-from typing import Any, Dict, List, Optional
+import re
+from types import MappingProxyType
+from typing import Any, Dict, Optional
 
-from .base_agent import BaseCliviAgent, SessionContext, PatientContext, tool
-from ..config import Config
+from .base_agent import (
+    ASK_AI_ERROR_RESPONSE, BaseCliviAgent, SessionContext, PatientContext, keyword_pattern, tool
+)
+from ..tools import generative_ai
+
+
+# Keyword patterns for query classification (substring match on the lowercased query)
+
+# ONBOARDING PROCESS
+_ONBOARDING_PROCESS_RE = keyword_pattern(
+    "onboarding", "iniciar tratamiento", "validar datos", "comenzar", "empezar"
+)
+
+# APPOINTMENT BOOKING
+_APPOINTMENT_BOOKING_RE = keyword_pattern(
+    "cita", "agendar", "consulta", "appointment", "médico", "endocrinólogo"
+)
+
+# APPOINTMENT TYPE CLARIFICATION
+_APPOINTMENT_TYPE_CLARIFICATION_RE = keyword_pattern(
+    "en línea", "presencial", "hospital", "virtual", "online", "videollamada"
+)
+
+# APPOINTMENT RESCHEDULING
+_APPOINTMENT_RESCHEDULING_RE = keyword_pattern(
+    "reprogramar", "reagendar", "cambiar cita", "mover cita", "reschedule"
+)
+
+# APPOINTMENT CANCELLATION
+_APPOINTMENT_CANCELLATION_RE = keyword_pattern(
+    "cancelar cita", "cancel", "anular cita"
+)
+
+# APPOINTMENT CONFIRMATION
+_APPOINTMENT_CONFIRMATION_RE = keyword_pattern(
+    "confirmar cita", "confirmación", "confirm"
+)
+
+# BODY MEASUREMENTS - SPECIFIC QUERIES
+_BODY_MEASUREMENTS_RE = keyword_pattern(
+    "medición", "medir", "glucosa", "peso", "cintura", "cadera", "measurement"
+)
+
+# HOW TO TAKE MEASUREMENTS
+_HOW_TO_TAKE_MEASUREMENTS_RE = keyword_pattern(
+    "cómo medir", "how to", "tutorial medición", "instrucciones"
+)
+
+# LAB RESULTS / MEDICAL FILES
+_LAB_RESULTS_MEDICAL_FILES_RE = keyword_pattern(
+    "resultados", "laboratorio", "recetas", "prescription", "archivos", "estudios"
+)
+
+# VIDEO CALL PLATFORM QUESTIONS
+_VIDEO_CALL_PLATFORM_QUESTIONS_RE = keyword_pattern(
+    "aplicación", "app", "videollamada", "plataforma", "software"
+)
+
+# EXERCISE QUERIES - WITH SAFETY PROTOCOL
+_EXERCISE_QUERIES_RE = keyword_pattern(
+    "ejercicio", "exercise", "actividad física", "rutina", "entrenamiento"
+)
+
+# COMPLAINTS ABOUT SERVICE
+_COMPLAINTS_ABOUT_SERVICE_RE = keyword_pattern(
+    "queja", "mal servicio", "problema", "complaint", "insatisfecho"
+)
+
+# GENERAL QUESTIONS
+_GENERAL_QUESTIONS_RE = keyword_pattern(
+    "pregunta", "duda", "consulta", "question", "ayuda"
+)
+
+# INVOICING QUERIES
+_INVOICING_QUERIES_RE = keyword_pattern(
+    "factura", "facturación", "invoice", "billing", "pago"
+)
+
+# PAYMENT QUERIES
+_PAYMENT_QUERIES_RE = keyword_pattern(
+    "pago", "payment", "cobro", "tarjeta"
+)
+
+# SHIPMENT STATUS
+_SHIPMENT_STATUS_RE = keyword_pattern(
+    "envío", "shipment", "glucómetro", "tiras", "medicamento", "supplies"
+)
+
+# PHYSICAL SYMPTOMS - EMERGENCY PROTOCOL
+_PHYSICAL_SYMPTOMS_RE = keyword_pattern(
+    "me siento mal", "síntomas", "dolor", "mareo", "nausea", "emergency"
+)
+
+# MENTAL HEALTH CONCERNS
+_MENTAL_HEALTH_CONCERNS_RE = keyword_pattern(
+    "depresión", "ansiedad", "mental", "psychological", "psicológico"
+)
+
+# GRATITUDE EXPRESSIONS
+_GRATITUDE_EXPRESSIONS_RE = keyword_pattern(
+    "gracias", "thank", "thanks", "agradezco"
+)
+
+# REFERRALS
+_REFERRALS_RE = keyword_pattern(
+    "referir", "recomendar", "referral", "amigo"
+)
+
+# SUBSCRIPTION CANCELLATION
+_SUBSCRIPTION_CANCELLATION_RE = keyword_pattern(
+    "cancelar suscripción", "cancel subscription", "dar de baja", "discontinuar"
+)
+
+# EMOJIS IN MESSAGE (checked on the original text)
+_EMOJI_RE = re.compile("[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]")
+
+# SPECIFIC MEDICAL QUESTIONS - ROUTE TO SPECIALIST
+_SPECIFIC_MEDICAL_QUESTIONS_RE = keyword_pattern(
+    "diabetes", "glucosa alta", "insulina", "hemoglobina", "a1c", "complications"
+)
 
 
 class DiabetesAgent(BaseCliviAgent):
@@ -22,9 +141,82 @@ class DiabetesAgent(BaseCliviAgent):
     - Endocrinology appointments
     """
     
-    def __init__(self, config: Config):
-        super().__init__(config)
-        self.logger = logging.getLogger(self.__class__.__name__)
+    # Diabetes-specific tools on top of the common ones
+    TOOLS = BaseCliviAgent.TOOLS + (
+        "glucose_logging_flow",
+        "medication_tutorial_flow",
+        "supplies_management_flow",
+        "endocrinology_appointment_flow",
+        "glucose_report_flow",
+    )
+    
+    # Static Ask_OpenAI prompt; only the user query varies per call
+    ASK_PROMPT_TEMPLATE = """
+        Contexto: Consulta de diabetes para paciente
+        Consulta del usuario: {query}
+        
+        Proporciona una respuesta médica informativa pero segura sobre diabetes,
+        recordando siempre recomendar consulta médica profesional.
+        """
+    
+    # ONBOARDING_SEND_LINK link_type -> URL
+    ONBOARDING_LINKS = MappingProxyType({
+        "diabetes_onboarding": "https://drclivi.com/diabetes/onboarding",
+        "glucose_tutorial": "https://drclivi.com/diabetes/glucose-tutorial",
+        "medication_guide": "https://drclivi.com/diabetes/medications"
+    })
+    
+    # main_menu_flow options; shared by every menu response - do not mutate
+    # Core diabetes options available to all plans
+    MENU_CORE_OPTIONS = (
+        {
+            "id": "glucose_logging",
+            "title": "📊 Registrar Glucosa",
+            "description": "Registra tus mediciones de glucosa",
+            "action": "measurements_menu"
+        },
+        {
+            "id": "appointments", 
+            "title": "👩‍⚕️ Citas Médicas",
+            "description": "Agendar o gestionar citas con endocrinólogo",
+            "action": "appointment_flow"
+        },
+        {
+            "id": "education",
+            "title": "📚 Educación",
+            "description": "Aprende sobre el manejo de la diabetes",
+            "action": "education_menu"
+        },
+    )
+    # PRO/PLUS plans
+    MENU_PRO_PLUS_OPTIONS = (
+        {
+            "id": "medication_tutorials",
+            "title": "💊 Tutoriales de Medicamentos", 
+            "description": "Aprende a usar GLP-1 y otros medicamentos",
+            "action": "medication_tutorials"
+        },
+        {
+            "id": "supplies",
+            "title": "🔬 Suministros",
+            "description": "Gestiona glucómetro y tiras reactivas",
+            "action": "supplies_management"
+        },
+    )
+    # PRO plan only
+    MENU_PRO_OPTIONS = (
+        {
+            "id": "premium_support",
+            "title": "⭐ Soporte Premium",
+            "description": "Acceso prioritario a especialistas",
+            "action": "premium_support"
+        },
+    )
+    # Full option list per plan; other plans only get the core options
+    MENU_OPTIONS_BY_PLAN = MappingProxyType({
+        "PRO": MENU_CORE_OPTIONS + MENU_PRO_PLUS_OPTIONS + MENU_PRO_OPTIONS,
+        "PLUS": MENU_CORE_OPTIONS + MENU_PRO_PLUS_OPTIONS
+    })
     
     def get_agent_name(self) -> str:
         return self.config.diabetes_agent.name
@@ -93,7 +285,7 @@ class DiabetesAgent(BaseCliviAgent):
         Send message tool - equivalent to Dialogflow CX SEND_MESSAGE function.
         Used for sending structured messages to users.
         """
-        await self._log_activity_event(user_id, "SEND_MESSAGE_TOOL_USED", {
+        self._log_activity_event(user_id, "SEND_MESSAGE_TOOL_USED", {
             "template_name": template_name,
             "message_length": len(message)
         })
@@ -111,19 +303,13 @@ class DiabetesAgent(BaseCliviAgent):
         Send onboarding link tool - equivalent to Dialogflow CX ONBOARDING_SEND_LINK function.
         Used for diabetes patient onboarding process.
         """
-        await self._log_activity_event(user_id, "ONBOARDING_LINK_SENT", {
+        self._log_activity_event(user_id, "ONBOARDING_LINK_SENT", {
             "link_type": link_type
         })
         
-        onboarding_links = {
-            "diabetes_onboarding": "https://drclivi.com/diabetes/onboarding",
-            "glucose_tutorial": "https://drclivi.com/diabetes/glucose-tutorial",
-            "medication_guide": "https://drclivi.com/diabetes/medications"
-        }
-        
         return {
             "action": "SEND_LINK",
-            "link": onboarding_links.get(link_type, onboarding_links["diabetes_onboarding"]),
+            "link": self.ONBOARDING_LINKS.get(link_type, self.ONBOARDING_LINKS["diabetes_onboarding"]),
             "message": f"Aquí tienes el enlace para {link_type.replace('_', ' ')}",
             "should_end_session": True
         }
@@ -134,7 +320,7 @@ class DiabetesAgent(BaseCliviAgent):
         Appointment confirmation tool - equivalent to Dialogflow CX APPOINTMENT_CONFIRM function.
         Used for confirming diabetes-related medical appointments.
         """
-        await self._log_activity_event(user_id, "APPOINTMENT_CONFIRMED", {
+        self._log_activity_event(user_id, "APPOINTMENT_CONFIRMED", {
             "appointment_id": appointment_id,
             "appointment_type": appointment_type
         })
@@ -161,7 +347,7 @@ class DiabetesAgent(BaseCliviAgent):
         context.last_message = message
         context.last_intent = f"{context_type}_question"
         
-        await self._log_activity_event(user_id, "LAST_MESSAGE_SET", {
+        self._log_activity_event(user_id, "LAST_MESSAGE_SET", {
             "message_preview": message[:50] + "..." if len(message) > 50 else message,
             "context_type": context_type
         })
@@ -185,7 +371,7 @@ class DiabetesAgent(BaseCliviAgent):
             if hasattr(context.patient, property_name):
                 setattr(context.patient, property_name, property_value)
         
-        await self._log_activity_event(user_id, "PROPERTY_UPDATED", {
+        self._log_activity_event(user_id, "PROPERTY_UPDATED", {
             "property_name": property_name,
             "property_value": property_value
         })
@@ -203,16 +389,7 @@ class DiabetesAgent(BaseCliviAgent):
         Ask OpenAI tool - equivalent to Dialogflow CX Ask OpenAI function.
         Used for getting AI-powered responses for diabetes-related queries.
         """
-        # Use the existing generative AI tool from the config
-        from ..tools import generative_ai
-        
-        ai_prompt = f"""
-        Contexto: Consulta de diabetes para paciente
-        Consulta del usuario: {query}
-        
-        Proporciona una respuesta médica informativa pero segura sobre diabetes,
-        recordando siempre recomendar consulta médica profesional.
-        """
+        ai_prompt = self.ASK_PROMPT_TEMPLATE.format(query=query)
         
         try:
             ai_response = await generative_ai.ask_generative_ai(
@@ -228,24 +405,8 @@ class DiabetesAgent(BaseCliviAgent):
                 "context": context
             }
         except Exception as e:
-            self.logger.error(f"Error in Ask_OpenAI for user {user_id}: {str(e)}")
-            return {
-                "action": "AI_ERROR",
-                "error": "No pude procesar tu consulta en este momento. ¿Te gustaría hablar con un especialista?",
-                "fallback": True
-            }
-    
-    def get_tools(self) -> List[str]:
-        """Get diabetes-specific tools"""
-        base_tools = super().get_tools()
-        diabetes_tools = [
-            "glucose_logging_flow",
-            "medication_tutorial_flow", 
-            "supplies_management_flow",
-            "endocrinology_appointment_flow",
-            "glucose_report_flow"
-        ]
-        return base_tools + diabetes_tools
+            self.logger.error("Error in Ask_OpenAI for user %s: %s", user_id, e)
+            return {**ASK_AI_ERROR_RESPONSE}
 
     async def process_diabetes_query(self, user_request: str, user_id: str, 
                                     session_context: SessionContext, 
@@ -254,7 +415,7 @@ class DiabetesAgent(BaseCliviAgent):
         Process diabetes-related queries with full scenario coverage from original Dialogflow CX flows.
         Implements all scenarios from MASTER_AGENT and EXERCISE_AI_AGENT instructions.
         """
-        self.logger.info(f"Processing diabetes query for user {user_id}: {user_request}")
+        self.logger.info("Processing diabetes query for user %s: %s", user_id, user_request)
         
         # Set session context
         context = self.get_session_context(user_id)
@@ -270,9 +431,7 @@ class DiabetesAgent(BaseCliviAgent):
         query_lower = user_request.lower().strip()
         
         # ONBOARDING PROCESS
-        if any(keyword in query_lower for keyword in [
-            "onboarding", "iniciar tratamiento", "validar datos", "comenzar", "empezar"
-        ]):
+        if _ONBOARDING_PROCESS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi. Parece que quieres iniciar con tu tratamiento. Déjame ayudarte con eso.",
                 "action": "CALL_FUNCTION",
@@ -281,9 +440,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT BOOKING
-        if any(keyword in query_lower for keyword in [
-            "cita", "agendar", "consulta", "appointment", "médico", "endocrinólogo"
-        ]):
+        if _APPOINTMENT_BOOKING_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi. Parece que quieres agendar una cita. Es correcto?",
                 "action": "SEND_MESSAGE", 
@@ -293,9 +450,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT TYPE CLARIFICATION
-        if any(keyword in query_lower for keyword in [
-            "en línea", "presencial", "hospital", "virtual", "online", "videollamada"
-        ]):
+        if _APPOINTMENT_TYPE_CLARIFICATION_RE.search(query_lower):
             return {
                 "response": "Tu cita es en línea. Te enviaremos la liga 30 minutos antes.",
                 "action": "SEND_MESSAGE",
@@ -304,9 +459,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT RESCHEDULING
-        if any(keyword in query_lower for keyword in [
-            "reprogramar", "reagendar", "cambiar cita", "mover cita", "reschedule"
-        ]):
+        if _APPOINTMENT_RESCHEDULING_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres reprogramar una cita. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -315,9 +468,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT CANCELLATION
-        if any(keyword in query_lower for keyword in [
-            "cancelar cita", "cancel", "anular cita"
-        ]):
+        if _APPOINTMENT_CANCELLATION_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres cancelar una cita. Puedo ayudarte.",
                 "action": "SEND_MESSAGE", 
@@ -326,9 +477,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT CONFIRMATION
-        if any(keyword in query_lower for keyword in [
-            "confirmar cita", "confirmación", "confirm"
-        ]):
+        if _APPOINTMENT_CONFIRMATION_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres confirmar tu cita. Puedo ayudarte.",
                 "action": "CALL_FUNCTION",
@@ -346,9 +495,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # BODY MEASUREMENTS - SPECIFIC QUERIES
-        if any(keyword in query_lower for keyword in [
-            "medición", "medir", "glucosa", "peso", "cintura", "cadera", "measurement"
-        ]):
+        if _BODY_MEASUREMENTS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres enviarnos una medición. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -357,9 +504,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # HOW TO TAKE MEASUREMENTS
-        if any(keyword in query_lower for keyword in [
-            "cómo medir", "how to", "tutorial medición", "instrucciones"
-        ]):
+        if _HOW_TO_TAKE_MEASUREMENTS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres instrucciones para mediciones. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -368,9 +513,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # LAB RESULTS / MEDICAL FILES
-        if any(keyword in query_lower for keyword in [
-            "resultados", "laboratorio", "recetas", "prescription", "archivos", "estudios"
-        ]):
+        if _LAB_RESULTS_MEDICAL_FILES_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres ver los archivos disponibles. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -379,9 +522,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # VIDEO CALL PLATFORM QUESTIONS
-        if any(keyword in query_lower for keyword in [
-            "aplicación", "app", "videollamada", "plataforma", "software"
-        ]):
+        if _VIDEO_CALL_PLATFORM_QUESTIONS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres actualizar tu aplicación. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -390,9 +531,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # EXERCISE QUERIES - WITH SAFETY PROTOCOL
-        if any(keyword in query_lower for keyword in [
-            "ejercicio", "exercise", "actividad física", "rutina", "entrenamiento"
-        ]):
+        if _EXERCISE_QUERIES_RE.search(query_lower):
             return {
                 "response": "Por tu propia seguridad, antes de responderte necesitamos asegurarnos con un par de preguntas. Gracias.",
                 "action": "EXERCISE_SAFETY_CHECK",
@@ -405,9 +544,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # COMPLAINTS ABOUT SERVICE
-        if any(keyword in query_lower for keyword in [
-            "queja", "mal servicio", "problema", "complaint", "insatisfecho"
-        ]):
+        if _COMPLAINTS_ABOUT_SERVICE_RE.search(query_lower):
             return {
                 "response": "Lamento mucho tu mala experiencia. Estoy escalando tu caso con un agente de soporte. Dame unos momentos. Por favor.",
                 "action": "CALL_FUNCTION", 
@@ -420,9 +557,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # GENERAL QUESTIONS
-        if any(keyword in query_lower for keyword in [
-            "pregunta", "duda", "consulta", "question", "ayuda"
-        ]):
+        if _GENERAL_QUESTIONS_RE.search(query_lower):
             return {
                 "response": "Hola, con gusto te puedo ayudar con el envío de una pregunta a nuestro equipo",
                 "action": "SEND_MESSAGE",
@@ -431,9 +566,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # INVOICING QUERIES
-        if any(keyword in query_lower for keyword in [
-            "factura", "facturación", "invoice", "billing", "pago"
-        ]):
+        if _INVOICING_QUERIES_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, me parece que quieres apoyo con tus facturas. Yo te puedo ayudar.",
                 "action": "SEND_MESSAGE",
@@ -442,9 +575,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # PAYMENT QUERIES
-        if any(keyword in query_lower for keyword in [
-            "pago", "payment", "cobro", "tarjeta"
-        ]):
+        if _PAYMENT_QUERIES_RE.search(query_lower):
             return {
                 "response": "Hola, me parece que quieres apoyo con tus pagos. Yo te puedo ayudar.",
                 "action": "SEND_MESSAGE",
@@ -453,9 +584,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # SHIPMENT STATUS
-        if any(keyword in query_lower for keyword in [
-            "envío", "shipment", "glucómetro", "tiras", "medicamento", "supplies"
-        ]):
+        if _SHIPMENT_STATUS_RE.search(query_lower):
             return {
                 "response": "Me parece que quieres apoyo con tus envíos. Yo te puedo ayudar",
                 "action": "SEND_MESSAGE",
@@ -464,9 +593,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # PHYSICAL SYMPTOMS - EMERGENCY PROTOCOL
-        if any(keyword in query_lower for keyword in [
-            "me siento mal", "síntomas", "dolor", "mareo", "nausea", "emergency"
-        ]):
+        if _PHYSICAL_SYMPTOMS_RE.search(query_lower):
             return {
                 "response": "Comprendo tu preocupación. Te voy a conectar con nuestro servicio de especialistas.",
                 "action": "SEND_MESSAGE",
@@ -475,9 +602,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # MENTAL HEALTH CONCERNS
-        if any(keyword in query_lower for keyword in [
-            "depresión", "ansiedad", "mental", "psychological", "psicológico"
-        ]):
+        if _MENTAL_HEALTH_CONCERNS_RE.search(query_lower):
             return {
                 "response": "Tu bienestar mental es importante. Te conectaré con nuestro servicio de apoyo psicológico.",
                 "action": "SEND_MESSAGE", 
@@ -486,9 +611,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # GRATITUDE EXPRESSIONS
-        if any(keyword in query_lower for keyword in [
-            "gracias", "thank", "thanks", "agradezco"
-        ]):
+        if _GRATITUDE_EXPRESSIONS_RE.search(query_lower):
             return {
                 "response": "Gracias a ti",
                 "action": "END_SESSION",
@@ -496,9 +619,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # REFERRALS
-        if any(keyword in query_lower for keyword in [
-            "referir", "recomendar", "referral", "amigo"
-        ]):
+        if _REFERRALS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres referir. Es muy sencillo compártenos su contacto por este WhatsApp.",
                 "action": "END_SESSION",
@@ -506,11 +627,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # EMOJIS IN MESSAGE
-        import re
-        emoji_pattern = re.compile(
-            "[\U0001F600-\U0001F64F]|[\U0001F300-\U0001F5FF]|[\U0001F680-\U0001F6FF]|[\U0001F1E0-\U0001F1FF]"
-        )
-        if emoji_pattern.search(user_request):
+        if _EMOJI_RE.search(user_request):
             return {
                 "response": "Soy Dr. Clivi, solo para estar seguro. Por favor, utiliza el siguiente menú. Gracias",
                 "action": "SEND_MESSAGE",
@@ -519,9 +636,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # SUBSCRIPTION CANCELLATION
-        if any(keyword in query_lower for keyword in [
-            "cancelar suscripción", "cancel subscription", "dar de baja", "discontinuar"
-        ]):
+        if _SUBSCRIPTION_CANCELLATION_RE.search(query_lower):
             return {
                 "response": "Lamentamos tu experiencia. Estamos escalando tu caso con alta prioridad. Un agente de soporte te contactará.",
                 "action": "CALL_FUNCTION",
@@ -535,9 +650,7 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # SPECIFIC MEDICAL QUESTIONS - ROUTE TO SPECIALIST
-        if any(keyword in query_lower for keyword in [
-            "diabetes", "glucosa alta", "insulina", "hemoglobina", "a1c", "complications"
-        ]):
+        if _SPECIFIC_MEDICAL_QUESTIONS_RE.search(query_lower):
             return {
                 "response": "Lo lamento, no entendí tu petición voy a escalar tu caso con un especialista. Gracias por tu paciencia.",
                 "action": "CALL_FUNCTION", 
@@ -551,7 +664,8 @@ class DiabetesAgent(BaseCliviAgent):
             }
         
         # SINGLE WORD RESPONSES
-        if len(query_lower.split()) == 1 and query_lower.isalpha():
+        # isalpha() is False for empty input and for anything with spaces
+        if query_lower.isalpha():
             return {
                 "response": "Por favor utiliza el siguiente menú para mejor asistencia.",
                 "action": "FLOW_REDIRECT",
@@ -596,7 +710,7 @@ class DiabetesAgent(BaseCliviAgent):
             patient = PatientContext(**patient)
             context.patient = patient
         
-        await self._log_activity_event(user_id, "DIABETES_MAIN_MENU_ACCESS", {
+        self._log_activity_event(user_id, "DIABETES_MAIN_MENU_ACCESS", {
             "plan": patient.plan,
             "plan_status": patient.plan_status
         })
@@ -607,54 +721,7 @@ class DiabetesAgent(BaseCliviAgent):
         #     return plan_access
             
         # Build main menu options based on plan
-        menu_options = []
-        
-        # Core diabetes options available to all plans
-        menu_options.extend([
-            {
-                "id": "glucose_logging",
-                "title": "📊 Registrar Glucosa",
-                "description": "Registra tus mediciones de glucosa",
-                "action": "measurements_menu"
-            },
-            {
-                "id": "appointments", 
-                "title": "👩‍⚕️ Citas Médicas",
-                "description": "Agendar o gestionar citas con endocrinólogo",
-                "action": "appointment_flow"
-            },
-            {
-                "id": "education",
-                "title": "📚 Educación",
-                "description": "Aprende sobre el manejo de la diabetes",
-                "action": "education_menu"
-            }
-        ])
-        
-        # Plan-specific options
-        if patient.plan in ["PRO", "PLUS"]:
-            menu_options.extend([
-                {
-                    "id": "medication_tutorials",
-                    "title": "💊 Tutoriales de Medicamentos", 
-                    "description": "Aprende a usar GLP-1 y otros medicamentos",
-                    "action": "medication_tutorials"
-                },
-                {
-                    "id": "supplies",
-                    "title": "🔬 Suministros",
-                    "description": "Gestiona glucómetro y tiras reactivas",
-                    "action": "supplies_management"
-                }
-            ])
-            
-        if patient.plan == "PRO":
-            menu_options.append({
-                "id": "premium_support",
-                "title": "⭐ Soporte Premium",
-                "description": "Acceso prioritario a especialistas",
-                "action": "premium_support"
-            })
+        menu_options = list(self.MENU_OPTIONS_BY_PLAN.get(patient.plan, self.MENU_CORE_OPTIONS))
         
         return {
             "response": f"¡Hola {patient.name_display or 'Paciente'}! 👋\n\nBienvenido a tu asistente de diabetes Dr. Clivi.\n\n¿En qué puedo ayudarte hoy?",
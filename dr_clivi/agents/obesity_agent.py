@@ -3,11 +3,71 @@ Obesity Agent - Specialized agent for obesity care workflows.
 Based on analysis of exported Conversational Agents obesity flow.
 """
 
-import logging
+from types import MappingProxyType
 from typing import Any, Dict, List, Optional
 
-from .base_agent import BaseCliviAgent, SessionContext, PatientContext, tool
-from ..config import Config
+from .base_agent import (
+    ASK_AI_ERROR_RESPONSE, BaseCliviAgent, SessionContext, PatientContext, keyword_pattern, tool
+)
+from ..tools import generative_ai
+
+
+# Keyword patterns for query classification (substring match on the lowercased query)
+
+# WEIGHT MEASUREMENTS - HIGH PRIORITY
+_WEIGHT_MEASUREMENTS_RE = keyword_pattern(
+    "peso", "pesé", "mi peso", "peso corporal", "medición", "balanza", "báscula"
+)
+
+# GLP-1 MEDICATION MANAGEMENT
+_GLP_1_MEDICATION_MANAGEMENT_RE = keyword_pattern(
+    "ozempic", "trulicity", "glp-1", "glp1", "inyección", "medicamento", "medicina"
+)
+
+# NUTRITION AND DIET QUERIES
+_NUTRITION_AND_DIET_QUERIES_RE = keyword_pattern(
+    "dieta", "comida", "alimentación", "qué comer", "menú", "nutrición", "calorías"
+)
+
+# EXERCISE AND PHYSICAL ACTIVITY
+_EXERCISE_AND_PHYSICAL_ACTIVITY_RE = keyword_pattern(
+    "ejercicio", "actividad física", "rutina", "entrenamiento", "deporte", "caminar"
+)
+
+# APPOINTMENT MANAGEMENT
+_APPOINTMENT_MANAGEMENT_RE = keyword_pattern(
+    "cita", "consulta", "doctor", "médico", "especialista", "agendar", "programar"
+)
+
+# PROGRESS TRACKING
+_PROGRESS_TRACKING_RE = keyword_pattern(
+    "progreso", "avance", "resultados", "bajé", "subí", "estancado", "no bajo"
+)
+
+# SUPPLY MANAGEMENT
+_SUPPLY_MANAGEMENT_RE = keyword_pattern(
+    "envío", "pedido", "medicamento", "suministros", "entrega"
+)
+
+# PHYSICAL SYMPTOMS - EMERGENCY PROTOCOL
+_PHYSICAL_SYMPTOMS_RE = keyword_pattern(
+    "me siento mal", "síntomas", "dolor", "mareo", "nausea", "emergency"
+)
+
+# COMPLAINTS AND FEEDBACK
+_COMPLAINTS_AND_FEEDBACK_RE = keyword_pattern(
+    "queja", "problema", "mal servicio", "insatisfecho", "molesto"
+)
+
+# GENERAL WEIGHT LOSS HELP
+_GENERAL_WEIGHT_LOSS_HELP_RE = keyword_pattern(
+    "bajar de peso", "perder peso", "adelgazar", "obesidad", "sobrepeso"
+)
+
+# HELP AND SUPPORT
+_HELP_AND_SUPPORT_RE = keyword_pattern(
+    "ayuda", "support", "no entiendo", "como funciona", "información"
+)
 
 
 class ObesityAgent(BaseCliviAgent):
@@ -22,9 +82,111 @@ class ObesityAgent(BaseCliviAgent):
     - Sports medicine appointments
     """
     
-    def __init__(self, config: Config):
-        super().__init__(config)
-        self.logger = logging.getLogger(self.__class__.__name__)
+    # Static Ask_OpenAI prompt; only the user query varies per call
+    ASK_PROMPT_TEMPLATE = """
+        Contexto: Consulta de manejo de obesidad para paciente
+        Consulta del usuario: {query}
+        
+        Proporciona una respuesta médica informativa pero segura sobre manejo de obesidad,
+        incluyendo aspectos nutricionales y de ejercicio cuando sea apropiado.
+        Siempre verificar alergias alimentarias y limitaciones físicas.
+        Recordar recomendar consulta médica profesional para casos complejos.
+        """
+    
+    # ONBOARDING_SEND_LINK link_type -> URL
+    ONBOARDING_LINKS = MappingProxyType({
+        "obesity_onboarding": "https://drclivi.com/obesity/onboarding",
+        "weight_tracking": "https://drclivi.com/obesity/weight-tracking",
+        "nutrition_guide": "https://drclivi.com/obesity/nutrition",
+        "exercise_plan": "https://drclivi.com/obesity/exercise"
+    })
+    
+    # DR_CLIVI_HOW_IT_WORKS topic -> explanation
+    HOW_IT_WORKS_EXPLANATIONS = MappingProxyType({
+        "obesity_program": """
+            🏥 **Cómo funciona el programa de manejo de obesidad Dr. Clivi:**
+            
+            1. **Evaluación inicial**: Análisis completo de tu estado actual
+            2. **Plan personalizado**: Nutrición y ejercicio adaptados a ti
+            3. **Seguimiento continuo**: Monitoreo de peso y medidas corporales
+            4. **Apoyo médico**: Acceso a especialistas cuando lo necesites
+            5. **Medicamentos**: GLP-1 y otros tratamientos según indicación médica
+            """,
+        "weight_tracking": """
+            📊 **Sistema de seguimiento de peso:**
+            
+            - Registro semanal de peso y medidas
+            - Gráficas de progreso automáticas
+            - Alertas de tendencias importantes
+            - Reportes mensuales para tu médico
+            """,
+        "nutrition_plan": """
+            🥗 **Plan nutricional personalizado:**
+            
+            - Menús adaptados a tus preferencias y alergias
+            - Conteo de calorías y macronutrientes
+            - Recetas saludables y fáciles de preparar
+            - Ajustes según tu progreso
+            """
+    })
+    
+    # main_menu_flow options; shared by every menu response - do not mutate
+    # Core obesity management options available to all plans
+    MENU_CORE_OPTIONS = (
+        {
+            "id": "weight_logging",
+            "title": "⚖️ Registrar Peso",
+            "description": "Registra tu peso y medidas corporales",
+            "action": "weight_measurements"
+        },
+        {
+            "id": "appointments", 
+            "title": "👩‍⚕️ Citas con Nutricionista",
+            "description": "Agendar o gestionar citas nutricionales",
+            "action": "nutritionist_appointment"
+        },
+        {
+            "id": "nutrition_education",
+            "title": "🥗 Educación Nutricional",
+            "description": "Aprende sobre alimentación saludable",
+            "action": "nutrition_education"
+        },
+    )
+    # PRO/PLUS plans
+    MENU_PRO_PLUS_OPTIONS = (
+        {
+            "id": "glp1_management",
+            "title": "💉 Manejo de GLP-1", 
+            "description": "Tutoriales y seguimiento de medicamento",
+            "action": "glp1_tutorials"
+        },
+        {
+            "id": "progress_tracking",
+            "title": "📈 Seguimiento de Progreso",
+            "description": "Revisa tu progreso y establece metas",
+            "action": "progress_tracking"
+        },
+        {
+            "id": "meal_planning",
+            "title": "🍽️ Planificación de Comidas",
+            "description": "Planes de alimentación personalizados",
+            "action": "meal_planning"
+        },
+    )
+    # PRO plan only
+    MENU_PRO_OPTIONS = (
+        {
+            "id": "premium_coaching",
+            "title": "⭐ Coaching Premium",
+            "description": "Sesiones personalizadas con especialistas",
+            "action": "premium_coaching"
+        },
+    )
+    # Full option list per plan; other plans only get the core options
+    MENU_OPTIONS_BY_PLAN = MappingProxyType({
+        "PRO": MENU_CORE_OPTIONS + MENU_PRO_PLUS_OPTIONS + MENU_PRO_OPTIONS,
+        "PLUS": MENU_CORE_OPTIONS + MENU_PRO_PLUS_OPTIONS
+    })
     
     def get_agent_name(self) -> str:
         return self.config.obesity_agent.name
@@ -102,7 +264,7 @@ class ObesityAgent(BaseCliviAgent):
         Send message tool - equivalent to Dialogflow CX SEND_MESSAGE function.
         Used for sending structured messages to users about obesity management.
         """
-        await self._log_activity_event(user_id, "SEND_MESSAGE_TOOL_USED", {
+        self._log_activity_event(user_id, "SEND_MESSAGE_TOOL_USED", {
             "template_name": template_name,
             "message_length": len(message)
         })
@@ -120,20 +282,13 @@ class ObesityAgent(BaseCliviAgent):
         Send onboarding link tool - equivalent to Dialogflow CX ONBOARDING_SEND_LINK function.
         Used for obesity patient onboarding process.
         """
-        await self._log_activity_event(user_id, "ONBOARDING_LINK_SENT", {
+        self._log_activity_event(user_id, "ONBOARDING_LINK_SENT", {
             "link_type": link_type
         })
         
-        onboarding_links = {
-            "obesity_onboarding": "https://drclivi.com/obesity/onboarding",
-            "weight_tracking": "https://drclivi.com/obesity/weight-tracking",
-            "nutrition_guide": "https://drclivi.com/obesity/nutrition",
-            "exercise_plan": "https://drclivi.com/obesity/exercise"
-        }
-        
         return {
             "action": "SEND_LINK",
-            "link": onboarding_links.get(link_type, onboarding_links["obesity_onboarding"]),
+            "link": self.ONBOARDING_LINKS.get(link_type, self.ONBOARDING_LINKS["obesity_onboarding"]),
             "message": f"Aquí tienes el enlace para {link_type.replace('_', ' ')}",
             "should_end_session": True
         }
@@ -144,7 +299,7 @@ class ObesityAgent(BaseCliviAgent):
         Appointment confirmation tool - equivalent to Dialogflow CX APPOINTMENT_CONFIRM function.
         Used for confirming obesity-related medical appointments.
         """
-        await self._log_activity_event(user_id, "APPOINTMENT_CONFIRMED", {
+        self._log_activity_event(user_id, "APPOINTMENT_CONFIRMED", {
             "appointment_id": appointment_id,
             "appointment_type": appointment_type
         })
@@ -171,7 +326,7 @@ class ObesityAgent(BaseCliviAgent):
         context.last_message = message
         context.last_intent = f"{context_type}_question"
         
-        await self._log_activity_event(user_id, "LAST_MESSAGE_SET", {
+        self._log_activity_event(user_id, "LAST_MESSAGE_SET", {
             "message_preview": message[:50] + "..." if len(message) > 50 else message,
             "context_type": context_type
         })
@@ -195,7 +350,7 @@ class ObesityAgent(BaseCliviAgent):
             if hasattr(context.patient, property_name):
                 setattr(context.patient, property_name, property_value)
         
-        await self._log_activity_event(user_id, "PROPERTY_UPDATED", {
+        self._log_activity_event(user_id, "PROPERTY_UPDATED", {
             "property_name": property_name,
             "property_value": property_value
         })
@@ -213,42 +368,14 @@ class ObesityAgent(BaseCliviAgent):
         Dr. Clivi How It Works tool - equivalent to Dialogflow CX DR_CLIVI_HOW_IT_WORKS data store.
         Used for explaining how Dr. Clivi's obesity management program works.
         """
-        await self._log_activity_event(user_id, "HOW_IT_WORKS_ACCESSED", {
+        self._log_activity_event(user_id, "HOW_IT_WORKS_ACCESSED", {
             "topic": topic
         })
         
-        explanations = {
-            "obesity_program": """
-            🏥 **Cómo funciona el programa de manejo de obesidad Dr. Clivi:**
-            
-            1. **Evaluación inicial**: Análisis completo de tu estado actual
-            2. **Plan personalizado**: Nutrición y ejercicio adaptados a ti
-            3. **Seguimiento continuo**: Monitoreo de peso y medidas corporales
-            4. **Apoyo médico**: Acceso a especialistas cuando lo necesites
-            5. **Medicamentos**: GLP-1 y otros tratamientos según indicación médica
-            """,
-            "weight_tracking": """
-            📊 **Sistema de seguimiento de peso:**
-            
-            - Registro semanal de peso y medidas
-            - Gráficas de progreso automáticas
-            - Alertas de tendencias importantes
-            - Reportes mensuales para tu médico
-            """,
-            "nutrition_plan": """
-            🥗 **Plan nutricional personalizado:**
-            
-            - Menús adaptados a tus preferencias y alergias
-            - Conteo de calorías y macronutrientes
-            - Recetas saludables y fáciles de preparar
-            - Ajustes según tu progreso
-            """
-        }
-        
         return {
             "action": "EXPLANATION_PROVIDED",
             "topic": topic,
-            "explanation": explanations.get(topic, explanations["obesity_program"]),
+            "explanation": self.HOW_IT_WORKS_EXPLANATIONS.get(topic, self.HOW_IT_WORKS_EXPLANATIONS["obesity_program"]),
             "should_end_session": True
         }
 
@@ -258,18 +385,7 @@ class ObesityAgent(BaseCliviAgent):
         Ask OpenAI tool - equivalent to Dialogflow CX Ask OpenAI function.
         Used for getting AI-powered responses for obesity-related queries.
         """
-        # Use the existing generative AI tool from the config
-        from ..tools import generative_ai
-        
-        ai_prompt = f"""
-        Contexto: Consulta de manejo de obesidad para paciente
-        Consulta del usuario: {query}
-        
-        Proporciona una respuesta médica informativa pero segura sobre manejo de obesidad,
-        incluyendo aspectos nutricionales y de ejercicio cuando sea apropiado.
-        Siempre verificar alergias alimentarias y limitaciones físicas.
-        Recordar recomendar consulta médica profesional para casos complejos.
-        """
+        ai_prompt = self.ASK_PROMPT_TEMPLATE.format(query=query)
         
         try:
             ai_response = await generative_ai.ask_generative_ai(
@@ -285,12 +401,8 @@ class ObesityAgent(BaseCliviAgent):
                 "context": context
             }
         except Exception as e:
-            self.logger.error(f"Error in Ask_OpenAI for user {user_id}: {str(e)}")
-            return {
-                "action": "AI_ERROR",
-                "error": "No pude procesar tu consulta en este momento. ¿Te gustaría hablar con un especialista?",
-                "fallback": True
-            }
+            self.logger.error("Error in Ask_OpenAI for user %s: %s", user_id, e)
+            return {**ASK_AI_ERROR_RESPONSE}
 
     # ========================================
     # OBESITY AGENT PROCESSING METHODS
@@ -303,12 +415,10 @@ class ObesityAgent(BaseCliviAgent):
         """
         query_lower = query.lower().strip()
         
-        self.logger.info(f"Processing obesity query for user {user_id}: {query}")
+        self.logger.info("Processing obesity query for user %s: %s", user_id, query)
         
         # WEIGHT MEASUREMENTS - HIGH PRIORITY
-        if any(keyword in query_lower for keyword in [
-            "peso", "pesé", "mi peso", "peso corporal", "medición", "balanza", "báscula"
-        ]):
+        if _WEIGHT_MEASUREMENTS_RE.search(query_lower):
             return {
                 "response": "Soy Dr. Clivi, parece que quieres enviarnos una medición. Puedo ayudarte.",
                 "action": "SEND_MESSAGE",
@@ -317,9 +427,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # GLP-1 MEDICATION MANAGEMENT
-        if any(keyword in query_lower for keyword in [
-            "ozempic", "trulicity", "glp-1", "glp1", "inyección", "medicamento", "medicina"
-        ]):
+        if _GLP_1_MEDICATION_MANAGEMENT_RE.search(query_lower):
             return {
                 "response": "Te ayudo con tu medicamento GLP-1. ¿Necesitas información sobre cómo inyectarte o tienes dudas sobre efectos secundarios?",
                 "action": "SEND_MESSAGE", 
@@ -328,9 +436,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # NUTRITION AND DIET QUERIES
-        if any(keyword in query_lower for keyword in [
-            "dieta", "comida", "alimentación", "qué comer", "menú", "nutrición", "calorías"
-        ]):
+        if _NUTRITION_AND_DIET_QUERIES_RE.search(query_lower):
             return {
                 "response": "Puedo ayudarte con recomendaciones nutricionales para el manejo de peso. ¿Tienes alguna alergia alimentaria que deba considerar?",
                 "action": "SEND_MESSAGE",
@@ -339,9 +445,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # EXERCISE AND PHYSICAL ACTIVITY
-        if any(keyword in query_lower for keyword in [
-            "ejercicio", "actividad física", "rutina", "entrenamiento", "deporte", "caminar"
-        ]):
+        if _EXERCISE_AND_PHYSICAL_ACTIVITY_RE.search(query_lower):
             return {
                 "response": "Te puedo recomendar ejercicios seguros para manejo de peso. ¿Tienes alguna limitación física o problema cardiovascular?",
                 "action": "SEND_MESSAGE",
@@ -350,9 +454,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # APPOINTMENT MANAGEMENT
-        if any(keyword in query_lower for keyword in [
-            "cita", "consulta", "doctor", "médico", "especialista", "agendar", "programar"
-        ]):
+        if _APPOINTMENT_MANAGEMENT_RE.search(query_lower):
             return {
                 "response": "Te ayudo con tu cita médica. ¿Necesitas agendar, reprogramar o confirmar una cita con nuestros especialistas en obesidad?",
                 "action": "SEND_MESSAGE",
@@ -361,9 +463,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # PROGRESS TRACKING
-        if any(keyword in query_lower for keyword in [
-            "progreso", "avance", "resultados", "bajé", "subí", "estancado", "no bajo"
-        ]):
+        if _PROGRESS_TRACKING_RE.search(query_lower):
             return {
                 "response": "Entiendo tu preocupación sobre el progreso. Revisemos tu seguimiento de peso y ajustemos el plan si es necesario.",
                 "action": "SEND_MESSAGE",
@@ -372,9 +472,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # SUPPLY MANAGEMENT
-        if any(keyword in query_lower for keyword in [
-            "envío", "pedido", "medicamento", "suministros", "entrega"
-        ]):
+        if _SUPPLY_MANAGEMENT_RE.search(query_lower):
             return {
                 "response": "Me parece que quieres apoyo con tus envíos. Yo te puedo ayudar",
                 "action": "SEND_MESSAGE",
@@ -383,9 +481,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # PHYSICAL SYMPTOMS - EMERGENCY PROTOCOL
-        if any(keyword in query_lower for keyword in [
-            "me siento mal", "síntomas", "dolor", "mareo", "nausea", "emergency"
-        ]):
+        if _PHYSICAL_SYMPTOMS_RE.search(query_lower):
             return {
                 "response": "Si sientes síntomas preocupantes, es importante que busques atención médica. ¿Es una situación de emergencia?",
                 "action": "EMERGENCY_PROTOCOL",
@@ -393,9 +489,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # COMPLAINTS AND FEEDBACK
-        if any(keyword in query_lower for keyword in [
-            "queja", "problema", "mal servicio", "insatisfecho", "molesto"
-        ]):
+        if _COMPLAINTS_AND_FEEDBACK_RE.search(query_lower):
             return {
                 "response": "Lamento que hayas tenido una mala experiencia. Tu opinión es importante para nosotros.",
                 "action": "SEND_MESSAGE", 
@@ -404,9 +498,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # GENERAL WEIGHT LOSS HELP
-        if any(keyword in query_lower for keyword in [
-            "bajar de peso", "perder peso", "adelgazar", "obesidad", "sobrepeso"
-        ]):
+        if _GENERAL_WEIGHT_LOSS_HELP_RE.search(query_lower):
             return {
                 "response": "Estoy aquí para ayudarte con tu plan de manejo de peso. ¿Te interesa información sobre nutrición, ejercicio o nuestros tratamientos médicos?",
                 "action": "SEND_MESSAGE",
@@ -415,9 +507,7 @@ class ObesityAgent(BaseCliviAgent):
             }
         
         # HELP AND SUPPORT
-        if any(keyword in query_lower for keyword in [
-            "ayuda", "support", "no entiendo", "como funciona", "información"
-        ]):
+        if _HELP_AND_SUPPORT_RE.search(query_lower):
             return {
                 "response": "Por favor, utiliza el siguiente menú para mejor asistencia.",
                 "action": "FLOW_REDIRECT",
@@ -462,7 +552,7 @@ class ObesityAgent(BaseCliviAgent):
             patient = PatientContext(**patient)
             context.patient = patient
         
-        await self._log_activity_event(user_id, "OBESITY_MAIN_MENU_ACCESS", {
+        self._log_activity_event(user_id, "OBESITY_MAIN_MENU_ACCESS", {
             "plan": patient.plan,
             "plan_status": patient.plan_status
         })
@@ -473,60 +563,7 @@ class ObesityAgent(BaseCliviAgent):
         #     return plan_access
             
         # Build main menu options based on plan
-        menu_options = []
-        
-        # Core obesity management options available to all plans
-        menu_options.extend([
-            {
-                "id": "weight_logging",
-                "title": "⚖️ Registrar Peso",
-                "description": "Registra tu peso y medidas corporales",
-                "action": "weight_measurements"
-            },
-            {
-                "id": "appointments", 
-                "title": "👩‍⚕️ Citas con Nutricionista",
-                "description": "Agendar o gestionar citas nutricionales",
-                "action": "nutritionist_appointment"
-            },
-            {
-                "id": "nutrition_education",
-                "title": "🥗 Educación Nutricional",
-                "description": "Aprende sobre alimentación saludable",
-                "action": "nutrition_education"
-            }
-        ])
-        
-        # Plan-specific options
-        if patient.plan in ["PRO", "PLUS"]:
-            menu_options.extend([
-                {
-                    "id": "glp1_management",
-                    "title": "💉 Manejo de GLP-1", 
-                    "description": "Tutoriales y seguimiento de medicamento",
-                    "action": "glp1_tutorials"
-                },
-                {
-                    "id": "progress_tracking",
-                    "title": "📈 Seguimiento de Progreso",
-                    "description": "Revisa tu progreso y establece metas",
-                    "action": "progress_tracking"
-                },
-                {
-                    "id": "meal_planning",
-                    "title": "🍽️ Planificación de Comidas",
-                    "description": "Planes de alimentación personalizados",
-                    "action": "meal_planning"
-                }
-            ])
-            
-        if patient.plan == "PRO":
-            menu_options.append({
-                "id": "premium_coaching",
-                "title": "⭐ Coaching Premium",
-                "description": "Sesiones personalizadas con especialistas",
-                "action": "premium_coaching"
-            })
+        menu_options = list(self.MENU_OPTIONS_BY_PLAN.get(patient.plan, self.MENU_CORE_OPTIONS))
         
         return {
             "response": f"¡Hola {patient.name_display or 'Paciente'}! 👋\n\nBienvenido a tu asistente de manejo de peso Dr. Clivi.\n\n¿En qué puedo ayudarte hoy?",
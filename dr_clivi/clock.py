@@ -0,0 +1,37 @@
+"""
+Cached wall clock for Dr. Clivi timestamps.
+
+Activity events, no-match records and session durations all stamp the
+current UTC time, often several times while handling one message. Inside
+an event loop ``utc_now()`` reuses the datetime it built last unless the
+loop clock has moved on by ``resolution`` seconds, so reads made in the
+same loop tick share one value.
+"""
+
+import asyncio
+import datetime
+
+
+class ClockCache:
+    """Callable returning a naive UTC datetime, rebuilt at most once per ``resolution``"""
+
+    __slots__ = ("resolution", "_stamp", "_value")
+
+    def __init__(self, resolution: float = 0.001):
+        self.resolution = resolution
+        self._stamp = 0.0
+        self._value = None
+
+    def __call__(self) -> datetime.datetime:
+        try:
+            now = asyncio.get_running_loop().time()
+        except RuntimeError:
+            # Outside a loop there is no tick to share
+            return datetime.datetime.utcnow()
+        if self._value is None or now - self._stamp >= self.resolution:
+            self._stamp = now
+            self._value = datetime.datetime.utcnow()
+        return self._value
+
+
+utc_now = ClockCache()
@@ -3,7 +3,9 @@ Configuration management for Dr. Clivi agents
 Based on analysis of exported Conversational Agents flows.
 """
 
+import functools
 import os
+from types import MappingProxyType
 from typing import Optional, List
 from pydantic_settings import BaseSettings
 
@@ -101,6 +103,10 @@ class CoordinatorAgentSettings(BaseSettings):
         "SUSPENDED": {"allow_routing": True, "show_warning": True},
         "CANCELED": {"allow_routing": False, "redirect_to": "reactivation_flow"}
     }
+    
+    # Per-user context cache (plan/status change on the order of minutes)
+    user_context_ttl_seconds: float = 60.0
+    user_context_cache_size: int = 1024
 
 
 class AgentSettings(BaseSettings):
@@ -207,7 +213,11 @@ class IntegrationSettings(BaseSettings):
     
     # Session activity tracking
     activity_logging_enabled: bool = True
-    activity_webhook: str = "https://n8n.clivi.com.mx/webhook/activity"
+    # Empty keeps events in the session only; set INTEGRATION_ACTIVITY_WEBHOOK
+    # (e.g. https://n8n.clivi.com.mx/webhook/activity) to deliver them
+    activity_webhook: str = ""
+    activity_batch_size: int = 50  # Max events per webhook delivery
+    activity_batch_delay_ms: int = 50  # Max wait to coalesce a batch
     
     class Config:
         env_prefix = "INTEGRATION_"
@@ -223,6 +233,8 @@ class FlowSettings(BaseSettings):
     # Timeout settings from analysis
     no_input_timeout_seconds: int = 300  # 5 minutes
     session_timeout_minutes: int = 30
+    # Sessions each agent keeps in memory; least recently used are dropped first
+    session_cache_size: int = 10000
     
     # Club plan specific settings
     club_plan_benefits_enabled: bool = True
@@ -244,6 +256,22 @@ class FlowSettings(BaseSettings):
 class Config:
     """Main configuration class with enhanced settings from flow analysis"""
     
+    # Lookup key -> Config attribute (get_agent_config)
+    AGENT_CONFIG_ATTRS = MappingProxyType({
+        "diabetes": "diabetes_agent",
+        "obesity": "obesity_agent",
+        "coordinator": "coordinator_agent"
+    })
+    
+    # Flow name -> FlowSettings flag (is_flow_enabled)
+    FLOW_ENABLED_FLAGS = MappingProxyType({
+        "help_desk_submenu": "help_desk_submenu_enabled",
+        "technical_support": "technical_support_enabled",
+        "billing_support": "billing_support_enabled",
+        "club_plan_benefits": "club_plan_benefits_enabled",
+        "club_plan_activities": "club_plan_activities_enabled"
+    })
+    
     def __init__(self):
         self.base_agent = BaseAgentSettings()
         self.diabetes_agent = DiabetesAgentSettings()
@@ -288,23 +316,13 @@ class Config:
     
     def get_agent_config(self, agent_type: str):
         """Get configuration for specific agent type"""
-        agent_configs = {
-            "diabetes": self.diabetes_agent,
-            "obesity": self.obesity_agent,
-            "coordinator": self.coordinator_agent
-        }
-        return agent_configs.get(agent_type, self.base_agent)
+        attr = self.AGENT_CONFIG_ATTRS.get(agent_type)
+        return getattr(self, attr) if attr else self.base_agent
     
     def is_flow_enabled(self, flow_name: str) -> bool:
         """Check if a specific flow is enabled"""
-        flow_settings = {
-            "help_desk_submenu": self.flows.help_desk_submenu_enabled,
-            "technical_support": self.flows.technical_support_enabled,
-            "billing_support": self.flows.billing_support_enabled,
-            "club_plan_benefits": self.flows.club_plan_benefits_enabled,
-            "club_plan_activities": self.flows.club_plan_activities_enabled
-        }
-        return flow_settings.get(flow_name, True)
+        flag = self.FLOW_ENABLED_FLAGS.get(flow_name)
+        return getattr(self.flows, flag) if flag else True
     
     def get_routing_rules(self, plan: str, status: str) -> dict:
         """Get routing rules for specific plan and status combination"""
@@ -316,3 +334,9 @@ class Config:
             "status_rules": status_rules,
             "allow_routing": status_rules.get("allow_routing", False) and bool(plan_rules)
         }
+
+
+@functools.cache
+def get_config() -> Config:
+    """Shared Config instance - .env and settings are parsed once per process"""
+    return Config()
@@ -3,9 +3,11 @@ Deterministic Flow Handler - Exact implementation of Clivi's original flows
 Handles structured WhatsApp menu interactions without AI interpretation.
 """
 
+import functools
 import logging
 from typing import Any, Dict, List, Optional, Tuple
 from enum import Enum
+from types import MappingProxyType
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -13,6 +15,71 @@ from .dialogflow_pages import DialogflowPageImplementor
 
 logger = logging.getLogger(__name__)
 
+# Callback IDs exactos de botones (is_deterministic_input)
+_EXACT_BUTTON_IDS = frozenset({
+    "APPOINTMENTS", "MEASUREMENTS", "MEASUREMENTS_REPORT", "INVOICE_LABS",
+    "MEDS_GLP", "QUESTION_TYPE", "NO_NEEDED_QUESTION_PATIENT", "PATIENT_COMPLAINT",
+    "APPOINTMENTS_LIST_SEND", "APPOINTMENT_RESCHEDULER", "SEND_QUESTION",
+    "LOG_WEIGHT", "LOG_GLUCOSE_FASTING", "LOG_GLUCOSE_POST_MEAL",
+    "LOG_HIP", "LOG_WAIST", "LOG_NECK",
+    "DIABETES_QUESTION", "NUTRITION_QUESTION", "PSYCHOLOGY_QUESTION",
+    "SUPPLIES_QUESTION", "HIGH_SPECIALIZATION_QUESTION",
+    "INVOICE", "UPLOAD_LABS", "CALL_SUPPORT", "PX_QUESTION_TAG",
+    "FULL_REPORT", "GLUCOSE_REPORT"
+})
+
+# Saludos básicos que muestran el menú principal
+_BASIC_GREETINGS = frozenset({
+    "hola", "inicio", "menu", "menú", "opciones", 
+    "start", "comenzar", "hola doctor", "dr clivi"
+})
+
+# Contenido médico que manda un saludo a routing inteligente
+_MEDICAL_KEYWORDS = (
+    "glucosa", "diabetes", "peso", "dolor", "medicamento", 
+    "metformina", "ozempic", "insulina", "presión", "mg/dl",
+    "ayuda", "problema", "síntoma", "tratamiento", "plan"
+)
+
+# Disparadores de menú principal (route_deterministic_input)
+_MAIN_MENU_TRIGGERS = (
+    "hola", "menu", "inicio", "clivi", "dr clivi", 
+    "opciones", "ayuda", "start", "comenzar"
+)
+
+# Button ID -> (página, selección) para callbacks de Telegram
+_BUTTON_MAPPINGS = MappingProxyType({
+    # Main menu buttons
+    "APPOINTMENTS": ("mainMenu", "APPOINTMENTS"),
+    "MEASUREMENTS": ("mainMenu", "MEASUREMENTS"),
+    "MEASUREMENTS_REPORT": ("mainMenu", "MEASUREMENTS_REPORT"),
+    "INVOICE_LABS": ("mainMenu", "INVOICE_LABS"),
+    "MEDS_GLP": ("mainMenu", "MEDS_GLP"),
+    "QUESTION_TYPE": ("mainMenu", "QUESTION_TYPE"),
+    "NO_NEEDED_QUESTION_PATIENT": ("mainMenu", "NO_NEEDED_QUESTION_PATIENT"),
+    "PATIENT_COMPLAINT": ("mainMenu", "PATIENT_COMPLAINT"),
+    
+    # Appointments menu buttons
+    "APPOINTMENTS_LIST_SEND": ("apptsMenu", "APPOINTMENTS_LIST_SEND"),
+    "APPOINTMENT_RESCHEDULER": ("apptsMenu", "APPOINTMENT_RESCHEDULER"),
+    "SEND_QUESTION": ("apptsMenu", "SEND_QUESTION"),
+    
+    # Measurements menu buttons
+    "LOG_WEIGHT": ("measurementsMenu", "LOG_WEIGHT"),
+    "LOG_GLUCOSE_FASTING": ("measurementsMenu", "LOG_GLUCOSE_FASTING"),
+    "LOG_GLUCOSE_POST_MEAL": ("measurementsMenu", "LOG_GLUCOSE_POST_MEAL"),
+    "LOG_HIP": ("measurementsMenu", "LOG_HIP"),
+    "LOG_WAIST": ("measurementsMenu", "LOG_WAIST"),
+    "LOG_NECK": ("measurementsMenu", "LOG_NECK"),
+    
+    # Questions menu buttons
+    "DIABETES_QUESTION": ("questionsTags", "DIABETES_QUESTION"),
+    "NUTRITION_QUESTION": ("questionsTags", "NUTRITION_QUESTION"),
+    "PSYCHOLOGY_QUESTION": ("questionsTags", "PSYCHOLOGY_QUESTION"),
+    "SUPPLIES_QUESTION": ("questionsTags", "SUPPLIES_QUESTION"),
+    "HIGH_SPECIALIZATION_QUESTION": ("questionsTags", "HIGH_SPECIALIZATION_QUESTION")
+})
+
 
 class PlanType(Enum):
     """Plan types from checkPlanStatus analysis"""
@@ -29,6 +96,11 @@ class PlanStatus(Enum):
     CANCELED = "CANCELED"
 
 
+# Plan/status groups from the checkPlanStatus conditions
+_SPECIALIST_PLAN_TYPES = frozenset({PlanType.PRO, PlanType.PLUS, PlanType.BASIC})
+_ROUTABLE_PLAN_STATUSES = frozenset({PlanStatus.ACTIVE, PlanStatus.SUSPENDED})
+
+
 class MenuOption(Enum):
     """Main menu options from mainMenu.json analysis"""
     APPOINTMENTS = "APPOINTMENTS"
@@ -41,9 +113,13 @@ class MenuOption(Enum):
     PATIENT_COMPLAINT = "PATIENT_COMPLAINT"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UserContext:
-    """User context from session parameters"""
+    """
+    User context from session parameters.
+    Frozen: the coordinator caches one instance per user and shares it
+    between that user's concurrent requests.
+    """
     user_id: str
     patient_name: str
     plan: PlanType
@@ -53,6 +129,10 @@ class UserContext:
     current_page: str = None
     session_data: Dict[str, Any] = None
 
+    def as_dict(self) -> Dict[str, Any]:
+        """Shallow field mapping (slotted instances have no __dict__)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
 
 class DeterministicFlowHandler:
     """
@@ -64,9 +144,15 @@ class DeterministicFlowHandler:
         self.config = config  # Optional config for future use
         self.page_implementor = DialogflowPageImplementor(config)
         self.menu_options = self._load_menu_structure()
+        self._menu_text_matchers = self._build_menu_text_matchers()
     
-    def _load_menu_structure(self) -> Dict[str, Dict[str, Any]]:
-        """Load the exact menu structure from mainMenu.json analysis"""
+    @staticmethod
+    @functools.cache
+    def _load_menu_structure() -> Dict[str, Dict[str, Any]]:
+        """
+        Load the exact menu structure from mainMenu.json analysis.
+        Built once and shared by every handler instance - do not mutate.
+        """
         return {
             "APPOINTMENTS": {
                 "title": "Citas",
@@ -118,6 +204,15 @@ class DeterministicFlowHandler:
             }
         }
     
+    @staticmethod
+    @functools.cache
+    def _build_menu_text_matchers() -> Tuple[Tuple[str, str, Tuple[str, ...]], ...]:
+        """(option_id, lowercase title, lowercase description words) for text matching"""
+        return tuple(
+            (option_id, option["title"].lower(), tuple(option["description"].lower().split()))
+            for option_id, option in DeterministicFlowHandler._load_menu_structure().items()
+        )
+    
     def check_plan_status(self, user_context: UserContext) -> Dict[str, Any]:
         """
         Exact implementation of checkPlanStatus flow logic.
@@ -135,7 +230,7 @@ class DeterministicFlowHandler:
             }
         
         # CLUB plan with ACTIVE/SUSPENDED status  
-        if plan == PlanType.CLUB and status in [PlanStatus.ACTIVE, PlanStatus.SUSPENDED]:
+        if plan == PlanType.CLUB and status in _ROUTABLE_PLAN_STATUSES:
             return {
                 "flow": "clubPlan",
                 "action": "log_session_start",
@@ -143,7 +238,7 @@ class DeterministicFlowHandler:
             }
         
         # PRO/PLUS/BASIC plans with ACTIVE/SUSPENDED status
-        if plan in [PlanType.PRO, PlanType.PLUS, PlanType.BASIC] and status in [PlanStatus.ACTIVE, PlanStatus.SUSPENDED]:
+        if plan in _SPECIALIST_PLAN_TYPES and status in _ROUTABLE_PLAN_STATUSES:
             return {
                 "flow": "diabetesPlans", 
                 "target_page": "mainMenu",
@@ -247,40 +342,17 @@ class DeterministicFlowHandler:
         user_lower = user_input.lower()
         
         # 1. Callback queries exactos (botones presionados)
-        exact_button_ids = [
-            "APPOINTMENTS", "MEASUREMENTS", "MEASUREMENTS_REPORT", "INVOICE_LABS",
-            "MEDS_GLP", "QUESTION_TYPE", "NO_NEEDED_QUESTION_PATIENT", "PATIENT_COMPLAINT",
-            "APPOINTMENTS_LIST_SEND", "APPOINTMENT_RESCHEDULER", "SEND_QUESTION",
-            "LOG_WEIGHT", "LOG_GLUCOSE_FASTING", "LOG_GLUCOSE_POST_MEAL",
-            "LOG_HIP", "LOG_WAIST", "LOG_NECK",
-            "DIABETES_QUESTION", "NUTRITION_QUESTION", "PSYCHOLOGY_QUESTION",
-            "SUPPLIES_QUESTION", "HIGH_SPECIALIZATION_QUESTION",
-            "INVOICE", "UPLOAD_LABS", "CALL_SUPPORT", "PX_QUESTION_TAG",
-            "FULL_REPORT", "GLUCOSE_REPORT"
-        ]
-        
-        if user_upper in exact_button_ids:
+        if user_upper in _EXACT_BUTTON_IDS:
             return True
         
         # 2. Saludos básicos muy específicos (solo para mostrar menú principal)
-        basic_greetings = [
-            "hola", "inicio", "menu", "menú", "opciones", 
-            "start", "comenzar", "hola doctor", "dr clivi"
-        ]
-        
         # Debe ser coincidencia exacta o muy cercana para saludos
-        if user_lower in basic_greetings:
+        if user_lower in _BASIC_GREETINGS:
             return True
             
         # Si contiene saludo pero también contenido médico, va a IA
-        medical_keywords = [
-            "glucosa", "diabetes", "peso", "dolor", "medicamento", 
-            "metformina", "ozempic", "insulina", "presión", "mg/dl",
-            "ayuda", "problema", "síntoma", "tratamiento", "plan"
-        ]
-        
-        if any(greeting in user_lower for greeting in basic_greetings):
-            if any(medical in user_lower for medical in medical_keywords):
+        if any(greeting in user_lower for greeting in _BASIC_GREETINGS):
+            if any(medical in user_lower for medical in _MEDICAL_KEYWORDS):
                 return False  # Tiene saludo + contenido médico -> IA
         
         # 3. Todo lo demás va a routing inteligente
@@ -296,12 +368,7 @@ class DeterministicFlowHandler:
         user_upper = user_input.upper().strip()
         
         # Main menu triggers
-        main_menu_triggers = [
-            "hola", "menu", "inicio", "clivi", "dr clivi", 
-            "opciones", "ayuda", "start", "comenzar"
-        ]
-        
-        if any(trigger in user_lower for trigger in main_menu_triggers):
+        if any(trigger in user_lower for trigger in _MAIN_MENU_TRIGGERS):
             # Trigger keyWordMainMenu intent → checkPlanStatus flow
             plan_result = self.check_plan_status(user_context)
             
@@ -319,46 +386,14 @@ class DeterministicFlowHandler:
                 return plan_result
         
         # Check for exact button ID matches (callback queries from Telegram)
-        button_mappings = {
-            # Main menu buttons
-            "APPOINTMENTS": ("mainMenu", "APPOINTMENTS"),
-            "MEASUREMENTS": ("mainMenu", "MEASUREMENTS"),
-            "MEASUREMENTS_REPORT": ("mainMenu", "MEASUREMENTS_REPORT"),
-            "INVOICE_LABS": ("mainMenu", "INVOICE_LABS"),
-            "MEDS_GLP": ("mainMenu", "MEDS_GLP"),
-            "QUESTION_TYPE": ("mainMenu", "QUESTION_TYPE"),
-            "NO_NEEDED_QUESTION_PATIENT": ("mainMenu", "NO_NEEDED_QUESTION_PATIENT"),
-            "PATIENT_COMPLAINT": ("mainMenu", "PATIENT_COMPLAINT"),
-            
-            # Appointments menu buttons
-            "APPOINTMENTS_LIST_SEND": ("apptsMenu", "APPOINTMENTS_LIST_SEND"),
-            "APPOINTMENT_RESCHEDULER": ("apptsMenu", "APPOINTMENT_RESCHEDULER"),
-            "SEND_QUESTION": ("apptsMenu", "SEND_QUESTION"),
-            
-            # Measurements menu buttons
-            "LOG_WEIGHT": ("measurementsMenu", "LOG_WEIGHT"),
-            "LOG_GLUCOSE_FASTING": ("measurementsMenu", "LOG_GLUCOSE_FASTING"),
-            "LOG_GLUCOSE_POST_MEAL": ("measurementsMenu", "LOG_GLUCOSE_POST_MEAL"),
-            "LOG_HIP": ("measurementsMenu", "LOG_HIP"),
-            "LOG_WAIST": ("measurementsMenu", "LOG_WAIST"),
-            "LOG_NECK": ("measurementsMenu", "LOG_NECK"),
-            
-            # Questions menu buttons
-            "DIABETES_QUESTION": ("questionsTags", "DIABETES_QUESTION"),
-            "NUTRITION_QUESTION": ("questionsTags", "NUTRITION_QUESTION"),
-            "PSYCHOLOGY_QUESTION": ("questionsTags", "PSYCHOLOGY_QUESTION"),
-            "SUPPLIES_QUESTION": ("questionsTags", "SUPPLIES_QUESTION"),
-            "HIGH_SPECIALIZATION_QUESTION": ("questionsTags", "HIGH_SPECIALIZATION_QUESTION")
-        }
-        
-        if user_upper in button_mappings:
-            page_name, selection_id = button_mappings[user_upper]
+        if user_upper in _BUTTON_MAPPINGS:
+            page_name, selection_id = _BUTTON_MAPPINGS[user_upper]
             return self.handle_page_selection(page_name, selection_id, user_context)
         
         # Try to match menu option selection by text content
-        for option_id, option_data in self.menu_options.items():
-            if (option_data["title"].lower() in user_lower or 
-                any(word in user_lower for word in option_data["description"].lower().split())):
+        for option_id, title_lower, description_words in self._menu_text_matchers:
+            if (title_lower in user_lower or 
+                any(word in user_lower for word in description_words)):
                 return self.handle_main_menu_selection(user_context, option_id)
         
         # If we get here, it's ambiguous - trigger intelligent routing
@@ -3,6 +3,7 @@ Implementación exacta de las páginas de Dialogflow CX para Dr. Clivi
 Reproduce fielmente los flujos determinísticos documentados
 """
 
+import functools
 import logging
 from typing import Any, Dict, List, Optional
 from enum import Enum
@@ -34,8 +35,13 @@ class DialogflowPageImplementor:
         self.config = config
         self.pages = self._load_page_definitions()
     
-    def _load_page_definitions(self) -> Dict[str, Dict[str, Any]]:
-        """Carga las definiciones exactas de páginas desde Dialogflow"""
+    @staticmethod
+    @functools.cache
+    def _load_page_definitions() -> Dict[str, Dict[str, Any]]:
+        """
+        Carga las definiciones exactas de páginas desde Dialogflow.
+        Se construye una sola vez y se comparte entre instancias: no mutar.
+        """
         return {
             "mainMenu": {
                 "display_name": "mainMenu",
@@ -391,7 +397,7 @@ class DialogflowPageImplementor:
         Renderiza una página específica según las definiciones de Dialogflow
         """
         if page_name not in self.pages:
-            logger.error(f"Página no encontrada: {page_name}")
+            logger.error("Página no encontrada: %s", page_name)
             return self._render_fallback_page(user_context)
         
         page_def = self.pages[page_name]
@@ -496,7 +502,7 @@ class DialogflowPageImplementor:
         transitions = self.get_page_transitions(page_name)
         
         if selection_id not in transitions:
-            logger.warning(f"Selección desconocida '{selection_id}' en página '{page_name}'")
+            logger.warning("Selección desconocida '%s' en página '%s'", selection_id, page_name)
             return {
                 "action": "trigger_intelligent_routing",
                 "reason": "unknown_selection",
@@ -0,0 +1,47 @@
+"""
+Per-request logging context for Dr. Clivi.
+
+The coordinator binds ``user_id`` and ``query_id`` at its entry point; any
+log record emitted from that task (and the tasks it spawns) carries them
+through ``RequestContextFilter`` as ``%(user_id)s`` / ``%(query_id)s``.
+"""
+
+import logging
+import time
+from contextvars import ContextVar, Token
+from typing import Tuple
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(user_id)s %(query_id)s] %(message)s'
+
+user_id_var: ContextVar[str] = ContextVar("user_id", default="-")
+query_id_var: ContextVar[str] = ContextVar("query_id", default="-")
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current user_id / query_id to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.user_id = user_id_var.get()
+        record.query_id = query_id_var.get()
+        return True
+
+
+def bind_request(user_id: str) -> Tuple[Token, Token]:
+    """Bind user_id and a fresh query_id; returns tokens for reset_request"""
+    return (
+        user_id_var.set(user_id),
+        query_id_var.set(f"{time.time_ns():x}"),
+    )
+
+
+def reset_request(tokens: Tuple[Token, Token]) -> None:
+    user_token, query_token = tokens
+    query_id_var.reset(query_token)
+    user_id_var.reset(user_token)
+
+
+def install_request_context_filter(logger: logging.Logger = None) -> None:
+    """Attach RequestContextFilter to the handlers of ``logger`` (root by default)"""
+    logger = logger or logging.getLogger()
+    for handler in logger.handlers:
+        handler.addFilter(RequestContextFilter())
@@ -3,7 +3,7 @@ Telegram API Client - Maneja exclusivamente las llamadas a la API de Telegram
 """
 
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import httpx
 
 logger = logging.getLogger(__name__)
@@ -15,6 +15,21 @@ class TelegramAPIClient:
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # getMe no cambia para un token; se guarda tras la primera respuesta ok
+        self._bot_info: Optional[Dict[str, Any]] = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        """Cliente compartido: reutiliza la conexión TCP/TLS entre llamadas"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient()
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente HTTP compartido"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     async def send_message(self, chat_id: str, text: str, reply_markup: Dict = None, parse_mode: str = "Markdown") -> bool:
         """Envía mensaje de texto"""
@@ -40,33 +55,38 @@ class TelegramAPIClient:
         return await self._api_call("setWebhook", {"url": webhook_url})
     
     async def get_me(self) -> Dict[str, Any]:
-        """Obtiene info del bot"""
+        """Obtiene info del bot (en cache tras la primera llamada exitosa - no mutar)"""
+        if self._bot_info is not None:
+            return self._bot_info
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.api_url}/getMe")
-                return response.json() if response.status_code == 200 else {"error": response.status_code}
+            response = await self._client().get(f"{self.api_url}/getMe")
+            if response.status_code != 200:
+                return {"error": response.status_code}
+            bot_info = response.json()
+            if bot_info.get("ok"):
+                self._bot_info = bot_info
+            return bot_info
         except Exception as e:
-            logger.error(f"Error getting bot info: {e}")
+            logger.error("Error getting bot info: %s", e)
             return {"error": str(e)}
     
     async def _api_call(self, method: str, payload: Dict[str, Any]) -> bool:
         """Llamada genérica a la API"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.api_url}/{method}", json=payload)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get("ok"):
-                        logger.debug(f"API call {method} successful")
-                        return True
-                    else:
-                        logger.error(f"API error for {method}: {result}")
-                        return False
+            response = await self._client().post(f"{self.api_url}/{method}", json=payload)
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("ok"):
+                    logger.debug("API call %s successful", method)
+                    return True
                 else:
-                    logger.error(f"HTTP error for {method}: {response.status_code}")
+                    logger.error("API error for %s: %s", method, result)
                     return False
-                    
+            else:
+                logger.error("HTTP error for %s: %s", method, response.status_code)
+                return False
+                
         except Exception as e:
-            logger.error(f"Error in API call {method}: {e}")
+            logger.error("Error in API call %s: %s", method, e)
             return False
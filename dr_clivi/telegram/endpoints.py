@@ -57,10 +57,14 @@ async def set_webhook(webhook_data: Dict[str, str]):
     return JSONResponse(content={"success": success, "webhook_url": webhook_url})
 
 
+# Static payload, built once (shared - do not mutate)
+HEALTH_RESPONSE = {"status": "healthy", "service": "dr-clivi-telegram-bot"}
+
+
 @app.get("/health")
 async def health_check():
     """Health check"""
-    return {"status": "healthy", "service": "dr-clivi-telegram-bot"}
+    return HEALTH_RESPONSE
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 Telegram Handler Optimizado - Versión refactorizada más corta y eficiente
 """
 
+import asyncio
 import logging
 from typing import Any, Dict
 from functools import wraps
@@ -21,7 +22,7 @@ def handle_errors(func):
         try:
             return await func(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Error in {func.__name__}: {e}")
+            logger.error("Error in %s: %s", func.__name__, e)
             return False
     return wrapper
 
@@ -62,7 +63,7 @@ class TelegramHandlerOptimized:
         chat_id = str(message.get('chat', {}).get('id'))
         text = message.get('text', '')
         
-        logger.info(f"Message from {user_id}: {text}")
+        logger.info("Message from %s: %s", user_id, text)
         
         # Procesar con coordinator
         response = await self.coordinator.process_user_input(
@@ -85,14 +86,14 @@ class TelegramHandlerOptimized:
         chat_id = str(callback_query.get('message', {}).get('chat', {}).get('id'))
         data = callback_query.get('data', '')
         
-        logger.info(f"Callback from {user_id}: {data}")
+        logger.info("Callback from %s: %s", user_id, data)
         
-        # Responder callback query
-        await self.api.answer_callback_query(callback_query.get('id'))
-        
-        # Procesar selección
-        response = await self.coordinator.process_user_input(
-            user_id=user_id, user_input=data, phone_number=None
+        # Responder callback query y procesar selección en paralelo
+        _, response = await asyncio.gather(
+            self.api.answer_callback_query(callback_query.get('id')),
+            self.coordinator.process_user_input(
+                user_id=user_id, user_input=data, phone_number=None
+            )
         )
         
         await self._send_response(chat_id, response)
@@ -109,7 +110,7 @@ class TelegramHandlerOptimized:
         handler_name = self.RESPONSE_HANDLERS.get(response_type, "_send_fallback")
         handler = getattr(self, handler_name)
         
-        logger.info(f"Sending {response_type} to {chat_id}")
+        logger.info("Sending %s to %s", response_type, chat_id)
         return await handler(chat_id, response)
     
     async def _send_menu(self, chat_id: str, response: Dict[str, Any]) -> bool:
@@ -131,7 +132,7 @@ class TelegramHandlerOptimized:
         """Envía mensaje de emergencia"""
         immediate_actions = response.get("immediate_actions", [])
         text = self.formatter.format_emergency_message(immediate_actions)
-        logger.critical(f"EMERGENCY message to {chat_id}")
+        logger.critical("EMERGENCY message to %s", chat_id)
         return await self.api.send_message(chat_id, text)
     
     async def _send_specialist_response(self, chat_id: str, response: Dict[str, Any]) -> bool:
@@ -146,7 +147,7 @@ class TelegramHandlerOptimized:
     
     async def _send_fallback(self, chat_id: str, response: Dict[str, Any]) -> bool:
         """Fallback para tipos desconocidos"""
-        logger.warning(f"Unknown response type: {response.get('response_type')}")
+        logger.warning("Unknown response type: %s", response.get('response_type'))
         return await self.api.send_message(
             chat_id, "Disculpa, ocurrió un error. ¿Puedes intentar de nuevo?"
         )
@@ -38,7 +38,7 @@ class MessageFormatter:
             }
             
         except Exception as e:
-            logger.error(f"Error converting WhatsApp menu: {e}")
+            logger.error("Error converting WhatsApp menu: %s", e)
             return {"text": "Error en el menú", "reply_markup": None}
     
     @staticmethod
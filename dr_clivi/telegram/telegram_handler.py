@@ -33,6 +33,22 @@ class TelegramBotHandler:
         self.coordinator = IntelligentCoordinator(config)
         self.bot_token = config.telegram.bot_token
         self.telegram_api_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # getMe never changes for a token; cached after the first successful call
+        self._bot_info: Optional[Dict[str, Any]] = None
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Shared client so consecutive API calls reuse the pooled TCP/TLS connection"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient()
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and the coordinator"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        await self.coordinator.aclose()
     
     async def process_telegram_update(self, update_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -45,11 +61,11 @@ class TelegramBotHandler:
             elif 'callback_query' in update_data:
                 return await self._handle_callback_query(update_data['callback_query'])
             else:
-                logger.info(f"Unhandled update type: {update_data}")
+                logger.info("Unhandled update type: %s", update_data)
                 return {"status": "ignored", "reason": "unknown_update_type"}
                 
         except Exception as e:
-            logger.error(f"Error processing Telegram update: {e}")
+            logger.error("Error processing Telegram update: %s", e)
             raise HTTPException(status_code=500, detail=f"Update processing error: {e}")
     
     async def _handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
@@ -58,13 +74,18 @@ class TelegramBotHandler:
         chat_id = str(message.get('chat', {}).get('id'))
         text = message.get('text', '')
         
-        logger.info(f"Processing message from user {user_id}: {text}")
+        logger.info("Processing message from user %s: %s", user_id, text)
         
-        # Process through the hybrid coordinator (reusing all existing logic)
-        response = await self.coordinator.process_user_input(
-            user_id=user_id,
-            user_input=text,
-            phone_number=None  # Telegram doesn't require phone
+        # Process through the hybrid coordinator (reusing all existing logic).
+        # The "typing" indicator goes out while the answer is generated so the
+        # user gets feedback before the full reply is ready
+        _, response = await asyncio.gather(
+            self._send_chat_action(chat_id),
+            self.coordinator.process_user_input(
+                user_id=user_id,
+                user_input=text,
+                phone_number=None  # Telegram doesn't require phone
+            )
         )
         
         # Send response back to user
@@ -83,16 +104,17 @@ class TelegramBotHandler:
         chat_id = str(callback_query.get('message', {}).get('chat', {}).get('id'))
         data = callback_query.get('data', '')
         
-        logger.info(f"Processing callback from user {user_id}: {data}")
+        logger.info("Processing callback from user %s: %s", user_id, data)
         
-        # Answer the callback query to remove loading state
-        await self._answer_callback_query(callback_query.get('id'))
-        
-        # Process the selection through coordinator
-        response = await self.coordinator.process_user_input(
-            user_id=user_id,
-            user_input=data,  # Button data acts as user input
-            phone_number=None
+        # Answer the callback query (removes loading state) while the
+        # selection is processed - neither depends on the other
+        _, response = await asyncio.gather(
+            self._answer_callback_query(callback_query.get('id')),
+            self.coordinator.process_user_input(
+                user_id=user_id,
+                user_input=data,  # Button data acts as user input
+                phone_number=None
+            )
         )
         
         # Send response
@@ -112,8 +134,8 @@ class TelegramBotHandler:
         """
         try:
             response_type = response.get("response_type")
-            logger.info(f"Sending response type '{response_type}' to chat {chat_id}")
-            logger.debug(f"Full response: {response}")
+            logger.info("Sending response type '%s' to chat %s", response_type, chat_id)
+            logger.debug("Full response: %s", response)
             
             if response_type == "whatsapp_menu":
                 # Convert WhatsApp menu to Telegram inline keyboard
@@ -129,11 +151,11 @@ class TelegramBotHandler:
                 return await self._send_text_message(chat_id, response.get("response", ""))
             else:
                 # Fallback
-                logger.warning(f"Unknown response type: {response_type}, using fallback")
+                logger.warning("Unknown response type: %s, using fallback", response_type)
                 return await self._send_text_message(chat_id, "Disculpa, ocurrió un error. ¿Puedes intentar de nuevo?")
                 
         except Exception as e:
-            logger.error(f"Error sending response to {chat_id}: {e}")
+            logger.error("Error sending response to %s: %s", chat_id, e)
             return False
     
     async def _send_telegram_menu(self, chat_id: str, response: Dict[str, Any]) -> bool:
@@ -176,7 +198,7 @@ class TelegramBotHandler:
             return await self._make_telegram_api_call("sendMessage", payload)
             
         except Exception as e:
-            logger.error(f"Error sending Telegram menu to {chat_id}: {e}")
+            logger.error("Error sending Telegram menu to %s: %s", chat_id, e)
             return False
     
     async def _send_text_message(self, chat_id: str, text: str) -> bool:
@@ -191,7 +213,7 @@ class TelegramBotHandler:
             return await self._make_telegram_api_call("sendMessage", payload)
             
         except Exception as e:
-            logger.error(f"Error sending text to {chat_id}: {e}")
+            logger.error("Error sending text to %s: %s", chat_id, e)
             return False
     
     async def _send_emergency_message(self, chat_id: str, response: Dict[str, Any]) -> bool:
@@ -203,7 +225,7 @@ class TelegramBotHandler:
             # Format as emergency with emoji and markdown
             formatted_text = f"🚨 **EMERGENCIA MÉDICA** 🚨\n\n{emergency_text}"
             
-            logger.critical(f"Sending EMERGENCY message to Telegram chat {chat_id}")
+            logger.critical("Sending EMERGENCY message to Telegram chat %s", chat_id)
             
             payload = {
                 "chat_id": chat_id,
@@ -214,7 +236,7 @@ class TelegramBotHandler:
             return await self._make_telegram_api_call("sendMessage", payload)
             
         except Exception as e:
-            logger.error(f"Error sending emergency message to {chat_id}: {e}")
+            logger.error("Error sending emergency message to %s: %s", chat_id, e)
             return False
     
     async def _handle_page_navigation(self, chat_id: str, page_data: Dict[str, Any]) -> bool:
@@ -236,10 +258,10 @@ class TelegramBotHandler:
                 },
                 "parse_mode": "Markdown"
             }
-            logger.info(f"Enviando menú paginado a chat {chat_id}")
+            logger.info("Enviando menú paginado a chat %s", chat_id)
             return await self._make_telegram_api_call("sendMessage", payload)
         except Exception as e:
-            logger.error(f"Error enviando menú paginado a {chat_id}: {e}")
+            logger.error("Error enviando menú paginado a %s: %s", chat_id, e)
             return False
     
     async def _answer_callback_query(self, callback_query_id: str) -> bool:
@@ -252,7 +274,16 @@ class TelegramBotHandler:
             return await self._make_telegram_api_call("answerCallbackQuery", payload)
             
         except Exception as e:
-            logger.error(f"Error answering callback query {callback_query_id}: {e}")
+            logger.error("Error answering callback query %s: %s", callback_query_id, e)
+            return False
+    
+    async def _send_chat_action(self, chat_id: str, action: str = "typing") -> bool:
+        """Show a chat action (e.g. typing...) until the next message is sent"""
+        try:
+            return await self._make_telegram_api_call(
+                "sendChatAction", {"chat_id": chat_id, "action": action})
+        except Exception as e:
+            logger.error("Error sending chat action to %s: %s", chat_id, e)
             return False
     
     async def _make_telegram_api_call(self, method: str, payload: Dict[str, Any]) -> bool:
@@ -260,25 +291,24 @@ class TelegramBotHandler:
         try:
             url = f"{self.telegram_api_url}/{method}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get("ok"):
-                        logger.debug(f"Telegram API call {method} successful")
-                        return True
-                    else:
-                        logger.error(f"Telegram API error for {method}: {result}")
-                        return False
+            response = await self._get_http_client().post(url, json=payload)
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("ok"):
+                    logger.debug("Telegram API call %s successful", method)
+                    return True
                 else:
-                    logger.error(f"Telegram API HTTP error for {method}: {response.status_code}")
-                    logger.error(f"Response body: {response.text}")
-                    logger.error(f"Payload sent: {payload}")
+                    logger.error("Telegram API error for %s: %s", method, result)
                     return False
-                    
+            else:
+                logger.error("Telegram API HTTP error for %s: %s", method, response.status_code)
+                logger.error("Response body: %s", response.text)
+                logger.error("Payload sent: %s", payload)
+                return False
+                
         except Exception as e:
-            logger.error(f"Error making Telegram API call {method}: {e}")
+            logger.error("Error making Telegram API call %s: %s", method, e)
             return False
     
     async def set_webhook(self, webhook_url: str) -> bool:
@@ -291,24 +321,28 @@ class TelegramBotHandler:
             return await self._make_telegram_api_call("setWebhook", payload)
             
         except Exception as e:
-            logger.error(f"Error setting webhook: {e}")
+            logger.error("Error setting webhook: %s", e)
             return False
     
     async def get_bot_info(self) -> Dict[str, Any]:
-        """Get bot information"""
+        """Get bot information (cached after the first successful call - do not mutate)"""
+        if self._bot_info is not None:
+            return self._bot_info
         try:
             url = f"{self.telegram_api_url}/getMe"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
+            response = await self._get_http_client().get(url)
+            
+            if response.status_code == 200:
+                bot_info = response.json()
+                if bot_info.get("ok"):
+                    self._bot_info = bot_info
+                return bot_info
+            else:
+                return {"error": f"HTTP {response.status_code}"}
                 
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {"error": f"HTTP {response.status_code}"}
-                    
         except Exception as e:
-            logger.error(f"Error getting bot info: {e}")
+            logger.error("Error getting bot info: %s", e)
             return {"error": str(e)}
 
 
@@ -369,10 +403,13 @@ async def set_telegram_webhook(webhook_data: Dict[str, str]):
         "webhook_url": webhook_url
     })
 
+# Static payload, built once (shared - do not mutate)
+HEALTH_RESPONSE = {"status": "healthy", "service": "dr-clivi-telegram-bot"}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "dr-clivi-telegram-bot"}
+    return HEALTH_RESPONSE
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,14 +1,35 @@
 """
 Core tools for Dr. Clivi agents.
 Based on analysis of exported Conversational Agents tools and webhooks.
+
+Tool functions are resolved lazily (PEP 562) so importing one tool module
+does not pull in the others.
 """
 
-from .messaging import send_template_message
-from .image_processing import process_scale_image
-from .generative_ai import ask_generative_ai
+import importlib
+
+# Exported name -> submodule that defines it
+_LAZY = {
+    "send_template_message": ".messaging",
+    "process_scale_image": ".image_processing",
+    "ask_generative_ai": ".generative_ai",
+}
 
 __all__ = [
     "send_template_message",
-    "process_scale_image", 
+    "process_scale_image",
     "ask_generative_ai"
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
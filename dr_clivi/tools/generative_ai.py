@@ -3,12 +3,82 @@ Generative AI tool - Ask generative AI for specialized responses.
 Based on "Ask OpenAI" tool analysis, migrated to Vertex AI.
 """
 
+import asyncio
+import functools
 import logging
-from typing import Any, Dict, Optional, List
+import os
+import time
+import weakref
+from types import MappingProxyType
+from typing import Any, Dict, Optional, List, Tuple
 import json
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for a single Gemini call; past this we answer from the simulation fallback
+GEMINI_TIMEOUT_SECONDS = 20.0
+
+# Gemini calls one user may have in flight; further calls wait for a slot
+MAX_CONCURRENT_CALLS_PER_USER = 2
+
+# user_id -> Semaphore; an entry disappears once no call holds or awaits it
+_user_call_slots: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+# (prompt, model, specialty) -> Gemini call in flight, shared by identical concurrent requests
+_inflight_calls: Dict[Tuple[str, str, Optional[str]], asyncio.Task] = {}
+
+# Requested model name -> deployed Gemini model
+_DEFAULT_MODEL = "gemini-2.0-flash-exp"
+_MODEL_MAPPING = MappingProxyType({
+    "gemini-2.5-flash": _DEFAULT_MODEL,
+    "gemini-2.5-pro": _DEFAULT_MODEL,  # Use flash for now
+    "gemini-flash": _DEFAULT_MODEL
+})
+
+# Shared by every generate_content call (plain dict as the SDK expects) - do not mutate
+_GENERATION_CONFIG = {
+    "temperature": 0.3,  # Lower for medical accuracy
+    "max_output_tokens": 1000,
+    "top_p": 0.8,
+    "top_k": 40
+}
+
+# Static _call_vertex_ai failures; callers get a copy
+_API_KEY_MISSING_RESULT = MappingProxyType({
+    "success": False,
+    "error": "API key not configured",
+    "text": "Error de configuración: clave API no encontrada"
+})
+_EMPTY_RESPONSE_RESULT = MappingProxyType({
+    "success": False,
+    "error": "Empty response from AI",
+    "text": "Lo siento, no pude generar una respuesta. Intenta de nuevo."
+})
+
+
+def _user_call_slot(user_id: str) -> asyncio.Semaphore:
+    slot = _user_call_slots.get(user_id)
+    if slot is None:
+        slot = _user_call_slots[user_id] = asyncio.Semaphore(MAX_CONCURRENT_CALLS_PER_USER)
+    return slot
+
+
+def _release_call_slot(slot: asyncio.Semaphore, call: asyncio.Future) -> None:
+    slot.release()
+    if not call.cancelled():
+        call.exception()  # retrieved so a failure after a timeout is not reported as unhandled
+
+
+@functools.cache
+def _load_genai():
+    """google-genai module, or None if not installed (resolved once)"""
+    try:
+        import google.genai as genai
+    except ImportError as e:
+        logger.error("google-genai not available: %s", e)
+        return None
+    return genai
+
 
 async def ask_generative_ai(
     user_request: str,
@@ -40,7 +110,7 @@ async def ask_generative_ai(
     Returns:
         Dict with AI response and metadata
     """
-    logger.info(f"Processing generative AI request for user {user_id}")
+    logger.info("Processing generative AI request for user %s", user_id)
     
     try:
         # Prepare AI prompt with context
@@ -55,7 +125,7 @@ async def ask_generative_ai(
         )
         
         if ai_response.get("success"):
-            logger.info(f"Generative AI response generated for user {user_id}")
+            logger.info("Generative AI response generated for user %s", user_id)
             return {
                 "success": True,
                 "response": ai_response.get("text"),
@@ -66,7 +136,7 @@ async def ask_generative_ai(
                 "response_time": ai_response.get("response_time")
             }
         else:
-            logger.error(f"Generative AI request failed: {ai_response.get('error')}")
+            logger.error("Generative AI request failed: %s", ai_response.get('error'))
             return {
                 "success": False,
                 "error": ai_response.get("error", "AI processing failed"),
@@ -74,7 +144,7 @@ async def ask_generative_ai(
             }
             
     except Exception as e:
-        logger.error(f"Error in generative AI request: {str(e)}")
+        logger.error("Error in generative AI request: %s", e)
         return {
             "success": False,
             "error": str(e),
@@ -93,7 +163,7 @@ async def ask_specialized_ai(
     
     Enhanced version for medical specialties (diabetes/obesity).
     """
-    logger.info(f"Processing specialized AI request ({specialty}) for user {user_id}")
+    logger.info("Processing specialized AI request (%s) for user %s", specialty, user_id)
     
     try:
         # Build specialized context
@@ -122,7 +192,7 @@ async def ask_specialized_ai(
         }
         
     except Exception as e:
-        logger.error(f"Error in specialized AI request: {str(e)}")
+        logger.error("Error in specialized AI request: %s", e)
         return {
             "success": False,
             "error": str(e),
@@ -139,7 +209,7 @@ async def generate_medical_content(
     """
     Generate medical educational content.
     """
-    logger.info(f"Generating medical content: {content_type} about {topic}")
+    logger.info("Generating medical content: %s about %s", content_type, topic)
     
     try:
         prompt = _build_content_generation_prompt(
@@ -163,7 +233,7 @@ async def generate_medical_content(
         }
         
     except Exception as e:
-        logger.error(f"Error generating medical content: {str(e)}")
+        logger.error("Error generating medical content: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -175,61 +245,84 @@ async def _call_vertex_ai(
     model: str,
     user_id: str,
     specialty: str = None
+) -> Dict[str, Any]:
+    """
+    Call Gemini, coalescing identical concurrent requests (same prompt,
+    model and specialty) into one backend call. Each caller gets its own
+    copy of the result. Only a caller that starts a new call takes one of
+    its own per-user slots; joining another user's call is free.
+    """
+    key = (prompt, model, specialty)
+    task = _inflight_calls.get(key)
+    if task is None:
+        slot = _user_call_slot(user_id)
+        await slot.acquire()
+        # Someone may have started the same call while we waited for the slot
+        task = _inflight_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_call_gemini(prompt, model, user_id, specialty, slot))
+            _inflight_calls[key] = task
+            
+            def _done(task: asyncio.Task, key=key) -> None:
+                if _inflight_calls.get(key) is task:
+                    del _inflight_calls[key]
+            
+            task.add_done_callback(_done)
+        else:
+            slot.release()
+            logger.info("Sharing in-flight Gemini call for user %s", user_id)
+    else:
+        logger.info("Sharing in-flight Gemini call for user %s", user_id)
+    
+    # Shielded so one caller giving up does not cancel the call for the others
+    return dict(await asyncio.shield(task))
+
+
+async def _call_gemini(
+    prompt: str,
+    model: str,
+    user_id: str,
+    specialty: str,
+    slot: asyncio.Semaphore
 ) -> Dict[str, Any]:
     """
     Call Google AI (Gemini) API using google-genai.
     Real implementation using the configured GOOGLE_API_KEY.
+    ``slot`` is the caller's acquired per-user slot; it is released once
+    the backend request has finished (or right away if none is made).
     """
-    import time
-    import asyncio
-    import os
-    from typing import Dict, Any
-    
+    call = None
     try:
-        # Import Google AI
-        import google.genai as genai
+        genai = _load_genai()
+        if genai is None:
+            return _fallback_to_simulation(prompt, model, user_id, specialty)
         
         # Configure API key from environment
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             logger.error("GOOGLE_API_KEY not found in environment")
-            return {
-                "success": False,
-                "error": "API key not configured",
-                "text": "Error de configuración: clave API no encontrada"
-            }
+            return dict(_API_KEY_MISSING_RESULT)
         
         # Initialize client
         client = genai.Client(api_key=api_key)
         
-        # Map model names
-        model_mapping = {
-            "gemini-2.5-flash": "gemini-2.0-flash-exp",
-            "gemini-2.5-pro": "gemini-2.0-flash-exp",  # Use flash for now
-            "gemini-flash": "gemini-2.0-flash-exp"
-        }
-        
-        actual_model = model_mapping.get(model, "gemini-2.0-flash-exp")
+        actual_model = _MODEL_MAPPING.get(model, _DEFAULT_MODEL)
         
-        start_time = time.time()
-        
-        # Generate content
-        response = await asyncio.to_thread(
+        # Generate content. The slot is freed when the worker thread returns,
+        # not when we stop waiting: a timed-out request keeps running and still counts
+        call = asyncio.ensure_future(asyncio.to_thread(
             client.models.generate_content,
             model=actual_model,
             contents=prompt,
-            config={
-                "temperature": 0.3,  # Lower for medical accuracy
-                "max_output_tokens": 1000,
-                "top_p": 0.8,
-                "top_k": 40
-            }
-        )
-        
+            config=_GENERATION_CONFIG
+        ))
+        call.add_done_callback(functools.partial(_release_call_slot, slot))
+        start_time = time.time()
+        response = await asyncio.wait_for(asyncio.shield(call), timeout=GEMINI_TIMEOUT_SECONDS)
         response_time = time.time() - start_time
         
         if response and response.text:
-            logger.info(f"Gemini API successful response for user {user_id} in {response_time:.2f}s")
+            logger.info("Gemini API successful response for user %s in %.2fs", user_id, response_time)
             
             return {
                 "success": True,
@@ -240,27 +333,25 @@ async def _call_vertex_ai(
                 "model": actual_model
             }
         else:
-            logger.error(f"Empty response from Gemini API for user {user_id}")
-            return {
-                "success": False,
-                "error": "Empty response from AI",
-                "text": "Lo siento, no pude generar una respuesta. Intenta de nuevo."
-            }
+            logger.error("Empty response from Gemini API for user %s", user_id)
+            return dict(_EMPTY_RESPONSE_RESULT)
             
-    except ImportError as e:
-        logger.error(f"google-genai not available: {e}")
+    except asyncio.TimeoutError:
+        logger.warning("Gemini API timed out after %ss for user %s", GEMINI_TIMEOUT_SECONDS, user_id)
         return _fallback_to_simulation(prompt, model, user_id, specialty)
-        
     except Exception as e:
-        logger.error(f"Error calling Gemini API: {str(e)}")
+        logger.error("Error calling Gemini API: %s", e)
         return _fallback_to_simulation(prompt, model, user_id, specialty)
+    finally:
+        if call is None:
+            slot.release()
 
 
 def _fallback_to_simulation(prompt: str, model: str, user_id: str, specialty: str = None) -> Dict[str, Any]:
     """
     Fallback to simulation when real API fails.
     """
-    logger.warning(f"Falling back to simulation for user {user_id}")
+    logger.warning("Falling back to simulation for user %s", user_id)
     
     # Simulate AI response
     response_templates = {
@@ -282,7 +373,18 @@ def _fallback_to_simulation(prompt: str, model: str, user_id: str, specialty: st
 
 
 def _build_system_prompt(context: str) -> str:
-    """Build system prompt with context"""
+    """Build system prompt with context (memoized for string contexts)"""
+    if isinstance(context, str):
+        return _build_system_prompt_cached(context)
+    return _render_system_prompt(context)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_system_prompt_cached(context: str) -> str:
+    return _render_system_prompt(context)
+
+
+def _render_system_prompt(context: Any) -> str:
     return f"""
     Eres un asistente médico especializado de Dr. Clivi. 
     
@@ -316,8 +418,9 @@ def _build_specialized_context(specialty: str, patient_context: Dict[str, Any])
     return " | ".join(context_parts)
 
 
+@functools.lru_cache(maxsize=256)
 def _build_specialized_prompt(specialty: str, context: str) -> str:
-    """Build specialized medical prompt"""
+    """Build specialized medical prompt (memoized)"""
     base_prompt = _build_system_prompt(context)
     
     specialty_additions = {
@@ -341,13 +444,14 @@ def _build_specialized_prompt(specialty: str, context: str) -> str:
     return f"{base_prompt}\n{addition}"
 
 
+@functools.lru_cache(maxsize=256)
 def _build_content_generation_prompt(
     content_type: str,
     topic: str,
     audience: str,
     language: str
 ) -> str:
-    """Build prompt for content generation"""
+    """Build prompt for content generation (memoized)"""
     return f"""
     Genera contenido médico educativo:
     
@@ -403,11 +507,8 @@ def classify_response_urgency(ai_response: str) -> str:
     """Classify response urgency level"""
     urgent_keywords = ["urgente", "inmediato", "emergencia", "contacta", "médico"]
     
-    if any(keyword in ai_response.lower() for keyword in urgent_keywords):
+    response_lower = ai_response.lower()
+    if any(keyword in response_lower for keyword in urgent_keywords):
         return "high"
     else:
         return "normal"
-
-
-# Import required modules
-from typing import List
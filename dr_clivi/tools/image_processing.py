@@ -3,7 +3,10 @@ Image processing tool - Scale photo processing for measurement recognition.
 Based on photoScalePhoto webhook analysis from exported flows.
 """
 
+import asyncio
+import bisect
 import logging
+from types import MappingProxyType
 from typing import Any, Dict, Optional
 import httpx
 import json
@@ -12,6 +15,29 @@ import base64
 
 logger = logging.getLogger(__name__)
 
+# Accepted image size is [10KB, 10MB]; bisect_right over the bounds picks the bucket
+_IMAGE_SIZE_BOUNDS = (10240, 10485760 + 1)
+_IMAGE_SIZE_REJECTIONS = (
+    ("image_too_small", "La imagen es muy pequeña. Por favor toma una foto más clara."),
+    None,
+    ("image_too_large", "La imagen es muy grande. Por favor comprime la imagen."),
+)
+
+# n8n webhook timeout result; callers get a copy
+_WEBHOOK_TIMEOUT_RESULT = MappingProxyType({
+    "success": False,
+    "error": "Processing timeout - please try again",
+    "timeout": True
+})
+
+
+def _image_sha256(image_data: str) -> str:
+    """SHA256 of a base64 (or data URL) image; CPU-bound, run via asyncio.to_thread"""
+    if image_data.startswith('data:'):
+        # Remove data URL prefix if present
+        image_data = image_data.split(',')[1]
+    return hashlib.sha256(base64.b64decode(image_data)).hexdigest()
+
 
 async def process_scale_image(
     user_id: str,
@@ -35,16 +61,11 @@ async def process_scale_image(
     Returns:
         Dict with extracted measurement data
     """
-    logger.info(f"Processing scale image for user {user_id}")
+    logger.info("Processing scale image for user %s", user_id)
     
     try:
         # Calculate SHA256 hash of image data (as per webhook analysis)
-        if image_data.startswith('data:'):
-            # Remove data URL prefix if present
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+        image_sha256 = await asyncio.to_thread(_image_sha256, image_data)
         
         # Prepare payload matching the exported webhook format
         payload = {
@@ -59,7 +80,7 @@ async def process_scale_image(
         if response.get("success"):
             extracted_data = response.get("data", {})
             
-            logger.info(f"Successfully processed scale image for user {user_id}")
+            logger.info("Successfully processed scale image for user %s", user_id)
             return {
                 "success": True,
                 "measurement": {
@@ -73,7 +94,7 @@ async def process_scale_image(
                 "processing_time": response.get("processing_time")
             }
         else:
-            logger.error(f"Failed to process scale image: {response.get('error')}")
+            logger.error("Failed to process scale image: %s", response.get('error'))
             return {
                 "success": False,
                 "error": response.get("error", "Image processing failed"),
@@ -81,7 +102,7 @@ async def process_scale_image(
             }
             
     except Exception as e:
-        logger.error(f"Error processing scale image: {str(e)}")
+        logger.error("Error processing scale image: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -99,15 +120,11 @@ async def process_measurement_image(
     
     Extended functionality for different measurement types.
     """
-    logger.info(f"Processing {measurement_type} image for user {user_id}")
+    logger.info("Processing %s image for user %s", measurement_type, user_id)
     
     try:
         # Calculate image hash
-        if image_data.startswith('data:'):
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+        image_sha256 = await asyncio.to_thread(_image_sha256, image_data)
         
         # Prepare payload with measurement type
         payload = {
@@ -135,7 +152,7 @@ async def process_measurement_image(
         }
         
     except Exception as e:
-        logger.error(f"Error processing {measurement_type} image: {str(e)}")
+        logger.error("Error processing %s image: %s", measurement_type, e)
         return {
             "success": False,
             "error": str(e),
@@ -155,23 +172,27 @@ async def validate_image_quality(
         if image_data.startswith('data:'):
             image_data = image_data.split(',')[1]
         
-        image_bytes = base64.b64decode(image_data)
-        image_size = len(image_bytes)
-        
-        # Minimum size check (10KB)
-        if image_size < 10240:
+        # 4 base64 chars decode to at most 3 bytes, so short payloads are
+        # rejected without decoding them
+        if len(image_data) * 3 // 4 < _IMAGE_SIZE_BOUNDS[0]:
+            reason, message = _IMAGE_SIZE_REJECTIONS[0]
             return {
                 "valid": False,
-                "reason": "image_too_small",
-                "message": "La imagen es muy pequeña. Por favor toma una foto más clara."
+                "reason": reason,
+                "message": message
             }
         
-        # Maximum size check (10MB)
-        if image_size > 10485760:
+        image_bytes = base64.b64decode(image_data)
+        image_size = len(image_bytes)
+        
+        # Size range check (10KB - 10MB)
+        rejection = _IMAGE_SIZE_REJECTIONS[bisect.bisect_right(_IMAGE_SIZE_BOUNDS, image_size)]
+        if rejection is not None:
+            reason, message = rejection
             return {
                 "valid": False,
-                "reason": "image_too_large", 
-                "message": "La imagen es muy grande. Por favor comprime la imagen."
+                "reason": reason,
+                "message": message
             }
         
         return {
@@ -223,7 +244,7 @@ async def _call_n8n_webhook(
                     "processing_time": response.elapsed.total_seconds()
                 }
             else:
-                logger.error(f"n8n webhook error: {response.status_code} - {response.text}")
+                logger.error("n8n webhook error: %s - %s", response.status_code, response.text)
                 return {
                     "success": False,
                     "error": f"HTTP {response.status_code}: {response.text}",
@@ -232,13 +253,9 @@ async def _call_n8n_webhook(
                 
     except httpx.TimeoutException:
         logger.error("n8n webhook timeout")
-        return {
-            "success": False,
-            "error": "Processing timeout - please try again",
-            "timeout": True
-        }
+        return dict(_WEBHOOK_TIMEOUT_RESULT)
     except Exception as e:
-        logger.error(f"n8n webhook exception: {str(e)}")
+        logger.error("n8n webhook exception: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -14,6 +14,7 @@ import logging
 from typing import Any, Dict, Optional, List
 import httpx
 import json
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -33,17 +34,18 @@ async def send_template_message(
     Enhanced template message sending function.
     Based on SEND_MESSAGE tool analysis with template patterns.
     """
-    logger.info(f"Sending template message '{template_name}' to user {user_id}")
+    logger.info("Sending template message '%s' to user %s", template_name, user_id)
     
     # Simulate for now - will integrate with real WhatsApp API
+    now_ns = time.time_ns()
     return {
         "success": True,
         "actionType": action_type,
         "templateName": template_name,
         "type": message_type,
         "userId": user_id,
-        "messageId": f"msg_{user_id}_{datetime.now().timestamp()}",
-        "timestamp": datetime.now().isoformat(),
+        "messageId": f"msg_{user_id}_{now_ns:x}",
+        "timestamp": datetime.fromtimestamp(now_ns / 1e9).isoformat(),
         "parameters": parameters or {},
         "simulated": True
     }
@@ -61,16 +63,17 @@ async def send_interactive_menu(
     Send interactive menu based on SESSION_LIST pattern from flows analysis.
     Supports the menu structures used in diabetes and obesity main menus.
     """
-    logger.info(f"Sending interactive menu to user {user_id}")
+    logger.info("Sending interactive menu to user %s", user_id)
     
     # Simulate for now - will integrate with real WhatsApp API
+    now_ns = time.time_ns()
     return {
         "success": True,
         "menuType": menu_type,
         "userId": user_id,
-        "messageId": f"menu_{user_id}_{datetime.now().timestamp()}",
+        "messageId": f"menu_{user_id}_{now_ns:x}",
         "optionsCount": len(menu_options),
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.fromtimestamp(now_ns / 1e9).isoformat(),
         "simulated": True
     }
 
@@ -136,7 +139,7 @@ async def send_session_end_summary(user_id: str, session_duration: str,
         }
         
     except Exception as e:
-        logger.error(f"Error sending interactive menu: {str(e)}")
+        logger.error("Error sending interactive menu: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -151,7 +154,7 @@ async def send_simple_text(
     """
     Send simple text message.
     """
-    logger.info(f"Sending text message to user {user_id}")
+    logger.info("Sending text message to user %s", user_id)
     
     try:
         message_payload = {
@@ -170,7 +173,7 @@ async def send_simple_text(
         }
         
     except Exception as e:
-        logger.error(f"Error sending text message: {str(e)}")
+        logger.error("Error sending text message: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -4,7 +4,7 @@ Manages incoming messages and routes between deterministic flows and intelligent
 """
 
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 import hmac
@@ -64,60 +64,84 @@ class WhatsAppWebhookHandler:
             if 'messages' in value:
                 return await self._handle_incoming_message(value)
             elif 'statuses' in value:
-                return await self._handle_status_update(value)
+                return self._handle_status_update(value)
             else:
-                logger.info(f"Unhandled webhook type: {webhook_data}")
+                logger.info("Unhandled webhook type: %s", webhook_data)
                 return {"status": "ignored", "reason": "unknown_webhook_type"}
                 
         except Exception as e:
-            logger.error(f"Error processing webhook: {e}")
+            logger.error("Error processing webhook: %s", e)
             raise HTTPException(status_code=500, detail=f"Webhook processing error: {e}")
     
     async def _handle_incoming_message(self, value: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle incoming text or interactive messages"""
-        messages = value.get('messages', [])
+        """
+        Handle incoming text or interactive messages.
+        Senders in the same webhook are processed concurrently; each sender's
+        messages keep their order.
+        """
+        by_sender: Dict[str, List[Tuple[int, Dict[str, Any], str]]] = {}
+        for position, message in enumerate(value.get('messages', [])):
+            user_input = self._extract_user_input(message)
+            if user_input is not None:
+                by_sender.setdefault(message.get('from'), []).append((position, message, user_input))
         
-        for message in messages:
-            user_phone = message.get('from')
-            message_id = message.get('id')
-            message_type = message.get('type')
-            
-            logger.info(f"Processing {message_type} message from {user_phone}")
-            
-            # Extract message content based on type
-            if message_type == 'text':
-                user_input = message.get('text', {}).get('body', '')
-            elif message_type == 'interactive':
-                # Handle button/list selections
-                interactive_data = message.get('interactive', {})
-                if interactive_data.get('type') == 'list_reply':
-                    user_input = interactive_data.get('list_reply', {}).get('id', '')
-                elif interactive_data.get('type') == 'button_reply':
-                    user_input = interactive_data.get('button_reply', {}).get('id', '')
-                else:
-                    user_input = 'interactive_message'
+        async def process_sender(items: List[Tuple[int, Dict[str, Any], str]]) -> List[Tuple[int, Dict[str, Any]]]:
+            return [(position, await self._process_message(message, user_input))
+                    for position, message, user_input in items]
+        
+        per_sender = await asyncio.gather(*(process_sender(items) for items in by_sender.values()))
+        results = [result for _, result in sorted(r for sender in per_sender for r in sender)]
+        
+        if not results:
+            return None
+        if len(results) == 1:
+            return results[0]
+        return {"status": "processed", "messages": results}
+    
+    def _extract_user_input(self, message: Dict[str, Any]) -> Optional[str]:
+        """User input from a text or interactive message; None if unsupported"""
+        message_type = message.get('type')
+        
+        logger.info("Processing %s message from %s", message_type, message.get('from'))
+        
+        # Extract message content based on type
+        if message_type == 'text':
+            return message.get('text', {}).get('body', '')
+        elif message_type == 'interactive':
+            # Handle button/list selections
+            interactive_data = message.get('interactive', {})
+            if interactive_data.get('type') == 'list_reply':
+                return interactive_data.get('list_reply', {}).get('id', '')
+            elif interactive_data.get('type') == 'button_reply':
+                return interactive_data.get('button_reply', {}).get('id', '')
             else:
-                logger.warning(f"Unsupported message type: {message_type}")
-                continue
-            
-            # Process through coordinator
-            response = await self.coordinator.process_user_input(
-                user_id=user_phone,
-                user_input=user_input,
-                phone_number=user_phone
-            )
-            
-            # Send response back to user
-            await self._send_response_to_user(user_phone, response)
-            
-            return {
-                "status": "processed",
-                "message_id": message_id,
-                "response_type": response.get("response_type"),
-                "routing_type": response.get("routing_type")
-            }
+                return 'interactive_message'
+        
+        logger.warning("Unsupported message type: %s", message_type)
+        return None
     
-    async def _handle_status_update(self, value: Dict[str, Any]) -> Dict[str, Any]:
+    async def _process_message(self, message: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+        """Route one message through the coordinator and reply"""
+        user_phone = message.get('from')
+        
+        # Process through coordinator
+        response = await self.coordinator.process_user_input(
+            user_id=user_phone,
+            user_input=user_input,
+            phone_number=user_phone
+        )
+        
+        # Send response back to user
+        await self._send_response_to_user(user_phone, response)
+        
+        return {
+            "status": "processed",
+            "message_id": message.get('id'),
+            "response_type": response.get("response_type"),
+            "routing_type": response.get("routing_type")
+        }
+    
+    def _handle_status_update(self, value: Dict[str, Any]) -> Dict[str, Any]:
         """Handle message status updates (delivered, read, etc.)"""
         statuses = value.get('statuses', [])
         
@@ -126,7 +150,7 @@ class WhatsAppWebhookHandler:
             status_type = status.get('status')
             recipient_id = status.get('recipient_id')
             
-            logger.info(f"Message {message_id} status: {status_type} for {recipient_id}")
+            logger.info("Message %s status: %s for %s", message_id, status_type, recipient_id)
             
             # Log for analytics (delivery rates, read rates, etc.)
             # Could update database with delivery status
@@ -153,7 +177,7 @@ class WhatsAppWebhookHandler:
                 return await self._send_text_message(phone_number, "Disculpa, ocurrió un error. ¿Puedes intentar de nuevo?")
                 
         except Exception as e:
-            logger.error(f"Error sending response to {phone_number}: {e}")
+            logger.error("Error sending response to %s: %s", phone_number, e)
             return False
     
     async def _send_interactive_menu(self, phone_number: str, response: Dict[str, Any]) -> bool:
@@ -163,28 +187,28 @@ class WhatsAppWebhookHandler:
             
             # This would make the actual API call to WhatsApp Business API
             # For now, we'll log it
-            logger.info(f"Sending interactive menu to {phone_number}: {menu_data}")
+            logger.info("Sending interactive menu to %s: %s", phone_number, menu_data)
             
             # Simulate API call
             await asyncio.sleep(0.1)
             return True
             
         except Exception as e:
-            logger.error(f"Error sending menu to {phone_number}: {e}")
+            logger.error("Error sending menu to %s: %s", phone_number, e)
             return False
     
     async def _send_text_message(self, phone_number: str, message: str) -> bool:
         """Send simple text message"""
         try:
             # This would make the actual API call to WhatsApp Business API
-            logger.info(f"Sending text to {phone_number}: {message}")
+            logger.info("Sending text to %s: %s", phone_number, message)
             
             # Simulate API call
             await asyncio.sleep(0.1)
             return True
             
         except Exception as e:
-            logger.error(f"Error sending text to {phone_number}: {e}")
+            logger.error("Error sending text to %s: %s", phone_number, e)
             return False
     
     async def _send_emergency_message(self, phone_number: str, response: Dict[str, Any]) -> bool:
@@ -193,13 +217,13 @@ class WhatsAppWebhookHandler:
             immediate_actions = response.get("immediate_actions", [])
             emergency_text = "\n".join(immediate_actions)
             
-            logger.critical(f"Sending EMERGENCY message to {phone_number}")
+            logger.critical("Sending EMERGENCY message to %s", phone_number)
             
             # This would use priority/urgent message API if available
             return await self._send_text_message(phone_number, emergency_text)
             
         except Exception as e:
-            logger.error(f"Error sending emergency message to {phone_number}: {e}")
+            logger.error("Error sending emergency message to %s: %s", phone_number, e)
             return False
 
 
@@ -259,10 +283,13 @@ async def receive_webhook(request: Request):
     
     return JSONResponse(content={"status": "success", "result": result})
 
+# Static payload, built once (shared - do not mutate)
+HEALTH_RESPONSE = {"status": "healthy", "service": "dr-clivi-whatsapp-webhook"}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "dr-clivi-whatsapp-webhook"}
+    return HEALTH_RESPONSE
 
 if __name__ == "__main__":
     import uvicorn
@@ -8,7 +8,6 @@ import os
 import sys
 import subprocess
 import asyncio
-from pathlib import Path
 
 
 def print_header():
@@ -47,11 +46,11 @@ def setup_env_file():
     """Setup .env file if it doesn't exist"""
     print("\n⚙️  Configurando archivo .env...")
     
-    env_path = Path(".env")
-    env_example_path = Path(".env.example")
+    env_path = ".env"
+    env_example_path = ".env.example"
     
-    if not env_path.exists():
-        if env_example_path.exists():
+    if not os.path.exists(env_path):
+        if os.path.exists(env_example_path):
             import shutil
             shutil.copy(env_example_path, env_path)
             print("✅ Archivo .env creado desde .env.example")
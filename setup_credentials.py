@@ -8,7 +8,6 @@ import os
 import sys
 import asyncio
 import httpx
-from pathlib import Path
 
 
 def print_header():
@@ -77,7 +76,8 @@ async def test_google_api_key(api_key: str) -> bool:
         
         # Crear un modelo simple para probar
         model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content("Hello")
+        # Llamada bloqueante del SDK: en un hilo para no frenar la otra prueba
+        response = await asyncio.to_thread(model.generate_content, "Hello")
         
         print("✅ Google AI Studio API key funciona correctamente")
         return True
@@ -114,10 +114,10 @@ async def test_telegram_token(token: str) -> bool:
 
 def update_env_file(google_api_key: str, telegram_token: str, ngrok_url: str = None):
     """Actualizar archivo .env con las credenciales"""
-    env_path = Path('.env')
+    env_path = '.env'
     
     # Leer archivo actual
-    if env_path.exists():
+    if os.path.exists(env_path):
         with open(env_path, 'r') as f:
             content = f.read()
     else:
@@ -143,7 +143,7 @@ async def main():
     print_header()
     
     # Verificar que estamos en el directorio correcto
-    if not Path('.env.example').exists():
+    if not os.path.exists('.env.example'):
         print("❌ No se encuentra .env.example")
         print("   Asegúrate de estar en el directorio del proyecto")
         return
@@ -162,11 +162,6 @@ async def main():
         validate_google_api_key
     )
     
-    print("\n🔍 Probando Google AI Studio...")
-    if not await test_google_api_key(google_api_key):
-        print("❌ La API key no funciona. Verifica que sea correcta.")
-        return
-    
     # PASO 2: Telegram Bot
     print_step(2, "Configurar Bot de Telegram")
     print("1. Abre Telegram")
@@ -181,9 +176,17 @@ async def main():
         validate_telegram_token
     )
     
-    print("\n🔍 Probando token de Telegram...")
-    if not await test_telegram_token(telegram_token):
+    # Ambas pruebas son independientes: se ejecutan en paralelo
+    print("\n🔍 Probando Google AI Studio y token de Telegram...")
+    google_ok, telegram_ok = await asyncio.gather(
+        test_google_api_key(google_api_key),
+        test_telegram_token(telegram_token)
+    )
+    if not google_ok:
+        print("❌ La API key no funciona. Verifica que sea correcta.")
+    if not telegram_ok:
         print("❌ El token no funciona. Verifica que sea correcto.")
+    if not (google_ok and telegram_ok):
         return
     
     # PASO 3: Actualizar .env
@@ -23,9 +23,10 @@ def print_header():
 def kill_existing_ngrok():
     """Matar procesos ngrok existentes"""
     try:
-        subprocess.run(['pkill', '-f', 'ngrok'], capture_output=True)
+        subprocess.run(['pkill', '-f', 'ngrok'], capture_output=True, timeout=2.0)
         print("🧹 Procesos ngrok anteriores terminados")
-    except:
+    except (OSError, subprocess.TimeoutExpired):
+        # pkill no disponible o colgado: continuar sin limpiar
         pass
 
 
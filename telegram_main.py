@@ -22,14 +22,16 @@ load_dotenv()
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dr_clivi.config import Config
+from dr_clivi.log_context import LOG_FORMAT, install_request_context_filter
 from dr_clivi.telegram.telegram_handler import TelegramBotHandler
 
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format=LOG_FORMAT
 )
+install_request_context_filter()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -42,6 +44,19 @@ app = FastAPI(
 # Global handler instance
 telegram_handler: TelegramBotHandler = None
 
+# Static endpoint payloads, built once (shared - do not mutate)
+ROOT_RESPONSE = {
+    "status": "active",
+    "service": "Dr. Clivi Telegram Bot",
+    "version": "1.0.0",
+    "description": "Hybrid medical assistance bot using ADK architecture"
+}
+HEALTH_SERVICES = {
+    "coordinator": "active",
+    "deterministic_flow": "active",
+    "telegram_api": "connected"
+}
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -60,18 +75,20 @@ async def startup_event():
     telegram_handler = TelegramBotHandler(config)
     
     logger.info("Dr. Clivi Telegram Bot initialized successfully")
-    logger.info(f"Ready to receive webhooks for bot token: {config.telegram.bot_token[:10]}...")
+    logger.info("Ready to receive webhooks for bot token: %s...", config.telegram.bot_token[:10])
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the Telegram HTTP connection pool"""
+    if telegram_handler:
+        await telegram_handler.aclose()
 
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "status": "active",
-        "service": "Dr. Clivi Telegram Bot",
-        "version": "1.0.0",
-        "description": "Hybrid medical assistance bot using ADK architecture"
-    }
+    return ROOT_RESPONSE
 
 
 @app.get("/health")
@@ -82,11 +99,7 @@ async def health_check():
     return {
         "status": "healthy",
         "telegram_configured": telegram_handler is not None,
-        "services": {
-            "coordinator": "active",
-            "deterministic_flow": "active", 
-            "telegram_api": "connected"
-        }
+        "services": HEALTH_SERVICES
     }
 
 
@@ -98,7 +111,7 @@ async def telegram_webhook(request: Request):
     """
     try:
         update_data = await request.json()
-        logger.info(f"Received Telegram update: {update_data.get('update_id', 'unknown')}")
+        logger.info("Received Telegram update: %s", update_data.get('update_id', 'unknown'))
         
         if not telegram_handler:
             raise HTTPException(status_code=500, detail="Telegram handler not initialized")
@@ -112,7 +125,7 @@ async def telegram_webhook(request: Request):
         })
         
     except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
+        logger.error("Error processing webhook: %s", e)
         raise HTTPException(status_code=500, detail=f"Webhook processing error: {e}")
 
 
@@ -143,18 +156,18 @@ async def set_telegram_webhook():
             result = response.json()
         
         if result.get("ok"):
-            logger.info(f"Webhook successfully configured: {config.telegram.webhook_url}")
+            logger.info("Webhook successfully configured: %s", config.telegram.webhook_url)
             return {
                 "status": "success",
                 "webhook_url": f"{config.telegram.webhook_url}/telegram/webhook",
                 "telegram_response": result
             }
         else:
-            logger.error(f"Failed to set webhook: {result}")
+            logger.error("Failed to set webhook: %s", result)
             raise HTTPException(status_code=400, detail=f"Telegram API error: {result}")
             
     except Exception as e:
-        logger.error(f"Error setting webhook: {e}")
+        logger.error("Error setting webhook: %s", e)
         raise HTTPException(status_code=500, detail=f"Webhook configuration error: {e}")
 
 
@@ -181,7 +194,7 @@ async def delete_telegram_webhook():
         }
         
     except Exception as e:
-        logger.error(f"Error deleting webhook: {e}")
+        logger.error("Error deleting webhook: %s", e)
         raise HTTPException(status_code=500, detail=f"Webhook deletion error: {e}")
 
 
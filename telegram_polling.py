@@ -8,23 +8,33 @@ import asyncio
 import logging
 import os
 import sys
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+
+import httpx
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dr_clivi.config import Config
+from dr_clivi.log_context import LOG_FORMAT, install_request_context_filter
 from dr_clivi.telegram.telegram_handler import TelegramBotHandler
 
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format=LOG_FORMAT
 )
+install_request_context_filter()
 logger = logging.getLogger(__name__)
 
 
+def _update_chat_id(update: Dict[str, Any]):
+    """Chat de origen de un update (None si no se reconoce el tipo)"""
+    message = update.get("message") or update.get("callback_query", {}).get("message") or {}
+    return message.get("chat", {}).get("id")
+
+
 class TelegramPollingBot:
     """
     Bot de Telegram en modo polling (sin webhooks)
@@ -36,11 +46,23 @@ class TelegramPollingBot:
         self.handler = TelegramBotHandler(config)
         self.bot_token = config.telegram.bot_token
         self.running = False
+        # Cliente de long polling reutilizado entre páginas de getUpdates
+        self._poll_client: Optional[httpx.AsyncClient] = None
+    
+    def _get_poll_client(self) -> httpx.AsyncClient:
+        if self._poll_client is None or self._poll_client.is_closed:
+            self._poll_client = httpx.AsyncClient(timeout=35)
+        return self._poll_client
+    
+    async def aclose(self):
+        """Cerrar el cliente de polling y el del handler"""
+        if self._poll_client is not None:
+            await self._poll_client.aclose()
+            self._poll_client = None
+        await self.handler.aclose()
         
     async def get_updates(self, offset: int = None):
         """Obtener updates de Telegram API"""
-        import httpx
-        
         url = f"https://api.telegram.org/bot{self.bot_token}/getUpdates"
         params = {
             "timeout": 30,  # Long polling
@@ -51,26 +73,41 @@ class TelegramPollingBot:
             params["offset"] = offset
             
         try:
-            async with httpx.AsyncClient(timeout=35) as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self._get_poll_client().get(url, params=params)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
-            logger.error(f"Error getting updates: {e}")
+            logger.error("Error getting updates: %s", e)
             return None
     
     async def process_update(self, update: Dict[str, Any]):
         """Procesar un update individual"""
         try:
             update_id = update.get("update_id")
-            logger.info(f"Processing update {update_id}")
+            logger.info("Processing update %s", update_id)
             
             # Usar el handler existente
             result = await self.handler.process_telegram_update(update)
-            logger.info(f"Update {update_id} processed: {result.get('status', 'unknown')}")
+            logger.info("Update %s processed: %s", update_id, result.get('status', 'unknown'))
             
         except Exception as e:
-            logger.error(f"Error processing update {update.get('update_id')}: {e}")
+            logger.error("Error processing update %s: %s", update.get('update_id'), e)
+    
+    async def process_updates(self, updates: List[Dict[str, Any]]):
+        """
+        Procesar un lote de updates.
+        Los updates de un mismo chat se procesan en orden; chats distintos
+        son independientes y se procesan concurrentemente.
+        """
+        by_chat: Dict[Any, List[Dict[str, Any]]] = {}
+        for update in updates:
+            by_chat.setdefault(_update_chat_id(update), []).append(update)
+        
+        async def process_chat(chat_updates):
+            for update in chat_updates:
+                await self.process_update(update)
+        
+        await asyncio.gather(*(process_chat(chat_updates) for chat_updates in by_chat.values()))
     
     async def start_polling(self):
         """Iniciar polling loop"""
@@ -95,12 +132,11 @@ class TelegramPollingBot:
                 updates = data.get("result", [])
                 
                 if updates:
-                    logger.info(f"📨 Received {len(updates)} update(s)")
+                    logger.info("📨 Received %s update(s)", len(updates))
                     
-                    # Procesar cada update
-                    for update in updates:
-                        await self.process_update(update)
-                        offset = update["update_id"] + 1
+                    # Procesar chats distintos en paralelo (orden preservado por chat)
+                    await self.process_updates(updates)
+                    offset = updates[-1]["update_id"] + 1
                 else:
                     # No hay updates nuevos
                     await asyncio.sleep(0.1)
@@ -110,7 +146,7 @@ class TelegramPollingBot:
                 self.running = False
                 break
             except Exception as e:
-                logger.error(f"Error in polling loop: {e}")
+                logger.error("Error in polling loop: %s", e)
                 await asyncio.sleep(5)  # Wait before retrying
     
     def stop(self):
@@ -160,6 +196,7 @@ async def main():
         print(f"\n❌ Bot error: {e}")
     finally:
         bot.stop()
+        await bot.aclose()
 
 
 if __name__ == "__main__":
@@ -81,7 +81,7 @@ async def test_intelligent_routing():
             print("🧠 Probando análisis médico con Gemini...")
             analysis = await coordinator.analyze_medical_query(
                 test_case["input"], 
-                user_context.__dict__
+                user_context.as_dict()
             )
             
             print(f"📋 Análisis resultado:")
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Pruebas unitarias para BaseCliviAgent
+Registro de eventos de actividad y sesiones
+"""
+
+import pytest
+import asyncio
+import json
+import httpx
+from unittest.mock import Mock, AsyncMock, patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dr_clivi.config import Config
+from dr_clivi.agents.base_agent import (
+    ActivityEventBuffer, PatientContext, SessionContext, SESSION_HISTORY_SIZE
+)
+from dr_clivi.agents.diabetes_agent import DiabetesAgent
+
+
+def webhook_config() -> Config:
+    """Config con webhook de actividad configurado"""
+    config = Config()
+    config.integrations.activity_webhook = "https://example.test/webhook/activity"
+    return config
+
+
+class TestActivityEventBuffer:
+
+    @pytest.mark.asyncio
+    async def test_events_are_coalesced(self):
+        """Test 1: Eventos cercanos se envían en un solo lote"""
+        send_batch = AsyncMock()
+        buffer = ActivityEventBuffer(send_batch, max_batch=10, max_delay=0.01)
+
+        for i in range(3):
+            buffer.add({"event_type": f"EVENT_{i}"})
+        await buffer.aclose()
+
+        send_batch.assert_awaited_once()
+        assert [e["event_type"] for e in send_batch.await_args.args[0]] == ["EVENT_0", "EVENT_1", "EVENT_2"]
+
+    @pytest.mark.asyncio
+    async def test_batches_respect_max_size(self):
+        """Test 2: Los lotes no superan max_batch"""
+        send_batch = AsyncMock()
+        buffer = ActivityEventBuffer(send_batch, max_batch=2, max_delay=0.01)
+
+        for i in range(5):
+            buffer.add({"event_type": f"EVENT_{i}"})
+        await buffer.aclose()
+
+        sizes = [len(call.args[0]) for call in send_batch.await_args_list]
+        assert sizes == [2, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_send_failure_does_not_stop_consumer(self):
+        """Test 3: Un error de envío no detiene el consumidor"""
+        send_batch = AsyncMock(side_effect=[RuntimeError("webhook down"), None])
+        buffer = ActivityEventBuffer(send_batch, max_batch=1, max_delay=0.01)
+
+        buffer.add({"event_type": "FIRST"})
+        buffer.add({"event_type": "SECOND"})
+        await buffer.aclose()
+
+        assert send_batch.await_count == 2
+
+
+class TestActivityLogging:
+
+    @pytest.mark.asyncio
+    async def test_logging_does_not_wait_for_delivery(self):
+        """Test 1: Registrar un evento es síncrono y el envío va en lote"""
+        agent = DiabetesAgent(webhook_config())
+        agent._send_activity_batch_to_webhook = AsyncMock()
+
+        assert agent._log_activity_event("123", "PLAN_STATUS_CHECK_STARTED") is None
+        agent._send_activity_batch_to_webhook.assert_not_awaited()
+        await agent.aclose()
+
+        sent = agent._send_activity_batch_to_webhook.await_args.args[0]
+        assert [e["event_type"] for e in sent] == ["PLAN_STATUS_CHECK_STARTED"]
+
+    def test_nothing_sent_without_webhook(self):
+        """Test 2: Sin webhook configurado los eventos no salen de la sesión"""
+        agent = DiabetesAgent(Config())
+
+        agent._log_activity_event("123", "PLAN_STATUS_CHECK_STARTED")
+
+        assert agent._activity_buffer is None
+        assert len(agent.get_session_context("123").activity_events) == 1
+
+
+class TestActivityWebhook:
+
+    @pytest.mark.asyncio
+    async def test_batches_share_one_client(self):
+        """Test 1: Los lotes se envían con un solo cliente HTTP que se cierra al final"""
+        posted = []
+        def handle(request):
+            posted.append(json.loads(request.content))
+            return httpx.Response(200)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+        async with DiabetesAgent(webhook_config()) as agent:
+            agent._http_client = client
+            agent._log_activity_event("123", "FIRST")
+            await agent._activity_buffer.flush()
+            agent._log_activity_event("123", "SECOND")
+
+        assert [[e["event_type"] for e in body["events"]] for body in posted] == [["FIRST"], ["SECOND"]]
+        assert client.is_closed
+        assert agent._http_client is None
+
+class TestBackgroundComplaintSubmission:
+
+    @pytest.mark.asyncio
+    async def test_confirmation_does_not_wait_for_submission(self):
+        """Test 1: La confirmación de queja no espera el envío"""
+        agent = DiabetesAgent(Config())
+        release = asyncio.Event()
+        async def slow_submit(user_id, complaint_id, complaint_text):
+            await release.wait()
+        agent._submit_complaint = AsyncMock(side_effect=slow_submit)
+
+        result = await agent.present_complaint("5512345678", "Tardaron en responder")
+
+        assert result["complaint_id"].startswith("COMP-5678-")
+        assert len(agent._background_tasks) == 1
+        release.set()
+        await asyncio.gather(*agent._background_tasks)
+        agent._submit_complaint.assert_awaited_once_with(
+            "5512345678", result["complaint_id"], "Tardaron en responder")
+
+    @pytest.mark.asyncio
+    async def test_submission_failure_is_contained(self):
+        """Test 2: Un error en segundo plano no se propaga"""
+        agent = DiabetesAgent(Config())
+        agent._submit_complaint = AsyncMock(side_effect=RuntimeError("webhook down"))
+
+        await agent.present_complaint("5512345678", "Queja")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert not agent._background_tasks
+
+    @pytest.mark.asyncio
+    async def test_pending_submissions_are_bounded(self):
+        """Test 3: Con el límite alcanzado la siguiente queja espera un lugar"""
+        agent = DiabetesAgent(Config())
+        agent.MAX_BACKGROUND_TASKS = 1
+        release = asyncio.Event()
+        async def slow_submit(user_id, complaint_id, complaint_text):
+            await release.wait()
+        agent._submit_complaint = AsyncMock(side_effect=slow_submit)
+
+        await agent.present_complaint("5512345678", "Primera")
+        second = asyncio.create_task(agent.present_complaint("5512345678", "Segunda"))
+        await asyncio.sleep(0)
+
+        assert not second.done()
+        release.set()
+        await second
+        await agent.aclose()
+        assert agent._submit_complaint.await_count == 2
+        assert not agent._background_tasks
+
+
+class TestSessionStore:
+
+    def test_same_user_reuses_session(self):
+        """Test 1: El mismo usuario recibe el mismo contexto de sesión"""
+        agent = DiabetesAgent(Config())
+
+        assert agent.get_session_context("123") is agent.get_session_context("123")
+
+    def test_idle_session_expires(self):
+        """Test 2: Una sesión inactiva más del timeout empieza de nuevo"""
+        agent = DiabetesAgent(Config())
+        with patch('dr_clivi.agents.base_agent.time.monotonic', return_value=1000.0):
+            first = agent.get_session_context("123")
+            first.current_flow = "checkPlanStatus"
+            first.flows_visited.add("checkPlanStatus")
+        with patch('dr_clivi.agents.base_agent.time.monotonic',
+                   return_value=1000.0 + agent.session_ttl_seconds + 1):
+            second = agent.get_session_context("123")
+
+        assert second.current_flow is None
+        assert second.flows_visited == set()
+
+    def test_least_recently_used_is_evicted(self):
+        """Test 3: Al llenarse se descarta la sesión menos reciente"""
+        agent = DiabetesAgent(Config())
+        agent.session_cache_size = 2
+        agent.get_session_context("a")
+        agent.get_session_context("b")
+        agent.get_session_context("a")
+        agent.get_session_context("c")
+
+        assert list(agent._session_contexts) == ["a", "c"]
+
+    def test_expired_sessions_are_dropped(self):
+        """Test 4: Las sesiones expiradas de otros usuarios se liberan"""
+        agent = DiabetesAgent(Config())
+        with patch('dr_clivi.agents.base_agent.time.monotonic', return_value=1000.0):
+            agent.get_session_context("a")
+        with patch('dr_clivi.agents.base_agent.time.monotonic',
+                   return_value=1000.0 + agent.session_ttl_seconds + 1):
+            agent.get_session_context("b")
+
+        assert list(agent._session_contexts) == ["b"]
+
+
+def agent_with_plan(plan: str, plan_status: str) -> DiabetesAgent:
+    agent = DiabetesAgent(Config())
+    agent.update_session_context(
+        "123",
+        patient={"name_display": "Paciente", "plan": plan, "plan_status": plan_status},
+        user_context="REGISTERED"
+    )
+    return agent
+
+
+class TestPlanRouting:
+
+    @pytest.mark.asyncio
+    async def test_specialist_plan_goes_to_main_menu(self):
+        """Test 1: Plan PRO activo va al menú principal"""
+        agent = agent_with_plan("PRO", "ACTIVE")
+        agent.main_menu_flow = AsyncMock(return_value={"action": "menu"})
+
+        assert await agent.check_plan_status("123") == {"action": "menu"}
+        agent.main_menu_flow.assert_awaited_once_with("123")
+
+    @pytest.mark.asyncio
+    async def test_offline_payment_only_checked_for_main_menu(self):
+        """Test 2: El pago offline no se revisa para Club cancelado"""
+        agent = agent_with_plan("CLUB", "CANCELED")
+        agent._check_offline_payment_intent = Mock(return_value=False)
+
+        result = await agent.check_plan_status("123")
+
+        assert result["target"] == "club_canceled_plan"
+        agent._check_offline_payment_intent.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unmatched_combinations(self):
+        """Test 3: Combinaciones sin ruta conservan el orden de la cascada"""
+        assert (await agent_with_plan("PLUS", "CANCELED").check_plan_status("123"))["target"] == "plan_reactivation_flow"
+        assert (await agent_with_plan("GOLD", "ACTIVE").check_plan_status("123"))["error_code"] == "INVALID_PLAN_TYPE"
+        assert (await agent_with_plan("PRO", "PENDING").check_plan_status("123"))["error_code"] == "PLAN_STATUS_UNDETERMINED"
+
+    @pytest.mark.asyncio
+    async def test_same_user_checks_run_one_at_a_time(self):
+        """Test 4: Revisiones del mismo usuario no se intercalan, las de otros sí"""
+        agent = agent_with_plan("PRO", "ACTIVE")
+        agent.update_session_context(
+            "456", patient={"name_display": "Otro", "plan": "PRO", "plan_status": "ACTIVE"},
+            user_context="REGISTERED")
+        running = {}
+        peak = {}
+        async def main_menu(user_id):
+            running[user_id] = running.get(user_id, 0) + 1
+            peak[user_id] = max(peak.get(user_id, 0), running[user_id])
+            peak["total"] = max(peak.get("total", 0), sum(running.values()))
+            await asyncio.sleep(0.01)
+            running[user_id] -= 1
+            return {}
+        agent.main_menu_flow = AsyncMock(side_effect=main_menu)
+
+        await asyncio.gather(*(agent.check_plan_status(user_id) for user_id in ("123", "123", "456")))
+
+        assert peak["123"] == 1
+        assert peak["total"] == 2
+
+    @pytest.mark.asyncio
+    async def test_replies_do_not_share_state(self):
+        """Test 5: Las respuestas son copias independientes de la plantilla"""
+        agent = agent_with_plan("CLUB", "CANCELED")
+
+        first = await agent.check_plan_status("123")
+        first["options"].clear()
+        second = await agent.check_plan_status("123")
+        canceled = await agent_with_plan("PLUS", "CANCELED").check_plan_status("123")
+
+        assert len(second["options"]) == 3
+        assert canceled["message"] == "Tu plan PLUS ha sido cancelado. Te ayudamos a reactivarlo."
+        assert canceled["plan_type"] == "PLUS"
+
+
+class TestAgentSettings:
+
+    def test_tools_shared_per_class(self):
+        """Test 1: Las herramientas son una tupla compartida por la clase"""
+        first = DiabetesAgent(Config())
+        second = DiabetesAgent(Config())
+
+        assert first.get_tools() is second.get_tools() is DiabetesAgent.TOOLS
+        assert "glucose_logging_flow" in first.get_tools()
+        assert "send_template_message" in first.get_tools()
+
+    def test_instructions_built_on_first_use(self):
+        """Test 2: Las instrucciones se generan una sola vez al usarse"""
+        with patch.object(DiabetesAgent, 'get_system_instructions', return_value="instrucciones") as build:
+            agent = DiabetesAgent(Config())
+            build.assert_not_called()
+
+            assert agent.instructions == "instrucciones"
+            assert agent.instructions == "instrucciones"
+        build.assert_called_once()
+
+
+class TestSessionId:
+
+    @pytest.mark.asyncio
+    async def test_session_id_is_stable(self):
+        """Test 1: El session_id no cambia durante la sesión"""
+        agent = DiabetesAgent(Config())
+        agent._send_activity_batch_to_webhook = AsyncMock()
+        agent._log_activity_event("123", "FIRST")
+        agent._log_activity_event("123", "SECOND")
+        await agent.aclose()
+
+        events = agent.get_session_context("123").activity_events
+        assert events[0]["session_id"] == events[1]["session_id"] == agent._get_session_id("123")
+        assert events[0]["session_id"].startswith("session_123_")
+
+    def test_expired_session_gets_new_id(self):
+        """Test 2: Una sesión expirada recibe un session_id nuevo"""
+        agent = DiabetesAgent(Config())
+        with patch('dr_clivi.agents.base_agent.time.monotonic', return_value=1000.0), \
+             patch('dr_clivi.agents.base_agent.secrets.randbits', return_value=0x1):
+            first = agent._get_session_id("123")
+        with patch('dr_clivi.agents.base_agent.time.monotonic',
+                   return_value=1000.0 + agent.session_ttl_seconds + 1), \
+             patch('dr_clivi.agents.base_agent.secrets.randbits', return_value=0xbeef):
+            second = agent._get_session_id("123")
+
+        assert first == "session_123_0001"
+        assert second == "session_123_beef"
+
+
+class TestNoMatchFallback:
+
+    @pytest.mark.asyncio
+    async def test_keyword_selects_reply(self):
+        """Test 1: Palabras clave eligen la respuesta sin importar mayúsculas"""
+        agent = DiabetesAgent(Config())
+
+        appointment = await agent._get_generative_fallback_response("123", "Quiero una CITA")
+        medication = await agent._get_generative_fallback_response("123", "mi Medicina")
+        other = await agent._get_generative_fallback_response("123", "hola")
+
+        assert appointment["confidence"] == 0.8
+        assert medication["confidence"] == 0.7
+        assert other["confidence"] == 0.3
+
+    @pytest.mark.asyncio
+    async def test_suggested_actions_are_fresh_lists(self):
+        """Test 2: Las acciones sugeridas no comparten la plantilla"""
+        agent = DiabetesAgent(Config())
+        agent._activity_logging_enabled = False
+
+        first = await agent.handle_no_match_fallback("123", "cita")
+        first["suggested_actions"].append("Otra")
+        second = await agent.handle_no_match_fallback("123", "cita")
+
+        assert second["suggested_actions"] == ["Agendar cita", "Ver citas existentes", "Menú principal"]
+
+    @pytest.mark.asyncio
+    async def test_appointment_takes_priority(self):
+        """Test 3: Cita tiene prioridad aunque medicamento aparezca antes"""
+        agent = DiabetesAgent(Config())
+
+        result = await agent._get_generative_fallback_response("123", "Mi medicina\nantes de la cita")
+
+        assert result["confidence"] == 0.8
+
+
+class TestSessionHistory:
+
+    def test_activity_events_are_bounded(self):
+        """Test 1: Solo se conservan los eventos más recientes de la sesión"""
+        agent = DiabetesAgent(Config())
+        agent._activity_logging_enabled = False
+
+        for i in range(SESSION_HISTORY_SIZE + 5):
+            agent._log_activity_event("123", f"EVENT_{i}")
+
+        events = agent.get_session_context("123").activity_events
+        assert len(events) == SESSION_HISTORY_SIZE
+        assert events[0]["event_type"] == "EVENT_5"
+
+    def test_flows_visited_are_unique(self):
+        """Test 2: Los flujos visitados no se repiten"""
+        agent = DiabetesAgent(Config())
+        context = agent.get_session_context("123")
+        context.flows_visited.update(("mainMenu", "clubPlan", "mainMenu"))
+
+        assert sorted(agent._get_flows_visited("123")) == ["clubPlan", "mainMenu"]
+
+
+class TestSessionDataclasses:
+
+    def test_contexts_have_no_instance_dict(self):
+        """Test 1: SessionContext y PatientContext usan __slots__"""
+        context = SessionContext(patient=PatientContext(plan="PRO"))
+
+        assert not hasattr(context, "__dict__")
+        assert not hasattr(context.patient, "__dict__")
+        assert context.flows_visited == set()
+        assert context.patient.notification_preferences["whatsapp"] is True
+
+
+class TestUpdateSessionContext:
+
+    def test_fields_routed_to_session_and_patient(self):
+        """Test 1: Los campos se asignan a la sesión o al paciente"""
+        agent = DiabetesAgent(Config())
+        agent.update_session_context("123", patient=PatientContext(plan="PRO"), current_flow="mainMenu")
+        agent.update_session_context("123", plan_status="ACTIVE", unknown_field=1)
+
+        context = agent.get_session_context("123")
+        assert context.current_flow == "mainMenu"
+        assert context.patient.plan_status == "ACTIVE"
+        assert not hasattr(context, "unknown_field")
+
+    def test_methods_are_not_overwritten(self):
+        """Test 2: Solo se aceptan campos, no métodos del contexto"""
+        agent = DiabetesAgent(Config())
+        agent.update_session_context("123", reset="x")
+
+        assert callable(agent.get_session_context("123").reset)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Pruebas unitarias para ClockCache
+Reloj UTC compartido por tick del event loop
+"""
+
+import pytest
+import asyncio
+import datetime
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dr_clivi.clock import ClockCache
+
+
+class TestClockCache:
+
+    @pytest.mark.asyncio
+    async def test_same_tick_shares_value(self):
+        """Test 1: Lecturas en el mismo tick regresan el mismo datetime"""
+        clock = ClockCache(resolution=60.0)
+
+        assert clock() is clock()
+
+    @pytest.mark.asyncio
+    async def test_refreshes_after_resolution(self):
+        """Test 2: Pasada la resolución se lee el reloj de nuevo"""
+        clock = ClockCache(resolution=0.001)
+        first = clock()
+        await asyncio.sleep(0.01)
+
+        assert clock() > first
+
+    def test_outside_loop_reads_clock(self):
+        """Test 3: Fuera del event loop regresa la hora actual"""
+        clock = ClockCache()
+
+        assert abs(clock() - datetime.datetime.utcnow()) < datetime.timedelta(seconds=1)
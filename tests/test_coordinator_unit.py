@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Pruebas unitarias para IntelligentCoordinator
+Cache de contexto de usuario
+"""
+
+import pytest
+import asyncio
+import dataclasses
+from unittest.mock import AsyncMock, Mock, patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dr_clivi.config import Config
+from dr_clivi.agents.coordinator import IntelligentCoordinator
+from dr_clivi.log_context import user_id_var
+from dr_clivi.flows.deterministic_handler import UserContext, PlanType, PlanStatus
+
+
+def make_user_context(user_id: str) -> UserContext:
+    return UserContext(
+        user_id=user_id,
+        patient_name="Paciente",
+        plan=PlanType.PRO,
+        plan_status=PlanStatus.ACTIVE,
+        phone_number=f"+52{user_id}",
+        session_data={}
+    )
+
+
+@pytest.fixture
+def coordinator():
+    """Coordinator con lookup de contexto simulado"""
+    coordinator = IntelligentCoordinator(Config())
+    coordinator._fetch_user_context = AsyncMock(side_effect=lambda user_id, phone_number=None: make_user_context(user_id))
+    return coordinator
+
+
+class TestUserContextCache:
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_lookup(self, coordinator):
+        """Test 1: Segunda consulta del mismo usuario usa el cache"""
+        first = await coordinator._get_user_context("123")
+        second = await coordinator._get_user_context("123")
+
+        assert first is second
+        coordinator._fetch_user_context.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_refetched(self, coordinator):
+        """Test 2: Entradas expiradas se vuelven a consultar"""
+        with patch('dr_clivi.agents.coordinator.time.monotonic', return_value=1000.0):
+            await coordinator._get_user_context("123")
+        with patch('dr_clivi.agents.coordinator.time.monotonic',
+                   return_value=1000.0 + coordinator.user_context_ttl_seconds + 1):
+            await coordinator._get_user_context("123")
+
+        assert coordinator._fetch_user_context.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_lookup(self, coordinator):
+        """Test 3: Consultas concurrentes comparten una sola búsqueda"""
+        async def slow_fetch(user_id, phone_number=None):
+            await asyncio.sleep(0.01)
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=slow_fetch)
+
+        results = await asyncio.gather(*(coordinator._get_user_context("123") for _ in range(5)))
+
+        assert all(result is results[0] for result in results)
+        coordinator._fetch_user_context.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_is_evicted(self, coordinator):
+        """Test 4: Se descarta el usuario menos reciente al llenarse"""
+        coordinator.user_context_cache_size = 2
+        await coordinator._get_user_context("a")
+        await coordinator._get_user_context("b")
+        await coordinator._get_user_context("a")
+        await coordinator._get_user_context("c")
+
+        assert list(coordinator._user_context_cache) == ["a", "c"]
+
+    @pytest.mark.asyncio
+    async def test_failed_lookup_is_not_cached(self, coordinator):
+        """Test 5: Un error no queda en cache"""
+        coordinator._fetch_user_context = AsyncMock(side_effect=RuntimeError("db down"))
+
+        with pytest.raises(RuntimeError):
+            await coordinator._get_user_context("123")
+
+        assert "123" not in coordinator._user_context_cache
+        assert "123" not in coordinator._user_context_inflight
+
+    @pytest.mark.asyncio
+    async def test_invalidate_forces_refetch(self, coordinator):
+        """Test 6: invalidate_user_context obliga a consultar de nuevo"""
+        await coordinator._get_user_context("123")
+        coordinator.invalidate_user_context("123")
+        await coordinator._get_user_context("123")
+
+        assert coordinator._fetch_user_context.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidated_inflight_lookup_not_cached(self, coordinator):
+        """Test 7: Una búsqueda en curso invalidada no queda en cache"""
+        release = asyncio.Event()
+        async def slow_fetch(user_id, phone_number=None):
+            await release.wait()
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=slow_fetch)
+
+        task = asyncio.create_task(coordinator._get_user_context("123"))
+        await asyncio.sleep(0)
+        coordinator.invalidate_user_context("123")
+        release.set()
+        await task
+
+        assert "123" not in coordinator._user_context_cache
+
+    @pytest.mark.asyncio
+    async def test_cancelled_first_caller_does_not_cancel_others(self, coordinator):
+        """Test 8: Cancelar a quien inició la búsqueda no cancela a los demás"""
+        release = asyncio.Event()
+        async def slow_fetch(user_id, phone_number=None):
+            await release.wait()
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=slow_fetch)
+
+        first = asyncio.create_task(coordinator._get_user_context("123"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coordinator._get_user_context("123"))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert isinstance(await second, UserContext)
+        assert first.cancelled()
+        assert "123" in coordinator._user_context_cache
+        coordinator._fetch_user_context.assert_awaited_once()
+
+    def test_limits_come_from_config(self):
+        """Test 9: TTL y tamaño se toman de la configuración"""
+        config = Config()
+        config.coordinator_agent.user_context_ttl_seconds = 5.0
+        config.coordinator_agent.user_context_cache_size = 10
+
+        coordinator = IntelligentCoordinator(config)
+
+        assert coordinator.user_context_ttl_seconds == 5.0
+        assert coordinator.user_context_cache_size == 10
+
+
+class TestRequestLogContext:
+
+    @pytest.mark.asyncio
+    async def test_user_id_bound_during_request(self, coordinator):
+        """Test 1: user_id queda en el contexto de logging solo durante la petición"""
+        seen = []
+        async def fetch(user_id, phone_number=None):
+            seen.append(user_id_var.get())
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=fetch)
+
+        await coordinator.process_user_input("123", "hola")
+
+        assert seen == ["123"]
+        assert user_id_var.get() == "-"
+
+
+class TestContextPrefetch:
+
+    @pytest.mark.asyncio
+    async def test_lookup_starts_before_classification(self, coordinator):
+        """Test 1: La búsqueda de contexto inicia antes de clasificar la entrada"""
+        order = []
+        async def fetch(user_id, phone_number=None):
+            order.append("fetch")
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=fetch)
+        classify = coordinator.flow_handler.is_deterministic_input
+        coordinator.flow_handler.is_deterministic_input = lambda text: order.append("classify") or classify(text)
+
+        await coordinator.process_user_input("123", "hola")
+
+        assert order == ["fetch", "classify"]
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_task(self, coordinator):
+        """Test 2: Con cache vigente no se crea tarea de búsqueda"""
+        await coordinator._get_user_context("123")
+
+        with patch.object(coordinator, '_user_context_lookup') as lookup:
+            await coordinator.process_user_input("123", "hola")
+
+        lookup.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_classification_error_keeps_shared_lookup(self, coordinator):
+        """Test 3: Un error al clasificar no cancela la búsqueda compartida"""
+        release = asyncio.Event()
+        async def slow_fetch(user_id, phone_number=None):
+            await release.wait()
+            return make_user_context(user_id)
+        coordinator._fetch_user_context = AsyncMock(side_effect=slow_fetch)
+        coordinator.flow_handler.is_deterministic_input = Mock(side_effect=ValueError("boom"))
+
+        waiter = asyncio.create_task(coordinator._get_user_context("123"))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError):
+            await coordinator.process_user_input("123", "hola")
+        release.set()
+
+        assert isinstance(await waiter, UserContext)
+        assert "123" in coordinator._user_context_cache
+        coordinator._fetch_user_context.assert_awaited_once()
+
+
+class TestBatchProcessing:
+
+    @pytest.mark.asyncio
+    async def test_results_keep_request_order(self, coordinator):
+        """Test 1: Los resultados conservan el orden de las peticiones"""
+        async def process(user_id, user_input, phone_number=None):
+            await asyncio.sleep(0.01 if user_id == "a" else 0)
+            return {"user_id": user_id}
+        coordinator.process_user_input = AsyncMock(side_effect=process)
+
+        results = await coordinator.process_user_inputs_batch([("a", "hola"), ("b", "hola")])
+
+        assert [r["user_id"] for r in results] == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, coordinator):
+        """Test 2: No se exceden max_concurrency peticiones simultáneas"""
+        running = 0
+        peak = 0
+        async def process(user_id, user_input, phone_number=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+        coordinator.process_user_input = AsyncMock(side_effect=process)
+
+        await coordinator.process_user_inputs_batch([(str(i), "hola") for i in range(6)], max_concurrency=2)
+
+        assert peak == 2
+
+
+class TestDeterministicDispatch:
+
+    @pytest.mark.asyncio
+    async def test_main_menu_action(self, coordinator):
+        """Test 1: show_main_menu produce el menú de WhatsApp"""
+        coordinator.flow_handler.route_deterministic_input = lambda ctx, text: {
+            "action": "show_main_menu", "menu_data": {"m": 1}, "flow": "diabetesPlans", "page": "mainMenu"
+        }
+
+        result = await coordinator._handle_deterministic_flow(make_user_context("123"), "hola")
+
+        assert result["response_type"] == "whatsapp_menu"
+        assert result["menu_data"] == {"m": 1}
+
+    @pytest.mark.asyncio
+    async def test_unknown_action_returned_as_is(self, coordinator):
+        """Test 2: Acciones sin handler se regresan sin cambios"""
+        routed = {"action": "redirect_to_reactivation"}
+        coordinator.flow_handler.route_deterministic_input = lambda ctx, text: routed
+
+        result = await coordinator._handle_deterministic_flow(make_user_context("123"), "hola")
+
+        assert result is routed
+
+
+class TestRoutingStats:
+
+    def test_percentages_from_single_total(self, coordinator):
+        """Test 1: Porcentajes calculados sobre el total de rutas"""
+        for key in coordinator._routing_stats:
+            coordinator._routing_stats[key] = 0
+        coordinator._routing_stats["diabetes_routes"] = 3
+        coordinator._routing_stats["obesity_routes"] = 1
+
+        stats = coordinator.get_routing_stats()
+
+        assert stats["total_routes"] == 4
+        assert stats["diabetes_percentage"] == pytest.approx(75.0)
+        assert stats["obesity_percentage"] == pytest.approx(25.0)
+
+    def test_no_routes_yields_zero(self, coordinator):
+        """Test 2: Sin rutas no hay división entre cero"""
+        for key in coordinator._routing_stats:
+            coordinator._routing_stats[key] = 0
+
+        stats = coordinator.get_routing_stats()
+
+        assert stats["diabetes_percentage"] == 0.0
+
+
+class TestUserContextSlots:
+
+    def test_as_dict_lists_all_fields(self):
+        """Test 1: as_dict expone los campos sin __dict__"""
+        context = make_user_context("123")
+
+        assert not hasattr(context, "__dict__")
+        assert context.as_dict()["user_id"] == "123"
+        assert context.as_dict()["plan"] is PlanType.PRO
+
+    def test_cached_context_is_immutable(self):
+        """Test 2: El contexto compartido desde el cache no se puede modificar"""
+        context = make_user_context("123")
+
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            context.plan = PlanType.BASIC
+
+
+class TestFallbackKeywordAnalysis:
+
+    def test_emergency_takes_priority(self, coordinator):
+        """Test 1: Emergencia tiene prioridad sobre diabetes"""
+        result = coordinator._fallback_keyword_analysis("Dolor pecho y glucosa alta, es urgente")
+
+        assert result["specialty"] == "emergency"
+        assert result["keywords_detected"] == ["dolor pecho", "urgente"]
+
+    def test_keywords_reported_in_list_order(self, coordinator):
+        """Test 2: Palabras detectadas en el orden de la lista"""
+        result = coordinator._fallback_keyword_analysis("mi insulina y mi glucosa")
+
+        assert result["specialty"] == "diabetes"
+        assert result["keywords_detected"] == ["glucosa", "insulina"]
+
+
+class TestSessionLock:
+
+    @pytest.mark.asyncio
+    async def test_ai_requests_of_same_user_not_serialized(self, coordinator):
+        """Test 1: Las consultas con IA del mismo usuario no esperan a la anterior"""
+        running = 0
+        peak = 0
+        async def route(user_context, user_input):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+        coordinator._handle_intelligent_routing = AsyncMock(side_effect=route)
+
+        await asyncio.gather(*(coordinator.process_user_input("a", "tengo una duda") for _ in range(2)))
+
+        assert peak == 2
+
+    def test_lock_released_when_unused(self, coordinator):
+        """Test 2: El lock de un usuario se libera cuando nadie lo usa"""
+        assert coordinator.session_lock("123") is coordinator.session_lock("123")
+
+        assert "123" not in coordinator._session_locks
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Pruebas unitarias para generative_ai
+Límite de llamadas concurrentes por usuario y llamadas compartidas
+"""
+
+import pytest
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dr_clivi.tools import generative_ai
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Cliente Gemini simulado que registra llamadas simultáneas por usuario"""
+    monkeypatch.setenv("GOOGLE_API_KEY", "test_key")
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+
+    def generate_content(model, contents, config):
+        user_id = contents.split(":")[0]
+        with lock:
+            running[user_id] = running.get(user_id, 0) + 1
+            peak[user_id] = max(peak.get(user_id, 0), running[user_id])
+        time.sleep(0.2 if "lento" in contents else 0.02)
+        with lock:
+            running[user_id] -= 1
+        return Mock(text="respuesta")
+
+    genai = Mock()
+    genai.Client.return_value.models.generate_content.side_effect = generate_content
+    with patch.object(generative_ai, "_load_genai", return_value=genai):
+        yield peak
+
+
+class TestUserCallSlots:
+
+    @pytest.mark.asyncio
+    async def test_calls_per_user_are_bounded(self, fake_genai):
+        """Test 1: Un usuario no supera MAX_CONCURRENT_CALLS_PER_USER llamadas"""
+        calls = [generative_ai._call_vertex_ai(prompt=f"{user_id}:{i}", model="gemini-2.5-flash", user_id=user_id)
+                 for i, user_id in enumerate(["a"] * 5 + ["b"] * 2)]
+
+        results = await asyncio.gather(*calls)
+
+        assert all(result["success"] for result in results)
+        assert fake_genai["a"] == generative_ai.MAX_CONCURRENT_CALLS_PER_USER
+        assert fake_genai["b"] == 2
+
+    @pytest.mark.asyncio
+    async def test_idle_slots_are_released(self, fake_genai):
+        """Test 2: Sin llamadas en curso no se conserva el semáforo del usuario"""
+        await generative_ai._call_vertex_ai(prompt="a:0", model="gemini-2.5-flash", user_id="a")
+
+        assert "a" not in generative_ai._user_call_slots
+
+
+    @pytest.mark.asyncio
+    async def test_timed_out_calls_keep_their_slot(self, fake_genai):
+        """Test 3: Una llamada con timeout ocupa su lugar hasta que termina el hilo"""
+        with patch.object(generative_ai, "GEMINI_TIMEOUT_SECONDS", 0.005):
+            results = await asyncio.gather(*(
+                generative_ai._call_vertex_ai(prompt=f"a:{i}", model="gemini-2.5-flash", user_id="a")
+                for i in range(4)))
+        await asyncio.sleep(0.05)
+
+        assert all("simulada" in result["text"] for result in results)
+        assert fake_genai["a"] == generative_ai.MAX_CONCURRENT_CALLS_PER_USER
+        assert "a" not in generative_ai._user_call_slots
+
+
+class TestSharedCalls:
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_prompts_share_call(self, fake_genai):
+        """Test 1: Prompts idénticos en paralelo hacen una sola llamada"""
+        results = await asyncio.gather(*(
+            generative_ai._call_vertex_ai(prompt="a:hola", model="gemini-2.5-flash", user_id=user_id)
+            for user_id in ("a", "b", "c")))
+
+        assert [r["text"] for r in results] == ["respuesta"] * 3
+        assert results[0] is not results[1]
+        assert fake_genai["a"] == 1
+        assert not generative_ai._inflight_calls
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_call(self, fake_genai):
+        """Test 2: Cancelar a un solicitante no cancela la llamada de los demás"""
+        first = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="a:hola", model="gemini-2.5-flash", user_id="a"))
+        second = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="a:hola", model="gemini-2.5-flash", user_id="b"))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        result = await second
+
+        assert result["success"]
+
+    @pytest.mark.asyncio
+    async def test_user_at_limit_does_not_hold_back_others(self, fake_genai):
+        """Test 3: Con un usuario en su límite, la llamada compartida no espera por él"""
+        busy = [asyncio.create_task(generative_ai._call_vertex_ai(
+                    prompt=f"a:lento{i}", model="gemini-2.5-flash", user_id="a"))
+                for i in range(generative_ai.MAX_CONCURRENT_CALLS_PER_USER)]
+        await asyncio.sleep(0)
+
+        # b inicia la llamada y a se une sin necesitar lugar
+        started_by_b = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="b:hola", model="gemini-2.5-flash", user_id="b"))
+        await asyncio.sleep(0)
+        joined_by_a = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="b:hola", model="gemini-2.5-flash", user_id="a"))
+        # a espera su lugar; b no queda formado detrás de a
+        queued_by_a = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="b:otra", model="gemini-2.5-flash", user_id="a"))
+        await asyncio.sleep(0)
+        started_by_b_again = asyncio.create_task(
+            generative_ai._call_vertex_ai(prompt="b:otra", model="gemini-2.5-flash", user_id="b"))
+
+        await asyncio.wait_for(asyncio.gather(started_by_b, joined_by_a, started_by_b_again), 0.15)
+
+        assert not any(task.done() for task in busy)
+        assert joined_by_a.result()["text"] == "respuesta"
+        await asyncio.gather(*busy, queued_by_a)
+        assert fake_genai["a"] == generative_ai.MAX_CONCURRENT_CALLS_PER_USER
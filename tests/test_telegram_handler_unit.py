@@ -102,6 +102,7 @@ class TestTelegramBotHandler:
             "response": "Hola! ¿En qué puedo ayudarte?"
         }
         telegram_handler.coordinator.process_user_input.return_value = mock_response
+        telegram_handler._send_chat_action = AsyncMock(return_value=True)
         telegram_handler._send_response_to_user = AsyncMock(return_value=True)
         
         result = await telegram_handler._handle_message(message)
@@ -116,6 +117,7 @@ class TestTelegramBotHandler:
             user_input="¿Cómo estás?",
             phone_number=None
         )
+        telegram_handler._send_chat_action.assert_awaited_once_with("456")
     
     @pytest.mark.asyncio
     async def test_handle_callback_query(self, telegram_handler):
@@ -294,7 +296,7 @@ class TestTelegramBotHandler:
         
         mock_client_instance = AsyncMock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__aenter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         payload = {"chat_id": "456", "text": "test"}
         result = await telegram_handler._make_telegram_api_call("sendMessage", payload)
@@ -313,12 +315,52 @@ class TestTelegramBotHandler:
         
         mock_client_instance = AsyncMock()
         mock_client_instance.post.return_value = mock_response
-        mock_client.return_value.__aenter__.return_value = mock_client_instance
+        mock_client.return_value = mock_client_instance
         
         payload = {"chat_id": "456", "text": "test"}
         result = await telegram_handler._make_telegram_api_call("sendMessage", payload)
         
         assert result is False
+    
+    @pytest.mark.asyncio
+    @patch('httpx.AsyncClient')
+    async def test_api_calls_share_http_client(self, mock_client, telegram_handler):
+        """Test 13: Llamadas consecutivas reutilizan el mismo cliente HTTP"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"ok": True, "result": {}}
+        
+        mock_client_instance = AsyncMock()
+        mock_client_instance.is_closed = False
+        mock_client_instance.post.return_value = mock_response
+        mock_client.return_value = mock_client_instance
+        
+        await telegram_handler._make_telegram_api_call("sendMessage", {"chat_id": "456"})
+        await telegram_handler._make_telegram_api_call("answerCallbackQuery", {"callback_query_id": "1"})
+        await telegram_handler.aclose()
+        
+        mock_client.assert_called_once()
+        assert mock_client_instance.post.await_count == 2
+        mock_client_instance.aclose.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    @patch('httpx.AsyncClient')
+    async def test_bot_info_is_cached(self, mock_client, telegram_handler):
+        """Test 14: getMe se consulta una sola vez"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"ok": True, "result": {"username": "drclivi_bot"}}
+        
+        mock_client_instance = AsyncMock()
+        mock_client_instance.is_closed = False
+        mock_client_instance.get.return_value = mock_response
+        mock_client.return_value = mock_client_instance
+        
+        first = await telegram_handler.get_bot_info()
+        second = await telegram_handler.get_bot_info()
+        
+        assert first is second
+        mock_client_instance.get.assert_awaited_once()
 
 
 # Ejecutar pruebas si se ejecuta directamente
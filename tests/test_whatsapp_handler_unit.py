@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Pruebas unitarias para WhatsAppWebhookHandler
+Procesamiento de mensajes entrantes
+"""
+
+import pytest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dr_clivi.config import Config
+from dr_clivi.webhook.whatsapp_handler import WhatsAppWebhookHandler
+
+
+@pytest.fixture
+def whatsapp_handler():
+    """Handler con coordinator y envío simulados"""
+    config = Mock(spec=Config)
+    config.whatsapp = Mock()
+    with patch('dr_clivi.webhook.whatsapp_handler.IntelligentCoordinator'):
+        handler = WhatsAppWebhookHandler(config)
+    handler._send_response_to_user = AsyncMock(return_value=True)
+    return handler
+
+
+def text_message(sender: str, message_id: str, body: str = "hola"):
+    return {"from": sender, "id": message_id, "type": "text", "text": {"body": body}}
+
+
+class TestIncomingMessages:
+
+    @pytest.mark.asyncio
+    async def test_single_message_result(self, whatsapp_handler):
+        """Test 1: Un solo mensaje conserva el formato de respuesta"""
+        whatsapp_handler.coordinator.process_user_input = AsyncMock(
+            return_value={"response_type": "whatsapp_menu", "routing_type": "deterministic"})
+
+        result = await whatsapp_handler._handle_incoming_message(
+            {"messages": [text_message("521", "m1")]})
+
+        assert result == {
+            "status": "processed",
+            "message_id": "m1",
+            "response_type": "whatsapp_menu",
+            "routing_type": "deterministic"
+        }
+
+    @pytest.mark.asyncio
+    async def test_senders_processed_concurrently_in_order(self, whatsapp_handler):
+        """Test 2: Remitentes distintos en paralelo, mismo remitente en orden"""
+        running = 0
+        peak = 0
+        seen = []
+        async def process(user_id, user_input, phone_number=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            seen.append((user_id, user_input))
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {}
+        whatsapp_handler.coordinator.process_user_input = AsyncMock(side_effect=process)
+
+        result = await whatsapp_handler._handle_incoming_message({"messages": [
+            text_message("521", "m1", "primero"),
+            text_message("522", "m2"),
+            text_message("521", "m3", "segundo"),
+        ]})
+
+        assert peak == 2
+        assert [s for s in seen if s[0] == "521"] == [("521", "primero"), ("521", "segundo")]
+        assert [r["message_id"] for r in result["messages"]] == ["m1", "m2", "m3"]
+
+    @pytest.mark.asyncio
+    async def test_status_update_logged(self, whatsapp_handler):
+        """Test 3: Actualizaciones de estado se registran sin procesar mensajes"""
+        result = await whatsapp_handler.process_webhook_message({"entry": [{"changes": [{"value": {
+            "statuses": [{"id": "m1", "status": "read", "recipient_id": "521"}]}}]}]})
+
+        assert result == {"status": "status_logged"}